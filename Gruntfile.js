@@ -75,6 +75,13 @@ module.exports = function(grunt) {
       },
       'diamondash.css.cleanup': {
         cmd: 'rm <%= paths.diamondash.css.cleanup.join(" ") %>'
+      },
+      'public.compress': {
+        cmd: [
+          'for f in <%= paths.public.compress.join(" ") %>; do',
+          'gzip -9 -n -c $f > $f.gz;',
+          'done'
+        ].join(' ')
       }
     },
     jst: {
@@ -125,12 +132,17 @@ module.exports = function(grunt) {
     'exec:vendor.fonts'
   ]);
 
+  grunt.registerTask('build:compress', [
+    'exec:public.compress'
+  ]);
+
   grunt.registerTask('build', [
     'build:vendor.css',
     'build:vendor.js',
     'build:vendor.fonts',
     'build:diamondash.css',
-    'build:diamondash.js'
+    'build:diamondash.js',
+    'build:compress'
   ]);
 
   grunt.registerTask('default', [
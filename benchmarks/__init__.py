@@ -0,0 +1,5 @@
+"""
+Benchmarks for diamondash's snapshot hot path.
+
+Run with ``python -m benchmarks --help`` from the project root.
+"""
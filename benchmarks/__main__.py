@@ -0,0 +1,6 @@
+import sys
+
+from benchmarks.runner import main
+
+
+main(sys.argv[1:])
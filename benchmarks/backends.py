@@ -0,0 +1,83 @@
+"""Benchmarks for processing graphite render responses"""
+
+import json
+
+from diamondash import utils
+from diamondash.backends import processors, vectorized
+from diamondash.backends.graphite import GraphiteBackendConfig, GraphiteBackend
+
+from benchmarks.payloads import mk_target, mk_render_response
+from benchmarks.runner import benchmarks
+
+
+def mk_backend(options, **overrides):
+    return GraphiteBackend(GraphiteBackendConfig(utils.add_dicts({
+        'url': 'http://127.0.0.1:8080',
+        'bucket_size': options.bucket_size,
+        'null_filter': 'zeroize',
+        'metrics': [{'target': mk_target(i)} for i in xrange(options.targets)],
+    }, overrides)))
+
+
+def mk_datapoints(options):
+    """
+    Returns the null-filtered `(x, y)` datapoints of a single synthetic
+    target, along with the time they start from.
+    """
+    data = json.loads(
+        mk_render_response(1, options.points, options.time_range))
+    datapoints = [(x * 1000, y) for y, x in data[0]['datapoints']]
+    datapoints = list(processors.null_filters['zeroize'](datapoints))
+    return datapoints[0][0], datapoints
+
+
+def setup_handle_backend_response(options, engine):
+    backend = mk_backend(options, summarizer_engine=engine)
+    body = mk_render_response(
+        options.targets, options.points, options.time_range)
+
+    until_time = utils.now()
+    from_time = until_time - options.time_range
+
+    return lambda: backend.handle_backend_response(
+        body, from_time=from_time, until_time=until_time)
+
+
+@benchmarks.register('graphite.build_request_url')
+def bench_build_request_url(options):
+    backend = mk_backend(options)
+    from_time = utils.now() - options.time_range
+    return lambda: backend.build_request_url(from_time=from_time)
+
+
+@benchmarks.register('graphite.handle_backend_response')
+def bench_handle_backend_response(options):
+    return setup_handle_backend_response(options, 'python')
+
+
+@benchmarks.register('graphite.handle_backend_response.vectorized')
+def bench_handle_backend_response_vectorized(options):
+    return setup_handle_backend_response(options, 'vectorized')
+
+
+def register_summarizer(engine, summarizers, name, time_alignment):
+    def setup(options):
+        from_time, datapoints = mk_datapoints(options)
+
+        if (summarizers is vectorized.summarizers
+                and vectorized.numpy is not None):
+            datapoints = vectorized.Series.from_datapoints(datapoints)
+
+        summarizer = summarizers.get(
+            name, time_alignment, options.bucket_size)
+        return lambda: summarizer(from_time, datapoints)
+
+    benchmarks.add(
+        'summarizers.%s.%s.%s' % (engine, name, time_alignment), setup)
+
+
+for engine, summarizers in [('python', processors.summarizers),
+                            ('vectorized', vectorized.summarizers)]:
+    for name in sorted(processors.summarizers.summarizers):
+        for time_alignment in sorted(utils.time_aligners):
+            register_summarizer(engine, summarizers, name, time_alignment)
@@ -0,0 +1,47 @@
+"""Synthetic graphite render responses for benchmarking"""
+
+import json
+import random
+
+from diamondash import utils
+
+
+def mk_target(i):
+    return 'diamondash.bench.metric%d.last' % i
+
+
+def mk_render_data(targets, points, from_time, until_time, null_ratio=0.05,
+                   seed=0):
+    """
+    Builds the data of a graphite render response with ``targets`` targets,
+    each having ``points`` datapoints spread evenly between ``from_time`` and
+    ``until_time`` (given in milliseconds).
+    """
+    rand = random.Random(seed)
+    step = max((until_time - from_time) / 1000 / points, 1)
+    start = from_time / 1000
+
+    data = []
+    for i in xrange(targets):
+        datapoints = []
+        for j in xrange(points):
+            if rand.random() < null_ratio:
+                y = None
+            else:
+                y = round(rand.uniform(0, 1000), 6)
+            datapoints.append([y, start + (j * step)])
+
+        data.append({'target': mk_target(i), 'datapoints': datapoints})
+
+    return data
+
+
+def mk_render_response(targets, points, time_range, **kw):
+    """
+    Builds the body of a graphite render response covering the last
+    ``time_range`` milliseconds.
+    """
+    until_time = utils.now()
+    from_time = until_time - time_range
+    return json.dumps(mk_render_data(
+        targets, points, from_time, until_time, **kw))
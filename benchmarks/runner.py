@@ -0,0 +1,297 @@
+"""
+Runs diamondash's benchmarks and reports their results.
+
+Each benchmark is run in its own forked process so that its peak memory
+usage can be measured independently of the other benchmarks.
+"""
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import platform
+import resource
+import subprocess
+from optparse import OptionParser
+from timeit import default_timer
+
+from diamondash import utils
+
+
+PERCENTILES = [50, 90, 99]
+
+
+class Benchmark(object):
+    """
+    A named benchmark. ``setup`` is given the suite's options and returns the
+    callable to benchmark.
+    """
+
+    def __init__(self, name, setup):
+        self.name = name
+        self.setup = setup
+
+    def run(self, options):
+        fn = self.setup(options)
+
+        for i in xrange(options.warmup):
+            fn()
+
+        latencies = []
+        for i in xrange(options.iterations):
+            start = default_timer()
+            fn()
+            latencies.append(default_timer() - start)
+
+        return latencies
+
+
+class Benchmarks(object):
+    def __init__(self):
+        self.benchmarks = []
+
+    def add(self, name, setup):
+        self.benchmarks.append(Benchmark(name, setup))
+
+    def register(self, name):
+        """Decorator registering a benchmark setup function under ``name``"""
+        def decorator(setup):
+            self.add(name, setup)
+            return setup
+        return decorator
+
+    def select(self, patterns):
+        if not patterns:
+            return list(self.benchmarks)
+
+        return [
+            b for b in self.benchmarks
+            if any(fnmatch.fnmatch(b.name, p) for p in patterns)]
+
+
+benchmarks = Benchmarks()
+
+
+def percentile(sorted_values, p):
+    """
+    Returns the ``p``th percentile of the given sorted values using the
+    nearest-rank method.
+    """
+    if not sorted_values:
+        return None
+
+    i = int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1
+    return sorted_values[min(max(i, 0), len(sorted_values) - 1)]
+
+
+def summarize_latencies(latencies):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+
+    summary = {
+        'min': latencies[0],
+        'max': latencies[-1],
+        'mean': total / len(latencies),
+    }
+
+    for p in PERCENTILES:
+        summary['p%d' % p] = percentile(latencies, p)
+
+    # report latencies in milliseconds
+    summary = dict((k, v * 1000) for k, v in summary.iteritems())
+
+    return {
+        'ops_per_sec': len(latencies) / total if total else None,
+        'latency_ms': summary,
+    }
+
+
+def max_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is given in bytes on OS X and kilobytes elsewhere
+    if sys.platform == 'darwin':
+        rss = rss / 1024
+
+    return rss
+
+
+def measure(benchmark, options):
+    start_rss = max_rss_kb()
+    latencies = benchmark.run(options)
+    peak_rss = max_rss_kb()
+
+    result = {
+        'name': benchmark.name,
+        'iterations': len(latencies),
+        'peak_rss_kb': peak_rss,
+        'peak_rss_growth_kb': peak_rss - start_rss,
+    }
+    result.update(summarize_latencies(latencies))
+    return result
+
+
+def measure_in_child(benchmark, options):
+    """
+    Measures the benchmark in a forked process, so that its memory usage
+    doesn't affect the measurements of other benchmarks.
+    """
+    r, w = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(r)
+        status = 0
+        try:
+            result = measure(benchmark, options)
+        except Exception, e:
+            result = {'name': benchmark.name, 'error': repr(e)}
+            status = 1
+
+        with os.fdopen(w, 'w') as f:
+            json.dump(result, f)
+        os._exit(status)
+
+    os.close(w)
+    with os.fdopen(r) as f:
+        data = f.read()
+    os.waitpid(pid, 0)
+
+    if not data:
+        return {'name': benchmark.name, 'error': 'benchmark process died'}
+
+    return json.loads(data)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options, patterns=()):
+    measure_fn = measure if options.no_fork else measure_in_child
+    results = []
+
+    for benchmark in benchmarks.select(patterns):
+        result = measure_fn(benchmark, options)
+        results.append(result)
+
+        if not options.quiet:
+            sys.stderr.write(format_result(result) + '\n')
+
+    return {
+        'revision': git_revision(),
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {
+            'targets': options.targets,
+            'points': options.points,
+            'time_range': options.time_range,
+            'bucket_size': options.bucket_size,
+            'iterations': options.iterations,
+            'warmup': options.warmup,
+        },
+        'results': results,
+    }
+
+
+def format_result(result):
+    if 'error' in result:
+        return "%-45s ERROR: %s" % (result['name'], result['error'])
+
+    latency = result['latency_ms']
+    return "%-45s %10.1f ops/s  p50 %9.3fms  p99 %9.3fms  %8dKB" % (
+        result['name'],
+        result['ops_per_sec'],
+        latency['p50'],
+        latency['p99'],
+        result['peak_rss_kb'])
+
+
+def compare(report, baseline):
+    """
+    Returns lines comparing the ops/sec of each benchmark in ``report`` with
+    the same benchmark in ``baseline``.
+    """
+    baseline_results = dict(
+        (r['name'], r) for r in baseline['results'] if 'error' not in r)
+
+    lines = ["%-45s %12s %12s %8s" % ('', 'baseline', 'current', 'change')]
+    for result in report['results']:
+        old = baseline_results.get(result['name'])
+        if old is None or 'error' in result:
+            continue
+
+        change = (result['ops_per_sec'] / old['ops_per_sec']) - 1
+        lines.append("%-45s %10.1f/s %10.1f/s %+7.1f%%" % (
+            result['name'],
+            old['ops_per_sec'],
+            result['ops_per_sec'],
+            change * 100))
+
+    return lines
+
+
+def parse_args(argv):
+    parser = OptionParser(usage="python -m benchmarks [options] [pattern...]")
+    parser.add_option(
+        '-t', '--targets', type='int', default=5,
+        help="number of targets in each synthetic graphite response")
+    parser.add_option(
+        '-p', '--points', type='int', default=1000,
+        help="number of datapoints per target")
+    parser.add_option(
+        '--time-range', default='1d',
+        help="time range the datapoints are spread over")
+    parser.add_option(
+        '--bucket-size', default='1h',
+        help="bucket size datapoints are summarized into")
+    parser.add_option(
+        '-n', '--iterations', type='int', default=50,
+        help="number of timed calls per benchmark")
+    parser.add_option(
+        '-w', '--warmup', type='int', default=3,
+        help="number of untimed calls made before timing")
+    parser.add_option(
+        '-o', '--output',
+        help="file to write the results to as json")
+    parser.add_option(
+        '-c', '--compare',
+        help="json results file of a previous run to compare with")
+    parser.add_option(
+        '--no-fork', action='store_true', default=False,
+        help="run every benchmark in this process")
+    parser.add_option(
+        '-q', '--quiet', action='store_true', default=False,
+        help="don't print results as they are measured")
+
+    options, args = parser.parse_args(argv)
+    options.time_range = utils.parse_interval(options.time_range)
+    options.bucket_size = utils.parse_interval(options.bucket_size)
+    return options, args
+
+
+def main(argv):
+    # imported for their benchmark registrations
+    from benchmarks import backends, widgets, server  # noqa
+
+    options, patterns = parse_args(argv)
+    report = run(options, patterns)
+
+    if options.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if options.compare is not None:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        sys.stderr.write('\n'.join(compare(report, baseline)) + '\n')
@@ -0,0 +1,84 @@
+"""Benchmarks for serving widget snapshots through the api"""
+
+from twisted.internet.defer import succeed
+from twisted.internet.task import Clock
+from twisted.web.test.requesthelper import DummyRequest
+
+from diamondash import utils
+from diamondash.backends.graphite import GraphiteRequestBatch
+from diamondash.server import DiamondashConfig, DiamondashServer
+
+from benchmarks.payloads import mk_target, mk_render_response
+from benchmarks.runner import benchmarks
+
+
+def mk_server(options):
+    return DiamondashServer(DiamondashConfig({
+        'backend': {
+            'type': 'diamondash.backends.graphite.GraphiteBackend',
+            'url': 'http://127.0.0.1:8080',
+        },
+        'dashboards': [{
+            'name': 'bench',
+            'widgets': [{
+                'name': 'bench-chart',
+                'type': 'diamondash.widgets.graph.GraphWidget',
+                'time_range': options.time_range,
+                'bucket_size': options.bucket_size,
+                # the stubbed render response always spans the whole time
+                # range, so each snapshot is measured as a full refresh
+                'incremental_fetch': False,
+                'metrics': [
+                    {'name': 'metric %d' % i, 'target': mk_target(i)}
+                    for i in xrange(options.targets)],
+            }],
+        }],
+    }))
+
+
+def stub_graphite(options):
+    """
+    Makes graphite render requests respond immediately with a synthetic
+    response instead of going over the network, and returns the clock used
+    to flush batched render requests.
+    """
+    body = mk_render_response(
+        options.targets, options.points, options.time_range)
+
+    response = {'body': body, 'status': '200', 'headers': {}}
+    utils.http_request = lambda *a, **kw: succeed(response)
+
+    clock = Clock()
+    GraphiteRequestBatch.clock = clock
+    return clock
+
+
+def setup_widget_snapshot(options, cached):
+    clock = stub_graphite(options)
+    server = mk_server(options)
+    dashboard = server.get_dashboard('bench')
+
+    def get_snapshot():
+        if not cached:
+            dashboard.snapshots.remove('bench-chart')
+
+        request = DummyRequest([])
+        d = server.api_get_widget_snapshot(request, 'bench', 'bench-chart')
+        clock.advance(0)
+
+        results = []
+        d.addBoth(results.append)
+        assert request.responseCode in (None, 200), request.written
+        return results[0]
+
+    return get_snapshot
+
+
+@benchmarks.register('server.api_get_widget_snapshot')
+def bench_api_get_widget_snapshot(options):
+    return setup_widget_snapshot(options, cached=False)
+
+
+@benchmarks.register('server.api_get_widget_snapshot.cached')
+def bench_api_get_widget_snapshot_cached(options):
+    return setup_widget_snapshot(options, cached=True)
@@ -0,0 +1,58 @@
+"""Benchmarks for turning backend responses into widget snapshots"""
+
+from diamondash import utils
+from diamondash.widgets.chart import ChartWidgetConfig, ChartWidget
+from diamondash.widgets.lvalue import LValueWidgetConfig, LValueWidget
+
+from benchmarks.payloads import mk_target, mk_render_response
+from benchmarks.runner import benchmarks
+
+
+BACKEND_CONFIG = {
+    'type': 'diamondash.backends.graphite.GraphiteBackend',
+    'url': 'http://127.0.0.1:8080',
+}
+
+
+def mk_metric_data(widget, targets, points, time_range):
+    """
+    Returns the metric data the widget's backend gives for a synthetic render
+    response. The datapoints aren't summarized, so that each metric has
+    ``points`` datapoints.
+    """
+    body = mk_render_response(targets, points, time_range)
+    return widget.backend.handle_backend_response(body)
+
+
+@benchmarks.register('chart.process_backend_response')
+def bench_chart_process_backend_response(options):
+    widget = ChartWidget(ChartWidgetConfig({
+        'name': 'bench-chart',
+        'time_range': options.time_range,
+        'bucket_size': options.bucket_size,
+        'backend': dict(BACKEND_CONFIG),
+        'metrics': [
+            {'name': 'metric %d' % i, 'target': mk_target(i)}
+            for i in xrange(options.targets)],
+    }))
+
+    metric_data = mk_metric_data(
+        widget, options.targets, options.points, options.time_range)
+
+    return lambda: widget.process_backend_response(metric_data)
+
+
+@benchmarks.register('lvalue.handle_backend_response')
+def bench_lvalue_handle_backend_response(options):
+    widget = LValueWidget(LValueWidgetConfig({
+        'name': 'bench-lvalue',
+        'time_range': options.time_range,
+        'backend': dict(BACKEND_CONFIG),
+        'target': mk_target(0),
+    }))
+
+    metric_data = mk_metric_data(
+        widget, 1, options.points, options.time_range * 2)
+    until_time = utils.now()
+
+    return lambda: widget.handle_backend_response(metric_data, until_time)
@@ -1,6 +1,7 @@
 from diamondash.backends.base import (
     BackendConfig,
     Backend,
+    BackendBatches,
     MetricConfig,
     Metric,
     BadBackendResponseError)
@@ -8,6 +9,7 @@ from diamondash.backends.base import (
 __all__ = [
     'BackendConfig',
     'Backend',
+    'BackendBatches',
     'MetricConfig',
     'Metric',
     'BadBackendResponseError']
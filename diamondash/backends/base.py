@@ -1,6 +1,7 @@
 from uuid import uuid4
 
 from diamondash.config import Config, ConfigError
+from diamondash.stats import null_stats
 
 
 class BackendConfig(Config):
@@ -10,8 +11,69 @@ class BackendConfig(Config):
 class Backend(object):
     CONFIG_CLS = BackendConfig
 
+    # The class used to batch together the requests of backends sharing the
+    # same batch key, or `None` if the backend's requests can't be batched
+    BATCH_CLS = None
+
     def __init__(self, config):
         self.config = config
+        self.batch = None
+
+        # The agent to make http requests with. If this is `None`, a new
+        # non-persistent agent is used for each request.
+        self.agent = None
+
+        # Records how long each stage of processing the backend's responses
+        # takes
+        self.stats = null_stats
+
+        # The circuit breaker guarding the backend's requests, or `None` if
+        # they aren't guarded
+        self.breaker = None
+
+        # The request limiter the backend's requests wait for, or `None` if
+        # they aren't limited
+        self.limiter = None
+
+        # The priority the backend's requests wait for the limiter with.
+        # Requests with lower priorities are made first.
+        self.priority = 0
+
+        # The store of rollups the backend's datapoints are summarized with,
+        # or `None` if they are summarized from the raw datapoints
+        self.rollups = None
+
+    def batch_key(self):
+        """
+        Returns the key identifying the backends whose requests can be
+        batched together with this backend's requests.
+        """
+        return self.config.get('url')
+
+
+class BackendBatches(object):
+    """
+    Groups backends by their batch keys so that backends sharing a key can
+    have their requests batched together.
+    """
+
+    def __init__(self):
+        self.batches = {}
+
+    def add_backend(self, backend):
+        if backend.BATCH_CLS is None:
+            return
+
+        key = (backend.BATCH_CLS, backend.batch_key())
+        batch = self.batches.get(key)
+
+        if batch is None:
+            batch = backend.BATCH_CLS(
+                backend.batch_key(), backend.agent, backend.breaker,
+                backend.limiter)
+            self.batches[key] = batch
+
+        backend.batch = batch
 
 
 class MetricConfig(Config):
@@ -1,20 +1,34 @@
 import re
 import json
+from math import ceil
+from collections import OrderedDict
 from urllib import urlencode
 from urlparse import urljoin
 
-from twisted.web import client
 from twisted.python import log
+from twisted.python.failure import Failure
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
 
 from diamondash import utils
 from diamondash.config import ConfigError
+from diamondash.stats import timer
 from diamondash.backends import (
-    processors, BackendConfig, Backend, MetricConfig, Metric)
+    processors, vectorized, BackendConfig, Backend, MetricConfig, Metric,
+    BadBackendResponseError)
 
 
 class GraphiteBackendConfig(BackendConfig):
     DEFAULTS = {
-        'time_alignment': 'round'
+        'time_alignment': 'round',
+
+        # render requests with urls longer than this are sent as POST
+        # requests instead, or always as GET requests if this is `None`
+        'max_url_length': 2000,
+
+        # render requests that haven't been responded to within this time
+        # are cancelled, or never if this is `None`
+        'timeout': '30s',
     }
 
     METRIC_UNDERRIDES = [
@@ -22,6 +36,8 @@ class GraphiteBackendConfig(BackendConfig):
         'null_filter',
         'time_alignment',
         'relative_time',
+        'summarizer_engine',
+        'consolidate',
     ]
 
     @classmethod
@@ -29,6 +45,9 @@ class GraphiteBackendConfig(BackendConfig):
         if 'url' not in config:
             raise ConfigError("GraphiteBackend needs a 'url' config field.")
 
+        if config['timeout'] is not None:
+            config['timeout'] = utils.parse_interval(config['timeout'])
+
         metric_underrides = dict(
             (k, config.pop(k))
             for k in cls.METRIC_UNDERRIDES if k in config)
@@ -42,8 +61,576 @@ class GraphiteBackendConfig(BackendConfig):
         return config
 
 
+def build_time_params(**params):
+    req_params = {}
+    if 'from_time' in params:
+        req_params['from'] = int(params['from_time'] / 1000)
+    if 'until_time' in params:
+        req_params['until'] = int(params['until_time'] / 1000)
+    if 'max_datapoints' in params:
+        req_params['maxDataPoints'] = params['max_datapoints']
+
+    req_params['format'] = 'json'
+    return req_params
+
+
+def build_render_params(targets, **params):
+    req_params = build_time_params(**params)
+    req_params['target'] = targets
+    return req_params
+
+
+def encode_targets(targets):
+    """Url-encodes the given targets as render request params"""
+    return urlencode([('target', target) for target in targets])
+
+
+def build_render_query(encoded_targets, **params):
+    """
+    Returns the query of a render request for the given already url-encoded
+    targets, so that targets only need to be encoded once, instead of for
+    every request.
+    """
+    encoded_params = urlencode(sorted(build_time_params(**params).items()))
+
+    if not encoded_targets:
+        return encoded_params
+
+    return '%s&%s' % (encoded_targets, encoded_params)
+
+
+def get_render_url(url):
+    return urljoin(url, 'render/')
+
+
+def build_render_url(url, targets, **params):
+    return '%s?%s' % (
+        get_render_url(url),
+        build_render_query(encode_targets(targets), **params))
+
+
+def request_render(render_url, query, max_url_length=None, timeout=None,
+                   agent=None, clock=reactor, breaker=None, limiter=None,
+                   priority=0):
+    """
+    Makes a render request with the given query. If putting the query in the
+    url would make the url longer than ``max_url_length``, the query is
+    sent as a form-encoded POST body instead, which graphite's render api
+    also accepts. If graphite hasn't responded within ``timeout``
+    milliseconds, the request is cancelled. If a circuit breaker is given,
+    the request is only made if the breaker allows it. If a request limiter
+    is given, the request waits with the given ``priority`` until the
+    limiter allows it to be made. The timeout includes the time spent
+    waiting for the limiter.
+    """
+    if limiter is not None:
+        d = limiter.run(
+            priority, request_render, render_url, query, max_url_length,
+            None, agent, clock, breaker)
+
+        if timeout is not None:
+            utils.add_timeout(d, timeout, clock)
+
+        return d
+
+    if breaker is not None:
+        return breaker.call(
+            request_render, render_url, query, max_url_length, timeout,
+            agent, clock)
+
+    url = '%s?%s' % (render_url, query)
+    if max_url_length is None or len(url) <= max_url_length:
+        d = utils.http_request(url, agent=agent)
+    else:
+        d = utils.http_request(
+            render_url,
+            data=query,
+            method='POST',
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            agent=agent)
+
+    if timeout is not None:
+        utils.add_timeout(d, timeout, clock)
+
+    return d
+
+
+def merge_max_datapoints(all_params, params):
+    """
+    Returns the max datapoints to ask for over the time window of the merged
+    request params, so that each of the requests still gets at least as many
+    datapoints per unit of time as it asked for.
+    """
+    now = utils.now()
+
+    def window(p):
+        return max(p.get('until_time', now) - p['from_time'], 1)
+
+    merged_window = window(params)
+    return max(
+        int(ceil(p['max_datapoints'] * merged_window / float(window(p))))
+        for p in all_params)
+
+
+def trim_datapoints(datapoints, from_time=None, until_time=None):
+    """
+    Drops the datapoints falling outside of the given time window. Times are
+    floored to the nearest second, since graphite's render api accepts times
+    in seconds.
+    """
+    from_time = (from_time // 1000) * 1000 if from_time is not None else None
+    until_time = (
+        (until_time // 1000) * 1000 if until_time is not None else None)
+
+    return (
+        (x, y) for x, y in datapoints
+        if (from_time is None or x >= from_time)
+        and (until_time is None or x <= until_time))
+
+
+_whitespace_re = re.compile(r'\s*')
+_datapoint_re = re.compile(r'\[\s*([^\[\],\s]+)\s*,\s*([^\[\],\s]+)\s*\]')
+_datapoints_end_re = re.compile(r'\]\s*\]')
+_json_decoder = json.JSONDecoder()
+
+
+def parse_json_number(s):
+    if s == 'null':
+        return None
+
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+
+class GraphiteSeries(object):
+    """
+    The datapoints of a series in a graphite render response, decoded lazily
+    from the response data into `(x, y)` pairs as they are iterated over,
+    with x values converted to milliseconds.
+    """
+
+    def __init__(self, data, start, end):
+        self.data = data
+        self.start = start
+        self.end = end
+
+    def __iter__(self):
+        for match in _datapoint_re.finditer(self.data, self.start, self.end):
+            y, x = match.groups()
+            yield parse_json_number(x) * 1000, parse_json_number(y)
+
+
+class GraphiteResponseDecoder(object):
+    """
+    Decodes graphite render response data into a dict of `GraphiteSeries`
+    keyed by target, without decoding each series' datapoints up front.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def skip_whitespace(self):
+        self.pos = _whitespace_re.match(self.data, self.pos).end()
+
+    def peek(self):
+        self.skip_whitespace()
+        return self.data[self.pos:self.pos + 1]
+
+    def expect(self, *chars):
+        c = self.peek()
+        if c not in chars:
+            raise BadBackendResponseError(
+                "Expected one of %r at position %d of graphite response, "
+                "found %r" % (chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def decode_value(self):
+        self.skip_whitespace()
+        try:
+            value, self.pos = _json_decoder.raw_decode(self.data, self.pos)
+        except ValueError, e:
+            raise BadBackendResponseError(
+                "Could not decode graphite response: %s" % e)
+        return value
+
+    def decode_datapoints(self):
+        self.expect('[')
+        start = self.pos
+
+        if self.peek() == ']':
+            self.pos += 1
+            return GraphiteSeries(self.data, start, self.pos)
+
+        match = _datapoints_end_re.search(self.data, self.pos)
+        if match is None:
+            raise BadBackendResponseError(
+                "Unterminated datapoints in graphite response")
+
+        self.pos = match.end()
+        return GraphiteSeries(self.data, start, self.pos)
+
+    def decode_metric(self):
+        metric = {}
+        self.expect('{')
+
+        if self.peek() == '}':
+            self.pos += 1
+            return metric
+
+        while True:
+            key = self.decode_value()
+            self.expect(':')
+
+            if key == 'datapoints':
+                metric[key] = self.decode_datapoints()
+            else:
+                metric[key] = self.decode_value()
+
+            if self.expect(',', '}') == '}':
+                return metric
+
+    def decode(self):
+        series_by_target = {}
+        self.expect('[')
+
+        if self.peek() == ']':
+            return series_by_target
+
+        while True:
+            metric = self.decode_metric()
+            series_by_target[metric.get('target')] = metric.get(
+                'datapoints', [])
+
+            if self.expect(',', ']') == ']':
+                return series_by_target
+
+
+def decode_render_response(response, backends, fetch_elapsed):
+    """
+    Decodes a render response, recording how long it took to fetch and
+    decode for each of the backends it was requested for.
+    """
+    fetch_time = fetch_elapsed()
+    elapsed = timer()
+    datapoints_by_target = GraphiteBackend.decode_response(response['body'])
+    decode_time = elapsed()
+
+    for backend in backends:
+        backend.stats.record('fetch', fetch_time)
+        backend.stats.record('decode', decode_time)
+
+    return datapoints_by_target
+
+
+class GraphiteRequestBatch(object):
+    """
+    Collects the data requests made by graphite backends sharing the same
+    url during a single reactor iteration, makes a single render request
+    for each group of requests with overlapping time windows of similar
+    lengths (asking for each target shared between the requests only once),
+    and splits the response back up between the backends that made the
+    requests.
+    """
+
+    clock = reactor
+
+    # requests are only batched together if the time window of the batched
+    # render request is at most this many times as long as each of their own
+    # windows, so that requests for a short window aren't widened to the
+    # window of a much longer one
+    MAX_WINDOW_RATIO = 2
+
+    def __init__(self, url, agent=None, breaker=None, limiter=None):
+        self.url = url
+        self.render_url = get_render_url(url)
+        self.agent = agent
+        self.breaker = breaker
+        self.limiter = limiter
+        self.queue = []
+        self.delayed_flush = None
+
+        # the render requests that have been sent but not responded to yet,
+        # along with the batched requests waiting on each
+        self.in_flight = []
+
+    def get_data(self, backend, **params):
+        d = Deferred(self.cancel_request)
+        self.queue.append((backend, params, d))
+
+        if self.delayed_flush is None:
+            self.delayed_flush = self.clock.callLater(0, self.flush)
+
+        return d
+
+    def cancel_request(self, d):
+        """
+        Removes a cancelled request from the queue if it hasn't been sent
+        yet, otherwise cancels the render request it was sent in once all of
+        the requests batched into that render request have been cancelled.
+        """
+        self.queue = [r for r in self.queue if r[2] is not d]
+
+        for render_d, requests in self.in_flight:
+            if not any(r[2] is d for r in requests):
+                continue
+
+            if all(r[2] is d or r[2].called for r in requests):
+                render_d.cancel()
+
+    def flush(self):
+        self.delayed_flush = None
+        queue, self.queue = self.queue, []
+
+        for requests in self.group_requests(queue):
+            self.send_requests(requests)
+
+    @classmethod
+    def group_requests(cls, requests):
+        """
+        Groups together requests whose time windows overlap, as long as the
+        window spanning the group stays within `MAX_WINDOW_RATIO` times the
+        length of each of the group's windows. Requests without an until time
+        are taken to be requesting data up until now.
+        """
+        now = utils.now()
+
+        def window(request):
+            backend, params, d = request
+            return params.get('from_time', 0), params.get('until_time', now)
+
+        requests = sorted(requests, key=lambda r: window(r)[0])
+
+        groups = []
+        group_from_time = group_until_time = shortest = None
+        for request in requests:
+            from_time, until_time = window(request)
+            length = max(until_time - from_time, 1)
+
+            if groups and from_time <= group_until_time:
+                merged_until_time = max(group_until_time, until_time)
+                merged_shortest = min(shortest, length)
+
+                if (merged_until_time - group_from_time
+                        <= cls.MAX_WINDOW_RATIO * merged_shortest):
+                    groups[-1].append(request)
+                    group_until_time = merged_until_time
+                    shortest = merged_shortest
+                    continue
+
+            groups.append([request])
+            group_from_time, group_until_time = from_time, until_time
+            shortest = length
+
+        return groups
+
+    @staticmethod
+    def merge_params(requests):
+        """
+        Returns the request params spanning the time windows of all of the
+        given requests.
+        """
+        params = {}
+        all_params = [p for backend, p, d in requests]
+
+        if all('from_time' in p for p in all_params):
+            params['from_time'] = min(p['from_time'] for p in all_params)
+
+        if all('until_time' in p for p in all_params):
+            params['until_time'] = max(p['until_time'] for p in all_params)
+
+        if ('from_time' in params
+                and all('max_datapoints' in p for p in all_params)):
+            params['max_datapoints'] = merge_max_datapoints(all_params, params)
+
+        return params
+
+    @staticmethod
+    def plan_targets(requests):
+        """
+        Returns the url-encoded targets of all of the given requests, asking
+        for each target only once however many of the requests' metrics
+        display it, along with whether any of the targets are asked for
+        without being processed by graphite.
+
+        Series are aliased to their targets, so metrics asking graphite to
+        summarize or consolidate the same target differently can't each be
+        given their own series. The target is asked for unprocessed instead,
+        and each of the metrics summarizes the raw series itself.
+        """
+        if len(requests) == 1:
+            [(backend, params, d)] = requests
+            return backend.encoded_targets, False
+
+        metrics_by_target = OrderedDict()
+        for backend, params, d in requests:
+            for metric in backend.metrics:
+                metrics_by_target.setdefault(
+                    metric.config['target'], []).append(metric)
+
+        encoded_targets = []
+        raw = False
+
+        for target, metrics in metrics_by_target.iteritems():
+            if len(set(m.aliased_target() for m in metrics)) == 1:
+                encoded_targets.append(metrics[0].encoded_target)
+            else:
+                raw = True
+                encoded_targets.append(
+                    encode_targets([GraphiteMetric.alias_target(target)]))
+
+        return '&'.join(encoded_targets), raw
+
+    @staticmethod
+    def merge_min_config(requests, key):
+        """
+        Returns the smallest value of the given config field for the backends
+        making the given requests, ignoring backends without a value.
+        """
+        values = [
+            backend.config[key] for backend, _, _ in requests
+            if backend.config[key] is not None]
+
+        return min(values) if values else None
+
+    @classmethod
+    def merge_max_url_lengths(cls, requests):
+        """
+        Returns the shortest max url length of the backends making the given
+        requests.
+        """
+        return cls.merge_min_config(requests, 'max_url_length')
+
+    @classmethod
+    def merge_timeouts(cls, requests):
+        """
+        Returns the shortest timeout of the backends making the given
+        requests.
+        """
+        return cls.merge_min_config(requests, 'timeout')
+
+    @classmethod
+    def merge_priorities(cls, requests):
+        """
+        Returns the highest priority (lowest number) of the backends making
+        the given requests, so that a render request waits no longer than
+        the most urgent request batched into it would.
+        """
+        return min(backend.priority for backend, _, _ in requests)
+
+    def send_requests(self, requests):
+        params = self.merge_params(requests)
+        targets, raw = self.plan_targets(requests)
+
+        # graphite averages the datapoints of series it consolidates unless
+        # told otherwise, which would be wrong for the raw series of metrics
+        # aggregated differently
+        if raw:
+            params.pop('max_datapoints', None)
+
+        query = build_render_query(targets, **params)
+
+        elapsed = timer()
+        d = request_render(
+            self.render_url, query,
+            max_url_length=self.merge_max_url_lengths(requests),
+            timeout=self.merge_timeouts(requests),
+            agent=self.agent,
+            clock=self.clock,
+            breaker=self.breaker,
+            limiter=self.limiter,
+            priority=self.merge_priorities(requests))
+
+        in_flight = (d, requests)
+        self.in_flight.append(in_flight)
+
+        def landed(result):
+            self.in_flight.remove(in_flight)
+            return result
+
+        d.addBoth(landed)
+        d.addCallback(
+            decode_render_response,
+            [backend for backend, _, _ in requests],
+            elapsed)
+        d.addCallbacks(
+            self.split_response, self.fail_requests,
+            callbackArgs=(requests, params), errbackArgs=(requests,))
+        return d
+
+    @staticmethod
+    def share_series(datapoints_by_target, requests):
+        """
+        Decodes the series wanted by more than one of the given requests up
+        front, so that a series shared between widgets is only decoded once
+        instead of once for each widget it is fanned out to.
+        """
+        wanted = {}
+        for backend, _, _ in requests:
+            for target in backend.metrics_by_target:
+                wanted[target] = wanted.get(target, 0) + 1
+
+        return dict(
+            (target, list(series) if wanted.get(target, 0) > 1 else series)
+            for target, series in datapoints_by_target.iteritems())
+
+    def split_response(self, datapoints_by_target, requests, params):
+        # a bad datapoint in a shared series would otherwise leave every
+        # request waiting on the response forever
+        try:
+            datapoints_by_target = self.share_series(
+                datapoints_by_target, requests)
+        except Exception:
+            self.fail_requests(Failure(), requests)
+            return
+
+        for backend, backend_params, d in requests:
+            # the request could have been cancelled while it was in flight
+            if d.called:
+                continue
+
+            try:
+                result = backend.process_response(
+                    self.trim_response(
+                        datapoints_by_target, backend, params, backend_params),
+                    **backend_params)
+            except Exception:
+                d.errback(Failure())
+            else:
+                d.callback(result)
+
+    @staticmethod
+    def trim_response(datapoints_by_target, backend, params, backend_params):
+        """
+        Trims the datapoints requested by the backend to the backend's own
+        time window if the window used for the batch was larger.
+        """
+        from_time = backend_params.get('from_time')
+        until_time = backend_params.get('until_time')
+
+        if (from_time == params.get('from_time')
+                and until_time == params.get('until_time')):
+            return datapoints_by_target
+
+        return dict(
+            (target, trim_datapoints(
+                datapoints_by_target.get(target, []), from_time, until_time))
+            for target in backend.metrics_by_target)
+
+    def fail_requests(self, failure, requests):
+        for backend, params, d in requests:
+            if not d.called:
+                d.errback(failure)
+
+
 class GraphiteBackend(Backend):
     CONFIG_CLS = GraphiteBackendConfig
+    BATCH_CLS = GraphiteRequestBatch
+
+    clock = reactor
 
     def __init__(self, config):
         super(GraphiteBackend, self).__init__(config)
@@ -51,26 +638,28 @@ class GraphiteBackend(Backend):
         self.metrics = []
         self.metrics_by_target = {}
 
+        # the url-encoded targets of the backend's metrics, so that only the
+        # time params need to be encoded for each request
+        self.encoded_targets = ''
+
+        # whether graphite can consolidate the datapoints of all of the
+        # backend's metrics when asked for fewer datapoints
+        self.consolidatable = True
+        self.render_url = get_render_url(self.config['url'])
+
         for metric_config in self.config['metrics']:
             self.add_metric(metric_config)
 
-    def build_request_params(self, **params):
-        req_params = {}
-        if 'from_time' in params:
-            req_params['from'] = int(params['from_time'] / 1000)
-        if 'until_time' in params:
-            req_params['until'] = int(params['until_time'] / 1000)
+    def aliased_targets(self):
+        return [m.aliased_target() for m in self.metrics]
 
-        req_params.update({
-            'format': 'json',
-            'target': [m.aliased_target() for m in self.metrics]
-        })
-        return req_params
+    def build_request_params(self, **params):
+        return build_render_params(self.aliased_targets(), **params)
 
     def build_request_url(self, **params):
-        req_params = self.build_request_params(**params)
-        render_url = "render/?%s" % urlencode(req_params, True)
-        return urljoin(self.config['url'], render_url)
+        return '%s?%s' % (
+            self.render_url,
+            build_render_query(self.encoded_targets, **params))
 
     def add_metric(self, config):
         target = config['target']
@@ -83,29 +672,71 @@ class GraphiteBackend(Backend):
         metric = GraphiteMetric(config)
         self.metrics.append(metric)
         self.metrics_by_target[target] = metric
+        self.encoded_targets = '&'.join(
+            m.encoded_target for m in self.metrics)
+        self.consolidatable = all(m.consolidatable for m in self.metrics)
+
+    @staticmethod
+    def decode_response(data):
+        """
+        Decodes graphite render response data into a dict of lazily decoded
+        `(x, y)` datapoints keyed by target.
+        """
+        return GraphiteResponseDecoder(data).decode()
 
     def handle_backend_response(self, data, **request_params):
         """
         Accepts graphite render response data and processes it into a
         normalized format.
         """
-        data = json.loads(data)
-
-        datapoints_by_target = dict(
-            (metric['target'], metric['datapoints']) for metric in data)
+        return self.process_response(
+            self.decode_response(data), **request_params)
 
+    def process_response(self, datapoints_by_target, **request_params):
+        """
+        Processes the raw datapoints of each of the backend's metrics into a
+        normalized format.
+        """
         output = []
+        null_filter_time = 0
+        summarize_time = 0
+
         for metric in self.metrics:
-            datapoints = metric.process_datapoints(
-                datapoints_by_target.get(metric.config['target'], []),
-                **request_params)
+            elapsed = timer()
+            datapoints = metric.filter_nulls(
+                datapoints_by_target.get(metric.config['target'], []))
+            null_filter_time += elapsed()
+
+            elapsed = timer()
+            datapoints = self.summarize(metric, datapoints, **request_params)
+            summarize_time += elapsed()
+
             output.append({
                 'id': metric.config['id'],
                 'datapoints': datapoints,
             })
 
+        self.stats.record('null_filter', null_filter_time)
+        self.stats.record('summarize', summarize_time)
         return output
 
+    def summarize(self, metric, datapoints, **request_params):
+        """
+        Summarizes the datapoints of one of the backend's metrics, using the
+        rollups kept for the metric's series if the backend has a rollup
+        store.
+        """
+        if self.rollups is None or 'from_time' not in request_params:
+            return metric.summarize(datapoints, **request_params)
+
+        key = (
+            self.config['url'],
+            metric.config['target'],
+            metric.config['null_filter'])
+
+        return self.rollups.summarize(
+            key, metric.summarizer, request_params['from_time'], datapoints)
+
     def get_data(self, **params):
         if 'from_time' in params:
             params['from_time'] = utils.absolute_time(params['from_time'])
@@ -113,9 +744,25 @@ class GraphiteBackend(Backend):
         if 'until_time' in params:
             params['until_time'] = utils.absolute_time(params['until_time'])
 
-        request_url = self.build_request_url(**params)
-        d = client.getPage(request_url)
-        d.addCallback(self.handle_backend_response, **params)
+        if not self.consolidatable:
+            params.pop('max_datapoints', None)
+
+        if self.batch is not None:
+            return self.batch.get_data(self, **params)
+
+        elapsed = timer()
+        d = request_render(
+            self.render_url,
+            build_render_query(self.encoded_targets, **params),
+            max_url_length=self.config['max_url_length'],
+            timeout=self.config['timeout'],
+            agent=self.agent,
+            clock=self.clock,
+            breaker=self.breaker,
+            limiter=self.limiter,
+            priority=self.priority)
+        d.addCallback(decode_render_response, [self], elapsed)
+        d.addCallback(self.process_response, **params)
         return d
 
 
@@ -123,13 +770,24 @@ class GraphiteMetricConfig(MetricConfig):
     DEFAULTS = {
         'null_filter': 'skip',
         'time_alignment': 'round',
-        'relative_time': False
+        'relative_time': False,
+        'summarizer_engine': 'python',
+
+        # whether graphite may consolidate the metric's datapoints when it is
+        # asked for fewer datapoints than it has. Graphite's consolidated
+        # datapoints can span the boundaries of the metric's buckets, so this
+        # trades the accuracy of the buckets for smaller responses.
+        'consolidate': False,
     }
 
     @classmethod
     def parse(cls, config):
         config = super(GraphiteMetricConfig, cls).parse(config)
 
+        if config['summarizer_engine'] not in summarizer_engines:
+            raise ConfigError(
+                "Unknown summarizer engine '%s'" % config['summarizer_engine'])
+
         config['bucket_size'] = utils.parse_interval(config['bucket_size'])
 
         config.setdefault(
@@ -150,33 +808,127 @@ class GraphiteMetric(Metric):
         self.null_filter = processors.null_filters.get(
             self.config['null_filter'])
 
-        self.summarizer = processors.summarizers.get(
+        summarizers = summarizer_engines[self.config['summarizer_engine']]
+        self.summarizer = summarizers.get(
             self.config['agg_method'],
             self.config['time_alignment'],
             self.config['bucket_size'],
             relative=self.config['relative_time'])
 
+        self.consolidate_by = consolidation_funcs.get(
+            self.config['agg_method'])
+
+        # graphite's consolidated datapoints wouldn't line up with the
+        # buckets it summarizes into
+        self.consolidatable = (
+            self.config['consolidate']
+            and self.consolidate_by is not None
+            and self.graphite_bucket_size() is None)
+
+        self.aliased = self.alias_target(
+            self.render_target(), self.config['target'])
+        self.encoded_target = encode_targets([self.aliased])
+
     @staticmethod
-    def alias_target(target):
-        return "alias(%s, '%s')" % (target, target)
+    def alias_target(target, name=None):
+        return "alias(%s, '%s')" % (target, name or target)
 
     def aliased_target(self):
-        return self.alias_target(self.config['target'])
+        return self.aliased
+
+    def graphite_bucket_size(self):
+        """
+        Returns the size (in seconds) of the buckets graphite should
+        summarize the metric's datapoints into, or `None` if graphite can't
+        summarize them.
+
+        Graphite's buckets are aligned to the start of each interval, so
+        for metrics with round time alignment, graphite summarizes into
+        half-sized buckets, two of which make up each rounded bucket when
+        they are summarized again locally. Buckets aligned relative to the
+        start of the time range aren't summarized by graphite, since the
+        time range graphite is asked for can be widened by request
+        batching.
+        """
+        if self.config['summarizer_engine'] != 'graphite':
+            return None
+
+        if self.config['relative_time']:
+            return None
+
+        bucket_size = self.config['bucket_size']
+        if self.config['time_alignment'] == 'round':
+            bucket_size = bucket_size / 2
+
+        if not bucket_size or bucket_size % 1000:
+            return None
+
+        return bucket_size // 1000
+
+    def render_target(self):
+        """
+        Returns the target to ask graphite for, wrapped in a `summarize()`
+        call if graphite should summarize the metric's datapoints, and in a
+        `consolidateBy()` call if graphite may consolidate them and would
+        otherwise do so differently to how the metric aggregates them.
+        """
+        target = self.config['target']
+
+        bucket_size = self.graphite_bucket_size()
+        if bucket_size is not None:
+            target = "summarize(%s, '%ds', '%s')" % (
+                target, bucket_size, self.config['agg_method'])
+
+        if self.consolidatable and self.consolidate_by != 'average':
+            target = "consolidateBy(%s, '%s')" % (target, self.consolidate_by)
+
+        return target
 
     def process_datapoints(self, datapoints, **params):
         """
-        Takes in datapoints received from graphite, performs any processing
-        that needs to be performed for a particular metric (eg. null
-        filtering), and returns the processed datapoints.
+        Takes in `(x, y)` datapoints received from graphite, performs any
+        processing that needs to be performed for a particular metric (eg.
+        null filtering), and returns the processed datapoints.
+        """
+        return self.summarize(self.filter_nulls(datapoints), **params)
+
+    def filter_nulls(self, datapoints):
+        """
+        Returns a list of the given datapoints with nulls filtered out.
+        Datapoints from graphite are decoded lazily, so this is where most of
+        their decoding happens.
         """
-        # convert to internal format
-        datapoints = [{'x': x * 1000, 'y': y} for y, x in datapoints]
-        datapoints = self.null_filter(datapoints)
+        return list(self.null_filter(datapoints))
 
+    def summarize(self, datapoints, **params):
+        """
+        Summarizes the datapoints into buckets if a time window to summarize
+        over was given, otherwise just formats the datapoints for output.
+        """
         if 'from_time' in params:
-            datapoints = self.summarizer(params['from_time'], datapoints)
+            return self.summarizer(params['from_time'], datapoints)
+
+        return [{'x': x, 'y': y} for x, y in datapoints]
+
+
+summarizer_engines = {
+    'python': processors.summarizers,
+    'vectorized': vectorized.summarizers,
+    # graphite summarizes the datapoints before they are sent, leaving only a
+    # handful of datapoints to be summarized again locally
+    'graphite': processors.summarizers,
+}
+
 
-        return datapoints
+# The functions graphite can consolidate datapoints with when it is asked
+# for fewer datapoints than it has, keyed by the aggregation methods they
+# match. Graphite averages datapoints unless told otherwise.
+consolidation_funcs = {
+    'sum': 'sum',
+    'max': 'max',
+    'min': 'min',
+    'avg': 'average',
+}
 
 
 # Borrowed from the bit of pyparsing, the graphite expression parser uses.
@@ -3,16 +3,22 @@ from functools import partial
 from diamondash import utils
 
 
+# Null filters and summarizers take in iterables of `(x, y)` datapoints so
+# that datapoints can be fed through them as they are decoded, without
+# needing to build up intermediate lists of datapoints. Summarizers output
+# lists of `{'x': x, 'y': y}` datapoints.
+
+
 def skip_nulls(datapoints):
-    return [
-        d for d in datapoints
-        if d['y'] is not None and d['x'] is not None]
+    return (
+        (x, y) for x, y in datapoints
+        if y is not None and x is not None)
 
 
 def zeroize_nulls(datapoints):
-    return [
-        d if d['y'] is not None else {'x': d['x'], 'y': 0}
-        for d in datapoints if d['x'] is not None]
+    return (
+        (x, y if y is not None else 0)
+        for x, y in datapoints if x is not None)
 
 
 def agg_max(vals):
@@ -24,7 +30,7 @@ def agg_min(vals):
 
 
 def agg_avg(vals):
-    return sum(vals) / len(vals) if vals else 0
+    return float(sum(vals)) / len(vals) if vals else 0
 
 
 class Summarizer(object):
@@ -46,22 +52,24 @@ class LastDatapointSummarizer(Summarizer):
         step = self.align_time(from_time, from_time)
 
         results = []
-        if not datapoints:
+        it = iter(datapoints)
+
+        try:
+            prev_x, prev_y = next(it)
+        except StopIteration:
             return results
 
-        it = iter(datapoints)
-        prev = next(it)
-        for curr in it:
-            aligned_x = self.align_time(curr['x'], from_time)
+        for x, y in it:
+            aligned_x = self.align_time(x, from_time)
             if aligned_x > step:
-                results.append({'x': step, 'y': prev['y']})
+                results.append({'x': step, 'y': prev_y})
                 step = aligned_x
-            prev = curr
+            prev_x, prev_y = x, y
 
         # add the last datapoint
         results.append({
-            'x': self.align_time(prev['x'], from_time),
-            'y': prev['y']
+            'x': self.align_time(prev_x, from_time),
+            'y': prev_y
         })
 
         return results
@@ -77,21 +85,19 @@ class AggregatingSummarizer(Summarizer):
         step = self.align_time(from_time, from_time)
 
         results = []
-        if not datapoints:
-            return results
-
         bucket = []
-        for datapoint in datapoints:
-            aligned_x = self.align_time(datapoint['x'], from_time)
+        for x, y in datapoints:
+            aligned_x = self.align_time(x, from_time)
             if aligned_x > step:
                 if bucket:
                     results.append({'x': step, 'y': self.aggregator(bucket)})
                 bucket = []
                 step = aligned_x
-            bucket.append(datapoint['y'])
+            bucket.append(y)
 
         # add the aggregation result of the last bucket
-        results.append({'x': step, 'y': self.aggregator(bucket)})
+        if bucket:
+            results.append({'x': step, 'y': self.aggregator(bucket)})
 
         return results
 
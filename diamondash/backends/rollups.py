@@ -0,0 +1,317 @@
+# -*- test-case-name: diamondash.backends.tests.test_rollups -*-
+
+"""
+A store of recent datapoints and their rollups, shared by the summarizers
+summarizing the same series at different bucket sizes.
+
+Each series keeps its recent raw datapoints along with rollups of them at
+each of the store's bucket sizes. A rollup holds the count, sum, min and max
+of a bucket's datapoints, so the buckets of an aggregating summarizer can be
+built from the rollups of the coarsest bucket size evenly dividing them
+instead of aggregating every raw datapoint again for each request.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import izip, imap, islice
+from operator import ge
+
+from diamondash import utils
+from diamondash.backends import processors
+
+
+def combine_sum(rollups):
+    return sum(r[1] for r in rollups)
+
+
+def combine_max(rollups):
+    return max(r[3] for r in rollups)
+
+
+def combine_min(rollups):
+    return min(r[2] for r in rollups)
+
+
+def combine_avg(rollups):
+    return float(sum(r[1] for r in rollups)) / sum(r[0] for r in rollups)
+
+
+# functions combining (count, sum, min, max) rollups into the result of an
+# aggregator, keyed by the aggregators they match
+combiners = {
+    processors.aggregators['sum']: combine_sum,
+    processors.aggregators['max']: combine_max,
+    processors.aggregators['min']: combine_min,
+    processors.aggregators['avg']: combine_avg,
+}
+
+
+def rollup(ys):
+    return (len(ys), sum(ys), min(ys), max(ys))
+
+
+class RollupSeries(object):
+    """
+    The recent datapoints of a series, along with the rollups of each of
+    the buckets of the given bucket sizes that have been asked for.
+    """
+
+    def __init__(self, bucket_sizes):
+        # the series' datapoints, as parallel lists of x and y values sorted
+        # by x value
+        self.xs = []
+        self.ys = []
+
+        # bucket size -> {bucket start -> (count, sum, min, max)}, with
+        # buckets aligned to the unix epoch
+        self.rollups = dict((size, {}) for size in bucket_sizes)
+
+    def size(self):
+        """
+        Returns the number of datapoints and rollups the series is keeping.
+        """
+        return len(self.xs) + sum(len(r) for r in self.rollups.itervalues())
+
+    def update(self, xs, ys):
+        """
+        Replaces the datapoints falling in the time window spanned by the
+        given datapoints, dropping the rollups of the buckets whose
+        datapoints have changed.
+        """
+        i = bisect_left(self.xs, xs[0])
+        n = len(self.xs) - i
+
+        # usually the window has only moved forwards, leaving the datapoints
+        # already kept unchanged, so only the newer datapoints need adding
+        if (0 < n <= len(xs)
+                and self.xs[i:] == xs[:n]
+                and self.ys[i:] == ys[:n]):
+            self.xs.extend(xs[n:])
+            self.ys.extend(ys[n:])
+            self.drop_rollups(xs[n:])
+            return
+
+        j = bisect_right(self.xs, xs[-1])
+
+        old = dict(izip(self.xs[i:j], self.ys[i:j]))
+        new = dict(izip(xs, ys))
+
+        changed = [x for x, y in old.iteritems() if new.get(x, y) != y]
+        changed.extend(x for x in old if x not in new)
+        changed.extend(x for x in new if x not in old)
+
+        self.xs[i:j] = xs
+        self.ys[i:j] = ys
+        self.drop_rollups(changed)
+
+    def drop_rollups(self, xs):
+        """
+        Drops the rollups of the buckets the given datapoint times fall in.
+        """
+        for size, rollups in self.rollups.iteritems():
+            for x in xs:
+                rollups.pop(x - x % size, None)
+
+    def trim(self, until_time):
+        """
+        Drops the datapoints older than ``until_time``, along with the
+        rollups of the buckets they fall in.
+        """
+        i = bisect_left(self.xs, until_time)
+        del self.xs[:i]
+        del self.ys[:i]
+
+        for size, rollups in self.rollups.iteritems():
+            for start in [s for s in rollups if s < until_time]:
+                del rollups[start]
+
+    def get_rollup(self, size, start):
+        """
+        Returns the rollup of the bucket of the given size starting at
+        ``start``, or `None` if the bucket has no datapoints. Rollups are
+        built from the rollups of the largest smaller bucket size evenly
+        dividing ``size``, or from the raw datapoints if there isn't one.
+        Only the rollups of buckets with datapoints are kept.
+        """
+        rollups = self.rollups[size]
+        result = rollups.get(start)
+
+        if result is None:
+            finer = [s for s in self.rollups if s < size and size % s == 0]
+
+            if finer:
+                finer_size = max(finer)
+                parts = [
+                    self.get_rollup(finer_size, s)
+                    for s in xrange(start, start + size, finer_size)]
+                parts = [r for r in parts if r is not None]
+                if parts:
+                    result = (
+                        sum(r[0] for r in parts),
+                        sum(r[1] for r in parts),
+                        min(r[2] for r in parts),
+                        max(r[3] for r in parts))
+            else:
+                i = bisect_left(self.xs, start)
+                j = bisect_left(self.xs, start + size)
+                ys = self.ys[i:j]
+                if ys:
+                    result = rollup(ys)
+
+            if result is not None:
+                rollups[start] = result
+
+        return result
+
+
+class RollupStore(object):
+    """
+    Keeps the datapoints and rollups of the series summarized most recently,
+    evicting the least recently summarized series once more than
+    ``max_points`` datapoints and rollups are being kept. Datapoints older
+    than ``retention`` milliseconds before the latest datapoint of their
+    series are dropped.
+    """
+
+    def __init__(self, bucket_sizes=(300000, 3600000), max_points=1000000,
+                 retention=604800000):
+        self.bucket_sizes = sorted(bucket_sizes)
+        self.max_points = max_points
+        self.retention = retention
+
+        # key -> series, from least to most recently summarized
+        self.series = OrderedDict()
+        self.points = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def rollup_size(self, summarizer):
+        """
+        Returns the largest of the store's bucket sizes whose buckets evenly
+        divide the summarizer's buckets, or `None` if the summarizer's
+        buckets can't be built from rollups.
+        """
+        if not isinstance(summarizer, processors.AggregatingSummarizer):
+            return None
+
+        if summarizer.relative or summarizer.aggregator not in combiners:
+            return None
+
+        offset = self.bucket_offset(summarizer)
+        if offset is None:
+            return None
+
+        sizes = [
+            size for size in self.bucket_sizes
+            if summarizer.bucket_size % size == 0 and offset % size == 0]
+
+        return max(sizes) if sizes else None
+
+    @staticmethod
+    def bucket_offset(summarizer):
+        """
+        Returns how far (in milliseconds) the start of each of the
+        summarizer's buckets is from the time it is aligned to, or `None` if
+        the summarizer's time alignment isn't known.
+        """
+        if summarizer.time_aligner is utils.floor_time:
+            return 0
+
+        if summarizer.time_aligner is utils.round_time:
+            return summarizer.bucket_size / 2.0
+
+        return None
+
+    def get_series(self, key):
+        series = self.series.pop(key, None)
+
+        if series is None:
+            series = RollupSeries(self.bucket_sizes)
+
+        self.series[key] = series
+        return series
+
+    def evict(self):
+        while self.points > self.max_points and self.series:
+            _, series = self.series.popitem(last=False)
+            self.points -= series.size()
+            self.evictions += 1
+
+    def summarize(self, key, summarizer, from_time, datapoints):
+        """
+        Summarizes the given datapoints of the series identified by ``key``
+        the same way ``summarizer`` would, building the summarizer's buckets
+        from the series' rollups where the given datapoints span the whole
+        bucket.
+        """
+        size = self.rollup_size(summarizer)
+        if size is None:
+            return summarizer(from_time, datapoints)
+
+        datapoints = list(datapoints)
+        if not datapoints:
+            return []
+
+        xs, ys = map(list, izip(*datapoints))
+        offset = self.bucket_offset(summarizer)
+        first = summarizer.align_time(xs[0], from_time)
+        last = summarizer.align_time(xs[-1], from_time)
+
+        # only sorted datapoints after the start of the first bucket can be
+        # split into buckets by their times alone
+        if (first < summarizer.align_time(from_time, from_time)
+                or first - offset < 0
+                or any(imap(ge, xs, islice(xs, 1, None)))):
+            return summarizer(from_time, datapoints)
+
+        series = self.get_series(key)
+        before = series.size()
+        series.update(xs, ys)
+
+        results = self.build_buckets(
+            series, summarizer, size, offset, first, last, xs, ys)
+
+        series.trim(xs[-1] - self.retention)
+        self.points += series.size() - before
+        self.evict()
+        return results
+
+    def build_buckets(self, series, summarizer, size, offset, first, last,
+                      xs, ys):
+        aggregator = summarizer.aggregator
+        combine = combiners[aggregator]
+        bucket_size = summarizer.bucket_size
+
+        results = []
+        for x in xrange(int(first), int(last) + 1, bucket_size):
+            start = int(x - offset)
+            end = start + bucket_size
+
+            # the series only holds the given datapoints for buckets that
+            # lie within the time window the datapoints span
+            if xs[0] <= start and end <= xs[-1]:
+                self.hits += 1
+                rollups = [
+                    series.get_rollup(size, s)
+                    for s in xrange(start, end, size)]
+                rollups = [r for r in rollups if r is not None]
+                if rollups:
+                    results.append({'x': x, 'y': combine(rollups)})
+            else:
+                self.misses += 1
+                bucket = ys[bisect_left(xs, start):bisect_left(xs, end)]
+                if bucket:
+                    results.append({'x': x, 'y': aggregator(bucket)})
+
+        return results
+
+    def get_stats(self):
+        return {
+            'series': len(self.series),
+            'points': self.points,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
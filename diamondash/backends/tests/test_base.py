@@ -2,7 +2,7 @@ from twisted.trial import unittest
 
 from diamondash import utils
 from diamondash.config import ConfigError
-from diamondash.backends import MetricConfig
+from diamondash.backends import Backend, BackendBatches, MetricConfig
 
 
 def mk_metric_config_data(**overrides):
@@ -16,3 +16,37 @@ class MetricConfigTestCase(unittest.TestCase):
         config = mk_metric_config_data()
         del config['target']
         self.assertRaises(ConfigError, MetricConfig.parse, {})
+
+
+class ToyBatch(object):
+    def __init__(self, key, agent, breaker, limiter):
+        self.key = key
+        self.agent = agent
+        self.breaker = breaker
+        self.limiter = limiter
+
+
+class ToyBatchedBackend(Backend):
+    BATCH_CLS = ToyBatch
+
+
+class BackendBatchesTestCase(unittest.TestCase):
+    def test_add_backend(self):
+        batches = BackendBatches()
+        backend1 = ToyBatchedBackend({'url': 'http://a.moc'})
+        backend2 = ToyBatchedBackend({'url': 'http://a.moc'})
+        backend3 = ToyBatchedBackend({'url': 'http://b.moc'})
+
+        batches.add_backend(backend1)
+        batches.add_backend(backend2)
+        batches.add_backend(backend3)
+
+        self.assertTrue(backend1.batch is backend2.batch)
+        self.assertEqual(backend1.batch.key, 'http://a.moc')
+        self.assertEqual(backend3.batch.key, 'http://b.moc')
+
+    def test_add_backend_for_unbatchable_backends(self):
+        batches = BackendBatches()
+        backend = Backend({'url': 'http://a.moc'})
+        batches.add_backend(backend)
+        self.assertEqual(backend.batch, None)
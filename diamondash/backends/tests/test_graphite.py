@@ -3,17 +3,24 @@ import time
 from itertools import count
 from urlparse import urlsplit, parse_qs
 
-from twisted.internet.defer import Deferred
-from twisted.web import client
+from twisted.internet.defer import Deferred, CancelledError, succeed, fail
+from twisted.internet.error import TimeoutError
+from twisted.internet.task import Clock
 from twisted.trial import unittest
 
 from diamondash import utils
 from diamondash.config import ConfigError
+from diamondash.stats import Stats
+from diamondash.breaker import CircuitBreaker, CircuitOpenError
+from diamondash.limiter import RequestLimiter
+from diamondash.backends.rollups import RollupStore
 
 from diamondash.backends import base as backends
+from diamondash.backends import BackendBatches, BadBackendResponseError
 from diamondash.backends.graphite import (
     GraphiteBackendConfig, GraphiteBackend, GraphiteMetricConfig,
-    guess_aggregation_method)
+    GraphiteMetric, GraphiteRequestBatch, GraphiteResponseDecoder,
+    build_render_query, guess_aggregation_method)
 
 
 def mk_metric_config_data(**overrides):
@@ -62,6 +69,12 @@ class GraphiteBackendConfigTestCase(unittest.TestCase):
         self.assertEqual(m2_config['null_filter'], 'skip')
         self.assertEqual(m1_config['relative_time'], True)
 
+        self.assertEqual(config['timeout'], 30000)
+
+    def test_parsing_for_no_timeout(self):
+        config = GraphiteBackendConfig(mk_backend_config_data(timeout=None))
+        self.assertEqual(config['timeout'], None)
+
     def test_parsing_for_no_url(self):
         config = mk_backend_config_data()
         del config['url']
@@ -111,17 +124,20 @@ class GraphiteBackendTestCase(unittest.TestCase):
 
         self.last_request_url = None
         self.stub_time(self.TIME)
-        self.stub_getPage()
+        self.stub_http_request()
+
+        self.clock = Clock()
+        self.patch(GraphiteBackend, 'clock', self.clock)
 
-    def stub_getPage(self):
+    def stub_http_request(self):
         d = Deferred()
-        d.addCallback(lambda _: self.RESPONSE_DATA)
+        d.addCallback(lambda _: {'body': self.RESPONSE_DATA})
 
-        def stubbed_getPage(url):
+        def stubbed_http_request(url, agent=None):
             self.last_requested_url = url
             return d
 
-        self.patch(client, 'getPage', stubbed_getPage)
+        self.patch(utils, 'http_request', stubbed_http_request)
 
     def stub_time(self, t):
         self.patch(time, 'time', lambda: t)
@@ -159,6 +175,212 @@ class GraphiteBackendTestCase(unittest.TestCase):
             **{'from_time': 7200000, 'until_time': 3600000}),
             {'from': ['7200'], 'until': ['3600']})
 
+    def test_data_retrieval_for_long_urls(self):
+        requests = []
+
+        def stubbed_http_request(url, **kwargs):
+            requests.append((url, kwargs))
+            return succeed({'body': self.RESPONSE_DATA})
+
+        self.patch(utils, 'http_request', stubbed_http_request)
+        backend = GraphiteBackend(GraphiteBackendConfig(
+            mk_backend_config_data(max_url_length=50)))
+
+        d = backend.get_data(from_time=self.FROM_TIME)
+
+        [(url, kwargs)] = requests
+        self.assertEqual(url, 'http://some-graphite-url.moc:8080/render/')
+        self.assertEqual(kwargs['method'], 'POST')
+        self.assertEqual(
+            kwargs['headers'],
+            {'Content-Type': 'application/x-www-form-urlencoded'})
+        self.assertEqual(parse_qs(kwargs['data']), {
+            'format': ['json'],
+            'from': ['3600'],
+            'target': [m.aliased_target() for m in backend.metrics],
+        })
+
+        return d
+
+    def test_data_retrieval_for_no_max_url_length(self):
+        requests = []
+
+        def stubbed_http_request(url, **kwargs):
+            requests.append((url, kwargs))
+            return succeed({'body': self.RESPONSE_DATA})
+
+        self.patch(utils, 'http_request', stubbed_http_request)
+        backend = GraphiteBackend(GraphiteBackendConfig(
+            mk_backend_config_data(max_url_length=None)))
+
+        d = backend.get_data(from_time=self.FROM_TIME)
+
+        [(url, kwargs)] = requests
+        self.assertEqual(kwargs, {'agent': None})
+        self.assert_request_url(url, {'from': ['3600']})
+        return d
+
+    def test_data_retrieval_for_timeouts(self):
+        d = self.backend.get_data(from_time=self.FROM_TIME)
+        self.clock.advance(29)
+        self.assertNoResult(d)
+
+        self.clock.advance(1)
+        self.failureResultOf(d, TimeoutError)
+
+    def test_data_retrieval_for_open_circuit_breakers(self):
+        requests = []
+        self.patch(utils, 'http_request', lambda *a, **kw: requests.append(a))
+
+        self.backend.breaker = CircuitBreaker(failure_threshold=1)
+        self.failureResultOf(
+            self.backend.breaker.call(lambda: fail(Exception(':('))))
+
+        d = self.backend.get_data(from_time=self.FROM_TIME)
+        self.failureResultOf(d, CircuitOpenError)
+        self.assertEqual(requests, [])
+
+    def test_data_retrieval_for_request_limiters(self):
+        renders = []
+
+        def stubbed_http_request(url, **kwargs):
+            renders.append(Deferred())
+            return renders[-1]
+
+        self.patch(utils, 'http_request', stubbed_http_request)
+        self.backend.limiter = RequestLimiter(concurrency=1)
+
+        self.backend.get_data(from_time=self.FROM_TIME)
+        d = self.backend.get_data(from_time=self.FROM_TIME)
+        self.assertEqual(len(renders), 1)
+
+        # the second request should only be made once the first is done
+        renders[0].callback({'body': self.RESPONSE_DATA})
+        self.assertEqual(len(renders), 2)
+
+        renders[1].callback({'body': self.RESPONSE_DATA})
+        self.successResultOf(d)
+
+    def test_data_retrieval_for_timeouts_while_queued(self):
+        limiter = RequestLimiter(concurrency=1)
+        self.backend.limiter = limiter
+        limiter.run(0, Deferred)
+
+        d = self.backend.get_data(from_time=self.FROM_TIME)
+        self.assertEqual(len(limiter.queue), 1)
+
+        # the request spends its whole timeout waiting for the limiter
+        self.clock.advance(29)
+        self.assertNoResult(d)
+
+        self.clock.advance(1)
+        self.failureResultOf(d, TimeoutError)
+        self.assertEqual(limiter.queue, [])
+
+    def test_data_retrieval_for_rollups(self):
+        self.backend.rollups = RollupStore(bucket_sizes=[150000])
+
+        d = self.backend.get_data(
+            from_time=self.FROM_TIME,
+            until_time=self.UNTIL_TIME)
+        d.callback(None)
+
+        self.assertEqual(self.successResultOf(d), [{
+            'id': '0',
+            'datapoints': self.M1_PROCESSED_DATAPOINTS
+        }, {
+            'id': '1',
+            'datapoints': self.M2_PROCESSED_DATAPOINTS
+        }])
+
+        # only b.sum is aggregated, so only its series is kept
+        self.assertEqual(
+            self.backend.rollups.series.keys(),
+            [('http://some-graphite-url.moc:8080/', 'b.sum', 'skip')])
+
+    def test_encoded_targets(self):
+        self.assertEqual(
+            self.backend.encoded_targets,
+            "target=alias%28a.last%2C+%27a.last%27%29"
+            "&target=alias%28b.sum%2C+%27b.sum%27%29")
+
+    def test_render_query_building(self):
+        self.assertEqual(
+            build_render_query('target=a', from_time=3600000),
+            'target=a&format=json&from=3600')
+
+        self.assertEqual(
+            build_render_query('', until_time=3600000),
+            'format=json&until=3600')
+
+        self.assertEqual(
+            build_render_query('target=a', from_time=0, max_datapoints=24),
+            'target=a&format=json&from=0&maxDataPoints=24')
+
+    def test_data_retrieval_for_max_datapoints(self):
+        backend = GraphiteBackend(GraphiteBackendConfig(
+            mk_backend_config_data(metrics=[{
+                'target': 'b.sum',
+                'consolidate': True,
+            }])))
+        self.assertTrue(backend.consolidatable)
+
+        backend.get_data(from_time=self.FROM_TIME, max_datapoints=3)
+        self.assertEqual(
+            parse_qs(urlsplit(self.last_requested_url).query), {
+                'format': ['json'],
+                'from': ['3600'],
+                'maxDataPoints': ['3'],
+                'target': [backend.metrics[0].aliased_target()]})
+
+    def test_data_retrieval_for_max_datapoints_and_unconsolidatable_metrics(
+            self):
+        # graphite can't consolidate 'a.last' by its last datapoints
+        self.assertFalse(self.backend.consolidatable)
+
+        self.backend.get_data(from_time=self.FROM_TIME, max_datapoints=3)
+        self.assert_request_url(self.last_requested_url, {'from': ['3600']})
+
+    def test_data_retrieval_for_max_datapoints_and_unconsolidated_metrics(
+            self):
+        backend = GraphiteBackend(GraphiteBackendConfig(
+            mk_backend_config_data(
+                bucket_size='1h',
+                metrics=[{'target': 'c.sum'}])))
+
+        # a datapoint of 1 every 10 minutes from 1:05 to 2:55
+        datapoints = [[1.0, t] for t in xrange(3900, 10800, 600)]
+
+        def stubbed_http_request(url, **kwargs):
+            params = parse_qs(urlsplit(url).query)
+            response = datapoints
+
+            # graphite averages every few datapoints into one when asked for
+            # fewer datapoints than it has
+            if 'maxDataPoints' in params:
+                n = -(-len(datapoints) // int(params['maxDataPoints'][0]))
+                response = [
+                    [sum(y for y, _ in group) / len(group), group[0][1]]
+                    for group in (
+                        datapoints[i:i + n]
+                        for i in xrange(0, len(datapoints), n))]
+
+            return succeed({'body': json.dumps([
+                {'target': 'c.sum', 'datapoints': response}])})
+
+        self.patch(utils, 'http_request', stubbed_http_request)
+
+        # the chart asks for one datapoint for each hourly bucket
+        d = backend.get_data(from_time=self.FROM_TIME, max_datapoints=3)
+
+        self.assertEqual(self.successResultOf(d), [{
+            'id': '2',
+            'datapoints': [
+                {'x': 3600000, 'y': 3.0},
+                {'x': 7200000, 'y': 6.0},
+                {'x': 10800000, 'y': 3.0}]
+        }])
+
     def test_data_retrieval(self):
         deferred_result = self.backend.get_data(
             from_time=self.FROM_TIME,
@@ -182,14 +404,526 @@ class GraphiteBackendTestCase(unittest.TestCase):
         return deferred_result
 
 
+class GraphiteRequestBatchTestCase(unittest.TestCase):
+    TIME = 10800  # 3 hours since the unix epoch
+
+    RESPONSE_DATA = json.dumps([
+        {'target': 'a.last',
+         'datapoints': GraphiteBackendTestCase.M1_RAW_DATAPOINTS},
+        {'target': 'b.sum',
+         'datapoints': GraphiteBackendTestCase.M2_RAW_DATAPOINTS}])
+
+    def setUp(self):
+        self.uuid_counter = count()
+        self.patch(backends, 'uuid4', lambda: next(self.uuid_counter))
+        self.patch(time, 'time', lambda: self.TIME)
+
+        self.clock = Clock()
+        self.patch(GraphiteRequestBatch, 'clock', self.clock)
+
+        self.requested_urls = []
+        self.stub_http_request(lambda: succeed({'body': self.RESPONSE_DATA}))
+
+        self.backend1 = GraphiteBackend(
+            GraphiteBackendConfig(mk_backend_config_data()))
+
+        self.backend2 = GraphiteBackend(
+            GraphiteBackendConfig(mk_backend_config_data(metrics=[{
+                'target': 'b.sum',
+                'null_filter': 'skip',
+            }])))
+
+        batches = BackendBatches()
+        batches.add_backend(self.backend1)
+        batches.add_backend(self.backend2)
+
+    def stub_http_request(self, responder):
+        def stubbed_http_request(url, agent=None):
+            self.requested_urls.append(url)
+            return responder()
+
+        self.patch(utils, 'http_request', stubbed_http_request)
+
+    def test_batching(self):
+        self.assertTrue(self.backend1.batch is self.backend2.batch)
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+        self.assertEqual(self.requested_urls, [])
+
+        self.clock.advance(0)
+        url, = self.requested_urls
+        self.assertEqual(parse_qs(urlsplit(url).query), {
+            'format': ['json'],
+            'from': ['3600'],
+            'target': [
+                "alias(a.last, 'a.last')",
+                "alias(b.sum, 'b.sum')"],
+        })
+
+        d1.addCallback(self.assertEqual, [{
+            'id': '0',
+            'datapoints': GraphiteBackendTestCase.M1_PROCESSED_DATAPOINTS
+        }, {
+            'id': '1',
+            'datapoints': GraphiteBackendTestCase.M2_PROCESSED_DATAPOINTS
+        }])
+
+        d2.addCallback(self.assertEqual, [{
+            'id': '2',
+            'datapoints': [{'x': 6000000, 'y': 11.0}]
+        }])
+
+        return d1.addCallback(lambda _: d2)
+
+    def test_batching_stats(self):
+        stats = Stats()
+        self.backend1.stats = stats.widget_stats('dashboard-1', 'widget-1')
+        self.backend2.stats = stats.widget_stats('dashboard-1', 'widget-2')
+
+        self.backend1.get_data(from_time=-7200000)
+        self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+
+        dashboard_stats = stats.get_stats()['dashboard-1']
+
+        for stage in ('fetch', 'decode', 'null_filter', 'summarize'):
+            self.assertEqual(dashboard_stats['stages'][stage]['count'], 2)
+            self.assertEqual(
+                dashboard_stats['widgets']['widget-1'][stage]['count'], 1)
+            self.assertEqual(
+                dashboard_stats['widgets']['widget-2'][stage]['count'], 1)
+
+    def test_batching_for_differently_processed_targets(self):
+        self.backend2.metrics[0] = GraphiteMetric(GraphiteMetricConfig(
+            mk_metric_config_data(
+                target='b.sum',
+                bucket_size='5m',
+                time_alignment='floor',
+                summarizer_engine='graphite')))
+
+        d1 = self.backend1.get_data(from_time=-7200000, max_datapoints=10)
+        d2 = self.backend2.get_data(from_time=-5400000, max_datapoints=10)
+        self.clock.advance(0)
+
+        # b.sum should be asked for once, unprocessed by graphite
+        url, = self.requested_urls
+        self.assertEqual(parse_qs(urlsplit(url).query), {
+            'format': ['json'],
+            'from': ['3600'],
+            'target': ["alias(a.last, 'a.last')", "alias(b.sum, 'b.sum')"],
+        })
+
+        self.assertEqual(
+            self.successResultOf(d1)[1]['datapoints'],
+            GraphiteBackendTestCase.M2_PROCESSED_DATAPOINTS)
+        self.assertEqual(
+            self.successResultOf(d2)[0]['datapoints'],
+            [{'x': 6000000, 'y': 11.0}])
+
+    def test_series_sharing(self):
+        shared = iter([(0, 1)])
+        unshared = iter([(0, 2)])
+
+        datapoints_by_target = GraphiteRequestBatch.share_series(
+            {'a.last': unshared, 'b.sum': shared},
+            [(self.backend1, {}, None), (self.backend2, {}, None)])
+
+        # series wanted by more than one request should only be decoded once
+        self.assertEqual(datapoints_by_target['b.sum'], [(0, 1)])
+        self.assertTrue(datapoints_by_target['a.last'] is unshared)
+
+    def test_batching_for_bad_shared_series(self):
+        self.stub_http_request(lambda: succeed({'body': json.dumps([
+            {'target': 'a.last', 'datapoints': []},
+            {'target': 'b.sum', 'datapoints': [['bad', 3600]]}])}))
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+
+        # b.sum is shared, so it is decoded before the response is split up
+        self.failureResultOf(d1, ValueError)
+        self.failureResultOf(d2, ValueError)
+
+    def test_batching_for_long_urls(self):
+        requests = []
+
+        def stubbed_http_request(url, **kwargs):
+            requests.append((url, kwargs))
+            return succeed({'body': self.RESPONSE_DATA})
+
+        self.patch(utils, 'http_request', stubbed_http_request)
+        self.backend1.config['max_url_length'] = 50
+
+        self.backend1.get_data(from_time=-7200000)
+        self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+
+        # the shortest max url length of the batched backends is used
+        [(url, kwargs)] = requests
+        self.assertEqual(url, 'http://some-graphite-url.moc:8080/render/')
+        self.assertEqual(kwargs['method'], 'POST')
+        self.assertEqual(parse_qs(kwargs['data']), {
+            'format': ['json'],
+            'from': ['3600'],
+            'target': [
+                "alias(a.last, 'a.last')",
+                "alias(b.sum, 'b.sum')"],
+        })
+
+    def test_batching_for_differently_sized_windows(self):
+        self.backend1.get_data(from_time=-7200000)
+        self.backend2.get_data(from_time=-600000)
+        self.clock.advance(0)
+
+        # the 10 minute window shouldn't be widened to the 2 hour window
+        url1, url2 = self.requested_urls
+        self.assertEqual(parse_qs(urlsplit(url1).query)['from'], ['3600'])
+        self.assertEqual(parse_qs(urlsplit(url2).query)['from'], ['10200'])
+
+    def test_batching_for_non_overlapping_windows(self):
+        self.backend1.get_data(from_time=0, until_time=3600000)
+        self.backend2.get_data(from_time=7200000, until_time=10800000)
+        self.clock.advance(0)
+
+        url1, url2 = self.requested_urls
+        self.assertEqual(parse_qs(urlsplit(url1).query)['from'], ['0'])
+        self.assertEqual(parse_qs(urlsplit(url2).query)['from'], ['7200'])
+
+    def test_batching_for_failed_requests(self):
+        self.stub_http_request(lambda: fail(Exception(':(')))
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+
+        self.assertFailure(d1, Exception)
+        self.assertFailure(d2, Exception)
+        return d1.addCallback(lambda _: d2)
+
+    def test_batching_for_cancelled_queued_requests(self):
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+
+        d1.cancel()
+        self.failureResultOf(d1, CancelledError)
+
+        self.clock.advance(0)
+        url, = self.requested_urls
+        self.assertEqual(
+            parse_qs(urlsplit(url).query)['target'],
+            self.backend2.aliased_targets())
+        return d2
+
+    def test_batching_for_cancelled_in_flight_requests(self):
+        cancelled = []
+        render = Deferred(cancelled.append)
+        self.stub_http_request(lambda: render)
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+
+        # the render request is still needed for d2
+        d1.cancel()
+        self.failureResultOf(d1, CancelledError)
+        self.assertEqual(cancelled, [])
+
+        d2.cancel()
+        self.failureResultOf(d2, CancelledError)
+        self.assertEqual(cancelled, [render])
+        self.assertEqual(self.backend1.batch.in_flight, [])
+
+    def test_batching_for_responses_to_cancelled_requests(self):
+        render = Deferred()
+        self.stub_http_request(lambda: render)
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+
+        d1.cancel()
+        render.callback({'body': self.RESPONSE_DATA})
+
+        self.failureResultOf(d1, CancelledError)
+        self.assertEqual(
+            [m['id'] for m in self.successResultOf(d2)],
+            [m.config['id'] for m in self.backend2.metrics])
+
+    def test_batching_for_circuit_breakers(self):
+        self.stub_http_request(lambda: fail(Exception(':(')))
+
+        breaker = CircuitBreaker(failure_threshold=1)
+        self.backend1.batch.breaker = breaker
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+        self.failureResultOf(d1, Exception)
+        self.failureResultOf(d2, Exception)
+        self.assertEqual(breaker.get_state(), CircuitBreaker.OPEN)
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        self.clock.advance(0)
+        self.failureResultOf(d1, CircuitOpenError)
+        self.assertEqual(len(self.requested_urls), 1)
+
+    def test_batching_for_request_limiters(self):
+        limiter = RequestLimiter(concurrency=1)
+        self.backend1.batch.limiter = limiter
+        self.backend2.priority = 1
+
+        other = Deferred()
+        limiter.run(0, lambda: other)
+        queued = limiter.run(1, Deferred)
+
+        self.backend1.get_data(from_time=-7200000)
+        self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+        self.assertEqual(self.requested_urls, [])
+
+        # the batched render request should be made with the highest
+        # priority of its backends, ahead of the queued request
+        other.callback(None)
+        self.assertEqual(len(self.requested_urls), 1)
+        self.assertNoResult(queued)
+
+        queued.cancel()
+        self.failureResultOf(queued, CancelledError)
+
+    def test_batching_for_timeouts(self):
+        self.stub_http_request(Deferred)
+
+        d1 = self.backend1.get_data(from_time=-7200000)
+        d2 = self.backend2.get_data(from_time=-5400000)
+        self.clock.advance(0)
+        self.clock.advance(30)
+
+        self.failureResultOf(d1, TimeoutError)
+        self.failureResultOf(d2, TimeoutError)
+
+    def test_group_requests(self):
+        r1 = (None, {'from_time': 0, 'until_time': 10}, None)
+        r2 = (None, {'from_time': 10799960, 'until_time': 10799990}, None)
+        r3 = (None, {'from_time': 5, 'until_time': 20}, None)
+        r4 = (None, {'from_time': 10799970}, None)
+
+        self.assertEqual(
+            GraphiteRequestBatch.group_requests([r1, r2, r3, r4]),
+            [[r1, r3], [r2, r4]])
+
+    def test_group_requests_for_differently_sized_windows(self):
+        r1 = (None, {'from_time': 8100000}, None)
+        r2 = (None, {'from_time': 10200000}, None)
+        r3 = (None, {'from_time': 9000000}, None)
+        r4 = (None, {'from_time': 0}, None)
+
+        # r4's window is far longer than the others', and the window spanning
+        # r1 and r3 is more than twice as long as r2's
+        self.assertEqual(
+            GraphiteRequestBatch.group_requests([r1, r2, r3, r4]),
+            [[r4], [r1, r3], [r2]])
+
+    def test_merge_params_for_max_datapoints(self):
+        r1 = (None, {'from_time': 0, 'max_datapoints': 3}, None)
+        r2 = (None, {'from_time': 7200000, 'max_datapoints': 2}, None)
+
+        # r2 asks for 2 datapoints an hour, so 6 are needed for the 3 hours
+        # spanned by the merged request
+        self.assertEqual(
+            GraphiteRequestBatch.merge_params([r1, r2]),
+            {'from_time': 0, 'max_datapoints': 6})
+
+    def test_merge_params_for_missing_max_datapoints(self):
+        r1 = (None, {'from_time': 0, 'max_datapoints': 3}, None)
+        r2 = (None, {'from_time': 7200000}, None)
+
+        self.assertEqual(
+            GraphiteRequestBatch.merge_params([r1, r2]),
+            {'from_time': 0})
+
+
+class GraphiteResponseDecoderTestCase(unittest.TestCase):
+    def decode(self, data):
+        series_by_target = GraphiteResponseDecoder(data).decode()
+        return dict(
+            (target, list(series))
+            for target, series in series_by_target.iteritems())
+
+    def test_decoding(self):
+        self.assertEqual(self.decode(json.dumps([
+            {'target': 'a.last', 'datapoints': [[None, 3773], [5.0, 5695]]},
+            {'target': 'b.sum', 'datapoints': [[12, 3724], [1e-05, 3741]]},
+        ])), {
+            'a.last': [(3773000, None), (5695000, 5.0)],
+            'b.sum': [(3724000, 12), (3741000, 1e-05)],
+        })
+
+    def test_decoding_for_differently_ordered_fields(self):
+        data = (
+            '[{"datapoints": [[1.0, 10], [2.0, 20]], "target": "a.last"},'
+            ' {"tags": {"name": "b"}, "target": "b.sum", "datapoints": []}]')
+
+        self.assertEqual(self.decode(data), {
+            'a.last': [(10000, 1.0), (20000, 2.0)],
+            'b.sum': [],
+        })
+
+    def test_decoding_for_escaped_targets(self):
+        target = 'alias(a.last, "a \\"b\\" [c]")'
+        data = json.dumps([{'target': target, 'datapoints': [[1.0, 10]]}])
+        self.assertEqual(self.decode(data), {target: [(10000, 1.0)]})
+
+    def test_decoding_for_empty_responses(self):
+        self.assertEqual(self.decode('[]'), {})
+        self.assertEqual(self.decode(' [ ] '), {})
+
+    def test_decoding_for_bad_responses(self):
+        self.assertRaises(BadBackendResponseError, self.decode, '')
+        self.assertRaises(BadBackendResponseError, self.decode, '{}')
+        self.assertRaises(
+            BadBackendResponseError, self.decode,
+            '[{"target": "a", "datapoints": [[1.0, 10]')
+        self.assertRaises(
+            BadBackendResponseError, self.decode, '[{"target": a}]')
+
+    def test_series_reiteration(self):
+        series = GraphiteResponseDecoder(
+            '[{"target": "a", "datapoints": [[1.0, 10]]}]').decode()['a']
+        self.assertEqual(list(series), [(10000, 1.0)])
+        self.assertEqual(list(series), [(10000, 1.0)])
+
+
 class GraphiteMetricConfigTestCase(unittest.TestCase):
     def test_parsing(self):
         config = GraphiteMetricConfig(mk_metric_config_data())
         self.assertEqual(config['bucket_size'], 3600000)
         self.assertEqual(config['metadata'], {'name': 'max of a'})
+        self.assertEqual(config['summarizer_engine'], 'python')
+
+    def test_parsing_for_unknown_summarizer_engines(self):
+        self.assertRaises(
+            ConfigError,
+            GraphiteMetricConfig,
+            mk_metric_config_data(summarizer_engine='abacus'))
 
 
 class GraphiteMetricTestCase(unittest.TestCase):
+    def test_aliased_target(self):
+        metric = GraphiteMetric(GraphiteMetricConfig(mk_metric_config_data(
+            target='a.sum',
+            agg_method='sum')))
+
+        self.assertEqual(metric.aliased_target(), "alias(a.sum, 'a.sum')")
+
+    def test_aliased_target_for_consolidation(self):
+        metric = GraphiteMetric(GraphiteMetricConfig(mk_metric_config_data(
+            target='a.sum',
+            agg_method='sum',
+            consolidate=True)))
+
+        self.assertEqual(
+            metric.aliased_target(),
+            "alias(consolidateBy(a.sum, 'sum'), 'a.sum')")
+
+    def test_aliased_target_with_graphite_summarizer_engine(self):
+        metric = GraphiteMetric(GraphiteMetricConfig(mk_metric_config_data(
+            target='a.sum',
+            agg_method='sum',
+            bucket_size='5m',
+            time_alignment='floor',
+            summarizer_engine='graphite')))
+
+        self.assertEqual(
+            metric.aliased_target(),
+            "alias(summarize(a.sum, '300s', 'sum'), 'a.sum')")
+
+    def test_aliased_target_with_graphite_summarizer_engine_and_round(self):
+        metric = GraphiteMetric(GraphiteMetricConfig(mk_metric_config_data(
+            target='a.max',
+            agg_method='max',
+            bucket_size='5m',
+            time_alignment='round',
+            summarizer_engine='graphite')))
+
+        self.assertEqual(
+            metric.aliased_target(),
+            "alias(summarize(a.max, '150s', 'max'), 'a.max')")
+
+    def test_aliased_target_with_graphite_summarizer_engine_and_relative(self):
+        metric = GraphiteMetric(GraphiteMetricConfig(mk_metric_config_data(
+            target='a.sum',
+            agg_method='sum',
+            relative_time=True,
+            summarizer_engine='graphite')))
+
+        self.assertEqual(metric.aliased_target(), "alias(a.sum, 'a.sum')")
+
+    def test_aliased_target_with_graphite_summarizer_engine_and_odd_size(self):
+        metric = GraphiteMetric(GraphiteMetricConfig(mk_metric_config_data(
+            target='a.sum',
+            agg_method='sum',
+            bucket_size='1s',
+            time_alignment='round',
+            summarizer_engine='graphite')))
+
+        self.assertEqual(metric.aliased_target(), "alias(a.sum, 'a.sum')")
+
+    def test_consolidatable(self):
+        def consolidatable(**kwargs):
+            return GraphiteMetric(GraphiteMetricConfig(
+                mk_metric_config_data(**kwargs))).consolidatable
+
+        self.assertFalse(consolidatable(target='a.sum'))
+        self.assertTrue(consolidatable(target='a.sum', consolidate=True))
+        self.assertFalse(consolidatable(target='a.last', consolidate=True))
+
+        # graphite's consolidated datapoints wouldn't line up with the
+        # buckets it summarizes into
+        self.assertFalse(consolidatable(
+            target='a.sum',
+            consolidate=True,
+            bucket_size='5m',
+            summarizer_engine='graphite'))
+
+    def test_process_datapoints_with_graphite_summarizer_engine(self):
+        metric = GraphiteMetric(GraphiteMetricConfig(mk_metric_config_data(
+            agg_method='sum',
+            bucket_size='10s',
+            time_alignment='round',
+            summarizer_engine='graphite')))
+
+        # graphite's half-sized buckets for datapoints at 3s, 8s, 11s and 17s
+        self.assertEqual(
+            metric.process_datapoints([
+                (0, 1.0),
+                (5000, 2.0),
+                (10000, 3.0),
+                (15000, 4.0),
+            ], from_time=0), [
+                {'x': 0, 'y': 1.0},
+                {'x': 10000, 'y': 5.0},
+                {'x': 20000, 'y': 4.0},
+            ])
+
+    def test_process_datapoints_with_vectorized_summarizer_engine(self):
+        config = GraphiteMetricConfig(mk_metric_config_data(
+            bucket_size='5s',
+            summarizer_engine='vectorized'))
+        metric = GraphiteMetric(config)
+
+        self.assertEqual(
+            metric.process_datapoints([
+                (3000, 1.0),
+                (8000, None),
+                (11000, 3.0),
+                (12000, 4.0),
+            ], from_time=3000), [
+                {'x': 5000, 'y': 1.0},
+                {'x': 10000, 'y': 4.0},
+            ])
+
     def test_guess_aggregation_method(self):
         """
         Metric targets should be formatted to be enclosed in a 'summarize()'
@@ -12,21 +12,21 @@ class SummarizersTestCase(unittest.TestCase):
             [])
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 10, 'y': 3}])
 
         self.assertEqual(
-            summarizer(3, [{'x': 12, 'y': 3}]),
+            summarizer(3, [(12, 3)]),
             [{'x': 10, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1},
-                {'x': 8, 'y': 2},
-                {'x': 11, 'y': 3},
-                {'x': 12, 'y': 4},
-                {'x': 22, 'y': 6},
-                {'x': 28, 'y': 7}
+                (3, 1),
+                (8, 2),
+                (11, 3),
+                (12, 4),
+                (22, 6),
+                (28, 7)
             ]), [
                 {'x': 5, 'y': 1},
                 {'x': 10, 'y': 4},
@@ -36,10 +36,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1},
-                {'x': 12, 'y': 2},
-                {'x': 21, 'y': 3},
-                {'x': 22, 'y': 4}
+                (8, 1),
+                (12, 2),
+                (21, 3),
+                (22, 4)
             ]), [
                 {'x': 10, 'y': 2},
                 {'x': 20, 'y': 4}
@@ -54,21 +54,21 @@ class SummarizersTestCase(unittest.TestCase):
             [])
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 12, 'y': 3}])
 
         self.assertEqual(
-            summarizer(3, [{'x': 12, 'y': 3}]),
+            summarizer(3, [(12, 3)]),
             [{'x': 13, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1},
-                {'x': 8, 'y': 2},
-                {'x': 11, 'y': 3},
-                {'x': 12, 'y': 4},
-                {'x': 22, 'y': 6},
-                {'x': 28, 'y': 7}
+                (3, 1),
+                (8, 2),
+                (11, 3),
+                (12, 4),
+                (22, 6),
+                (28, 7)
             ]), [
                 {'x': 3, 'y': 1},
                 {'x': 8, 'y': 2},
@@ -79,10 +79,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1},
-                {'x': 12, 'y': 2},
-                {'x': 21, 'y': 3},
-                {'x': 22, 'y': 4}
+                (8, 1),
+                (12, 2),
+                (21, 3),
+                (22, 4)
             ]), [
                 {'x': 8, 'y': 1},
                 {'x': 13, 'y': 2},
@@ -93,17 +93,17 @@ class SummarizersTestCase(unittest.TestCase):
         summarizer = processors.summarizers.get('last', 'floor', 5)
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 10, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1},
-                {'x': 8, 'y': 2},
-                {'x': 11, 'y': 3},
-                {'x': 12, 'y': 4},
-                {'x': 22, 'y': 6},
-                {'x': 28, 'y': 7}
+                (3, 1),
+                (8, 2),
+                (11, 3),
+                (12, 4),
+                (22, 6),
+                (28, 7)
             ]), [
                 {'x': 0, 'y': 1},
                 {'x': 5, 'y': 2},
@@ -114,10 +114,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1},
-                {'x': 12, 'y': 2},
-                {'x': 21, 'y': 3},
-                {'x': 22, 'y': 4}
+                (8, 1),
+                (12, 2),
+                (21, 3),
+                (22, 4)
             ]), [
                 {'x': 5, 'y': 1},
                 {'x': 10, 'y': 2},
@@ -129,17 +129,17 @@ class SummarizersTestCase(unittest.TestCase):
             'last', 'floor', 5, relative=True)
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 12, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1},
-                {'x': 8, 'y': 2},
-                {'x': 11, 'y': 3},
-                {'x': 12, 'y': 4},
-                {'x': 22, 'y': 6},
-                {'x': 28, 'y': 7}
+                (3, 1),
+                (8, 2),
+                (11, 3),
+                (12, 4),
+                (22, 6),
+                (28, 7)
             ]), [
                 {'x': 3, 'y': 1},
                 {'x': 8, 'y': 4},
@@ -149,10 +149,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1},
-                {'x': 12, 'y': 2},
-                {'x': 21, 'y': 3},
-                {'x': 22, 'y': 4}
+                (8, 1),
+                (12, 2),
+                (21, 3),
+                (22, 4)
             ]), [
                 {'x': 8, 'y': 2},
                 {'x': 18, 'y': 4}
@@ -166,17 +166,17 @@ class SummarizersTestCase(unittest.TestCase):
             [])
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 10, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1.0},
-                {'x': 8, 'y': 2.0},
-                {'x': 11, 'y': 3.0},
-                {'x': 12, 'y': 4.0},
-                {'x': 22, 'y': 6.0},
-                {'x': 28, 'y': 7.0}
+                (3, 1.0),
+                (8, 2.0),
+                (11, 3.0),
+                (12, 4.0),
+                (22, 6.0),
+                (28, 7.0)
             ]), [
                 {'x': 5, 'y': 1.0},
                 {'x': 10, 'y': 3.0},
@@ -186,10 +186,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1.0},
-                {'x': 12, 'y': 2.0},
-                {'x': 21, 'y': 3.0},
-                {'x': 22, 'y': 4.0}
+                (8, 1.0),
+                (12, 2.0),
+                (21, 3.0),
+                (22, 4.0)
             ]), [
                 {'x': 10, 'y': 1.5},
                 {'x': 20, 'y': 3.5}
@@ -204,17 +204,17 @@ class SummarizersTestCase(unittest.TestCase):
             [])
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 12, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1.0},
-                {'x': 8, 'y': 2.0},
-                {'x': 11, 'y': 3.0},
-                {'x': 12, 'y': 4.0},
-                {'x': 22, 'y': 6.0},
-                {'x': 28, 'y': 7.0}
+                (3, 1.0),
+                (8, 2.0),
+                (11, 3.0),
+                (12, 4.0),
+                (22, 6.0),
+                (28, 7.0)
             ]), [
                 {'x': 3, 'y': 1.0},
                 {'x': 8, 'y': 2.0},
@@ -225,10 +225,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1.0},
-                {'x': 12, 'y': 2.0},
-                {'x': 21, 'y': 3.0},
-                {'x': 22, 'y': 4.0}
+                (8, 1.0),
+                (12, 2.0),
+                (21, 3.0),
+                (22, 4.0)
             ]), [
                 {'x': 8, 'y': 1.0},
                 {'x': 13, 'y': 2.0},
@@ -243,17 +243,17 @@ class SummarizersTestCase(unittest.TestCase):
             [])
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 10, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1.0},
-                {'x': 8, 'y': 2.0},
-                {'x': 11, 'y': 3.0},
-                {'x': 12, 'y': 4.0},
-                {'x': 22, 'y': 6.0},
-                {'x': 28, 'y': 7.0}
+                (3, 1.0),
+                (8, 2.0),
+                (11, 3.0),
+                (12, 4.0),
+                (22, 6.0),
+                (28, 7.0)
             ]), [
                 {'x': 0, 'y': 1.0},
                 {'x': 5, 'y': 2.0},
@@ -264,10 +264,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1.0},
-                {'x': 12, 'y': 2.0},
-                {'x': 21, 'y': 3.0},
-                {'x': 22, 'y': 4.0}
+                (8, 1.0),
+                (12, 2.0),
+                (21, 3.0),
+                (22, 4.0)
             ]), [
                 {'x': 5, 'y': 1.0},
                 {'x': 10, 'y': 2.0},
@@ -283,17 +283,17 @@ class SummarizersTestCase(unittest.TestCase):
             [])
 
         self.assertEqual(
-            summarizer(12, [{'x': 12, 'y': 3}]),
+            summarizer(12, [(12, 3)]),
             [{'x': 12, 'y': 3}])
 
         self.assertEqual(
             summarizer(3, [
-                {'x': 3, 'y': 1.0},
-                {'x': 8, 'y': 2.0},
-                {'x': 11, 'y': 3.0},
-                {'x': 12, 'y': 4.0},
-                {'x': 22, 'y': 6.0},
-                {'x': 28, 'y': 7.0}
+                (3, 1.0),
+                (8, 2.0),
+                (11, 3.0),
+                (12, 4.0),
+                (22, 6.0),
+                (28, 7.0)
             ]), [
                 {'x': 3, 'y': 1.0},
                 {'x': 8, 'y': 3.0},
@@ -303,10 +303,10 @@ class SummarizersTestCase(unittest.TestCase):
 
         self.assertEqual(
             summarizer(8, [
-                {'x': 8, 'y': 1.0},
-                {'x': 12, 'y': 2.0},
-                {'x': 21, 'y': 3.0},
-                {'x': 22, 'y': 4.0}
+                (8, 1.0),
+                (12, 2.0),
+                (21, 3.0),
+                (22, 4.0)
             ]), [
                 {'x': 8, 'y': 1.5},
                 {'x': 18, 'y': 3.5},
@@ -318,48 +318,48 @@ class NullFiltersTestCase(unittest.TestCase):
         filter = processors.null_filters['skip']
 
         self.assertEqual(
-            filter([
-                {'x': 870, 'y': None},
-                {'x': 875, 'y': 0.075312},
-                {'x': 885, 'y': 0.033274},
-                {'x': 890, 'y': None},
-                {'x': 965, 'y': 0.059383},
-                {'x': 970, 'y': 0.057101},
-                {'x': 975, 'y': 0.056673},
-                {'x': 980, 'y': None},
-                {'x': 985, 'y': None}
-            ]), [
-                {'x': 875, 'y': 0.075312},
-                {'x': 885, 'y': 0.033274},
-                {'x': 965, 'y': 0.059383},
-                {'x': 970, 'y': 0.057101},
-                {'x': 975, 'y': 0.056673}
+            list(filter([
+                (870, None),
+                (875, 0.075312),
+                (885, 0.033274),
+                (890, None),
+                (965, 0.059383),
+                (970, 0.057101),
+                (975, 0.056673),
+                (980, None),
+                (985, None)
+            ])), [
+                (875, 0.075312),
+                (885, 0.033274),
+                (965, 0.059383),
+                (970, 0.057101),
+                (975, 0.056673)
             ])
 
     def test_zeroize_nulls(self):
         filter = processors.null_filters['zeroize']
 
         self.assertEqual(
-            filter([
-                {'x': 870, 'y': None},
-                {'x': 875, 'y': 0.075312},
-                {'x': 885, 'y': 0.033274},
-                {'x': 890, 'y': None},
-                {'x': 965, 'y': 0.059383},
-                {'x': 970, 'y': 0.057101},
-                {'x': 975, 'y': 0.056673},
-                {'x': 980, 'y': None},
-                {'x': 985, 'y': None}
-            ]), [
-                {'x': 870, 'y': 0},
-                {'x': 875, 'y': 0.075312},
-                {'x': 885, 'y': 0.033274},
-                {'x': 890, 'y': 0},
-                {'x': 965, 'y': 0.059383},
-                {'x': 970, 'y': 0.057101},
-                {'x': 975, 'y': 0.056673},
-                {'x': 980, 'y': 0},
-                {'x': 985, 'y': 0}
+            list(filter([
+                (870, None),
+                (875, 0.075312),
+                (885, 0.033274),
+                (890, None),
+                (965, 0.059383),
+                (970, 0.057101),
+                (975, 0.056673),
+                (980, None),
+                (985, None)
+            ])), [
+                (870, 0),
+                (875, 0.075312),
+                (885, 0.033274),
+                (890, 0),
+                (965, 0.059383),
+                (970, 0.057101),
+                (975, 0.056673),
+                (980, 0),
+                (985, 0)
             ])
 
 
@@ -379,6 +379,10 @@ class AggregatorsTestCase(unittest.TestCase):
             aggregator([7.0, 8.0]),
             7.5)
 
+        self.assertEqual(
+            aggregator([7, 8]),
+            7.5)
+
         self.assertEqual(
             aggregator([2.0, 4.0, 9.0, 8.0]),
             5.75)
@@ -0,0 +1,188 @@
+import random
+
+from twisted.trial import unittest
+
+from diamondash.backends import processors
+from diamondash.backends.rollups import RollupStore
+
+
+def mk_datapoints(n, start=0, max_step=5000, seed=0):
+    rand = random.Random(seed)
+    datapoints = []
+    x = start
+
+    for i in xrange(n):
+        x += rand.randint(1, max_step)
+        datapoints.append((float(x), rand.uniform(-100, 100)))
+
+    return datapoints
+
+
+class RollupStoreTestCase(unittest.TestCase):
+    def mk_store(self, **kwargs):
+        kwargs.setdefault('bucket_sizes', [1000, 5000])
+        return RollupStore(**kwargs)
+
+    def assert_parity(self, store, name, time_alignment, bucket_size,
+                      from_time, datapoints):
+        summarizer = processors.summarizers.get(
+            name, time_alignment, bucket_size)
+
+        result = store.summarize('a', summarizer, from_time, datapoints)
+        expected = summarizer(from_time, datapoints)
+
+        self.assertEqual(
+            [d['x'] for d in result],
+            [d['x'] for d in expected])
+
+        for d1, d2 in zip(result, expected):
+            self.assertAlmostEqual(d1['y'], d2['y'])
+
+    def test_summarize_parity(self):
+        for name in ('sum', 'min', 'max', 'avg'):
+            for time_alignment in ('round', 'floor'):
+                for bucket_size in (10000, 60000):
+                    for from_time in (30000, 37500):
+                        store = self.mk_store()
+                        datapoints = mk_datapoints(200, start=from_time)
+                        self.assert_parity(
+                            store, name, time_alignment, bucket_size,
+                            from_time, datapoints)
+
+                        # summarizing again should give the same result from
+                        # the kept rollups
+                        self.assert_parity(
+                            store, name, time_alignment, bucket_size,
+                            from_time, datapoints)
+
+    def test_summarize_parity_for_changed_datapoints(self):
+        store = self.mk_store()
+        datapoints = mk_datapoints(200, start=30000)
+        self.assert_parity(store, 'sum', 'floor', 10000, 30000, datapoints)
+
+        datapoints = mk_datapoints(200, start=30000, seed=1)
+        self.assert_parity(store, 'sum', 'floor', 10000, 30000, datapoints)
+
+    def test_summarize_parity_for_moved_windows(self):
+        store = self.mk_store()
+        datapoints = mk_datapoints(200, start=30000, max_step=1000)
+
+        self.assert_parity(
+            store, 'avg', 'round', 10000, 30000, datapoints[:150])
+        self.assert_parity(
+            store, 'avg', 'round', 10000, 60000, datapoints[30:])
+
+    def test_summarize_for_rollup_hits(self):
+        store = self.mk_store()
+        summarizer = processors.summarizers.get('sum', 'floor', 10000)
+
+        datapoints = [(float(x), 1) for x in xrange(10000, 40000, 1000)]
+        self.assertEqual(store.summarize('a', summarizer, 10000, datapoints), [
+            {'x': 10000, 'y': 10},
+            {'x': 20000, 'y': 10},
+            {'x': 30000, 'y': 10},
+        ])
+
+        # the last bucket isn't spanned by the datapoints, so it needs to be
+        # aggregated from the raw datapoints
+        self.assertEqual(store.hits, 2)
+        self.assertEqual(store.misses, 1)
+
+    def test_summarize_for_appended_datapoints(self):
+        store = self.mk_store()
+        summarizer = processors.summarizers.get('sum', 'floor', 10000)
+
+        datapoints = [(float(x), 1) for x in xrange(10000, 35000, 1000)]
+        store.summarize('a', summarizer, 10000, datapoints)
+
+        # the window moved forwards, filling the last bucket it had before
+        datapoints = [(float(x), 1) for x in xrange(12000, 46000, 1000)]
+        self.assertEqual(store.summarize('a', summarizer, 12000, datapoints), [
+            {'x': 10000, 'y': 8},
+            {'x': 20000, 'y': 10},
+            {'x': 30000, 'y': 10},
+            {'x': 40000, 'y': 6},
+        ])
+
+        self.assertEqual(
+            store.series['a'].xs,
+            [float(x) for x in xrange(10000, 46000, 1000)])
+
+    def test_summarize_parity_for_appended_datapoints(self):
+        store = self.mk_store()
+        datapoints = mk_datapoints(300, start=30000, max_step=1000)
+
+        for i in xrange(0, 150, 10):
+            self.assert_parity(
+                store, 'sum', 'round', 10000, datapoints[i][0],
+                datapoints[i:i + 150])
+
+    def test_summarize_for_incompatible_summarizers(self):
+        store = self.mk_store()
+        datapoints = mk_datapoints(20, start=30000)
+
+        for summarizer in (
+                processors.summarizers.get('last', 'floor', 10000),
+                processors.summarizers.get(
+                    'sum', 'floor', 10000, relative=True),
+                processors.summarizers.get('sum', 'floor', 2500)):
+            self.assertEqual(
+                store.summarize('a', summarizer, 30000, datapoints),
+                summarizer(30000, datapoints))
+
+        self.assertEqual(store.series, {})
+
+    def test_rollup_size(self):
+        store = self.mk_store(bucket_sizes=[300000, 3600000])
+
+        def rollup_size(time_alignment, bucket_size):
+            return store.rollup_size(processors.summarizers.get(
+                'sum', time_alignment, bucket_size))
+
+        self.assertEqual(rollup_size('floor', 3600000), 3600000)
+        self.assertEqual(rollup_size('floor', 86400000), 3600000)
+        self.assertEqual(rollup_size('round', 3600000), 300000)
+        self.assertEqual(rollup_size('round', 86400000), 3600000)
+        self.assertEqual(rollup_size('round', 300000), None)
+
+    def test_eviction(self):
+        store = self.mk_store(max_points=100)
+        summarizer = processors.summarizers.get('sum', 'floor', 10000)
+
+        store.summarize('a', summarizer, 30000, mk_datapoints(20, 30000))
+        store.summarize('b', summarizer, 30000, mk_datapoints(20, 30000))
+        store.summarize('a', summarizer, 30000, mk_datapoints(20, 30000))
+        store.summarize('c', summarizer, 30000, mk_datapoints(20, 30000))
+
+        # the least recently summarized series should be evicted first
+        self.assertEqual(store.series.keys(), ['a', 'c'])
+        self.assertEqual(store.evictions, 1)
+        self.assertEqual(
+            store.points, sum(s.size() for s in store.series.values()))
+
+    def test_retention(self):
+        store = self.mk_store(retention=10000)
+        summarizer = processors.summarizers.get('sum', 'floor', 10000)
+
+        datapoints = [(float(x), 1) for x in xrange(10000, 40000, 1000)]
+        store.summarize('a', summarizer, 10000, datapoints)
+
+        series = store.series['a']
+        self.assertEqual(series.xs[0], 29000)
+        self.assertTrue(all(
+            start >= 29000
+            for rollups in series.rollups.values() for start in rollups))
+
+    def test_get_stats(self):
+        store = self.mk_store()
+        summarizer = processors.summarizers.get('sum', 'floor', 10000)
+        datapoints = [(float(x), 1) for x in xrange(10000, 40000, 1000)]
+        store.summarize('a', summarizer, 10000, datapoints)
+
+        self.assertEqual(store.get_stats(), {
+            'series': 1,
+            'points': store.series['a'].size(),
+            'hits': 2,
+            'misses': 1,
+            'evictions': 0,
+        })
@@ -0,0 +1,153 @@
+import random
+
+from twisted.trial import unittest
+
+from diamondash.backends import processors, vectorized
+from diamondash.backends.vectorized import Series
+
+
+def requires_numpy(fn):
+    if vectorized.numpy is None:
+        fn.skip = "NumPy is not installed"
+    return fn
+
+
+def mk_datapoints(n, start=0, max_step=5000, seed=0):
+    rand = random.Random(seed)
+    datapoints = []
+    x = start
+
+    for i in xrange(n):
+        x += rand.randint(1, max_step)
+        datapoints.append((float(x), rand.uniform(-100, 100)))
+
+    return datapoints
+
+
+class SeriesTestCase(unittest.TestCase):
+    @requires_numpy
+    def test_from_datapoints(self):
+        series = Series.from_datapoints([(1, 2.0), (3, 4.0)])
+        self.assertEqual(len(series), 2)
+        self.assertEqual(list(series), [(1.0, 2.0), (3.0, 4.0)])
+
+    @requires_numpy
+    def test_from_datapoints_for_generators(self):
+        series = Series.from_datapoints((x, x * 2.0) for x in range(3))
+        self.assertEqual(list(series), [(0, 0), (1, 2.0), (2, 4.0)])
+
+    @requires_numpy
+    def test_from_datapoints_for_empty_datapoints(self):
+        series = Series.from_datapoints([])
+        self.assertEqual(len(series), 0)
+        self.assertEqual(list(series), [])
+
+
+class SummarizersTestCase(unittest.TestCase):
+    def assert_parity(self, name, time_alignment, bucket_size, relative,
+                      from_time, datapoints):
+        expected = processors.summarizers.get(
+            name, time_alignment, bucket_size, relative=relative)
+        summarizer = vectorized.summarizers.get(
+            name, time_alignment, bucket_size, relative=relative)
+
+        result = summarizer(from_time, Series.from_datapoints(datapoints))
+        expected = expected(from_time, datapoints)
+
+        self.assertEqual(
+            [d['x'] for d in result],
+            [d['x'] for d in expected])
+
+        for d1, d2 in zip(result, expected):
+            self.assertAlmostEqual(d1['y'], d2['y'])
+
+    def assert_parity_for_all(self, name):
+        for time_alignment in ('round', 'floor'):
+            for relative in (False, True):
+                for from_time in (0, 3000, 7500, 12345):
+                    for bucket_size in (1000, 5000, 60000):
+                        self.assert_parity(
+                            name, time_alignment, bucket_size, relative,
+                            from_time, mk_datapoints(200, start=from_time))
+
+    @requires_numpy
+    def test_sum_parity(self):
+        self.assert_parity_for_all('sum')
+
+    @requires_numpy
+    def test_min_parity(self):
+        self.assert_parity_for_all('min')
+
+    @requires_numpy
+    def test_max_parity(self):
+        self.assert_parity_for_all('max')
+
+    @requires_numpy
+    def test_avg_parity(self):
+        self.assert_parity_for_all('avg')
+
+    @requires_numpy
+    def test_last_parity(self):
+        self.assert_parity_for_all('last')
+
+    @requires_numpy
+    def test_parity_for_datapoints_before_from_time(self):
+        for name in ('sum', 'min', 'max', 'avg', 'last'):
+            self.assert_parity(
+                name, 'round', 5000, False, 30000,
+                mk_datapoints(100, start=0, max_step=1000))
+
+    @requires_numpy
+    def test_parity_for_halfway_times(self):
+        datapoints = [
+            (2500.0, 1.0),
+            (7500.0, 2.0),
+            (12500.0, 3.0),
+            (17500.0, 4.0),
+        ]
+
+        for name in ('sum', 'min', 'max', 'avg', 'last'):
+            self.assert_parity(name, 'round', 5000, False, 0, datapoints)
+            self.assert_parity(name, 'round', 5000, True, 1000, datapoints)
+
+    @requires_numpy
+    def test_parity_for_single_datapoints(self):
+        for name in ('sum', 'min', 'max', 'avg', 'last'):
+            self.assert_parity(name, 'round', 5, False, 3, [(12, 3.0)])
+            self.assert_parity(name, 'floor', 5, True, 3, [(12, 3.0)])
+
+    @requires_numpy
+    def test_parity_for_integer_values(self):
+        datapoints = [(x * 1000, x % 4) for x in xrange(1, 40)]
+
+        for name in ('sum', 'min', 'max', 'avg', 'last'):
+            self.assert_parity(name, 'round', 5000, False, 0, datapoints)
+            self.assert_parity(name, 'floor', 5000, False, 0, datapoints)
+
+    @requires_numpy
+    def test_summarizer_for_empty_datapoints(self):
+        summarizer = vectorized.summarizers.get('avg', 'round', 5)
+        self.assertEqual(summarizer(3, Series.from_datapoints([])), [])
+        self.assertEqual(summarizer(3, []), [])
+
+    @requires_numpy
+    def test_summarizer_for_unconverted_datapoints(self):
+        summarizer = vectorized.summarizers.get('avg', 'floor', 5)
+        self.assertEqual(
+            summarizer(8, iter([(8, 1.0), (12, 2.0), (21, 3.0), (22, 4.0)])),
+            [{'x': 5, 'y': 1.0}, {'x': 10, 'y': 2.0}, {'x': 20, 'y': 3.5}])
+
+    def test_summarizer_fallback(self):
+        self.patch(vectorized, 'numpy', None)
+
+        summarizer = vectorized.summarizers.get('avg', 'floor', 5)
+        self.assertTrue(isinstance(
+            summarizer, processors.AggregatingSummarizer))
+
+        self.assertEqual(
+            summarizer(8, [(8, 1.0), (12, 2.0), (21, 3.0), (22, 4.0)]),
+            [{'x': 5, 'y': 1.0}, {'x': 10, 'y': 2.0}, {'x': 20, 'y': 3.5}])
+
+    def test_unknown_summarizers(self):
+        self.assertRaises(
+            KeyError, vectorized.summarizers.get, 'median', 'round', 5)
@@ -0,0 +1,190 @@
+# -*- test-case-name: diamondash.backends.tests.test_vectorized -*-
+
+"""
+Summarizers that summarize whole series at once.
+
+Series are stored as two parallel NumPy arrays of x and y values, so that
+time alignment and aggregation can be done in bulk. If NumPy isn't
+available, summarizing falls back to the summarizers in
+`diamondash.backends.processors`.
+"""
+
+from itertools import chain, izip
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from diamondash.backends import processors
+
+
+class Series(object):
+    """A series of datapoints stored as parallel arrays of x and y values."""
+
+    def __init__(self, xs, ys):
+        self.xs = xs
+        self.ys = ys
+
+    @classmethod
+    def from_datapoints(cls, datapoints):
+        """
+        Creates a series from an iterable of `(x, y)` datapoints. Null values
+        are not supported, so datapoints need to be null filtered first.
+        """
+        values = numpy.fromiter(
+            chain.from_iterable(datapoints), numpy.float64)
+        return cls(values[0::2], values[1::2])
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __iter__(self):
+        return izip(self.xs, self.ys)
+
+
+def floor_times(ts, interval, relative_to=None):
+    """Vectorized version of `diamondash.utils.floor_time`"""
+    offset = relative_to % interval if relative_to is not None else 0
+    i = numpy.floor((ts - offset) / float(interval))
+    return numpy.maximum(offset + (i * interval), 0)
+
+
+def round_times(ts, interval, relative_to=None):
+    """
+    Vectorized version of `diamondash.utils.round_time`. Halves are rounded
+    away from zero, like python's `round`.
+    """
+    offset = relative_to % interval if relative_to is not None else 0
+    v = (ts - offset) / float(interval)
+    i = numpy.sign(v) * numpy.floor(numpy.abs(v) + 0.5)
+    return numpy.maximum(offset + (i * interval), 0)
+
+
+def bucket_starts(keys):
+    """
+    Returns the indices at which each run of equal keys starts in the given
+    non-decreasing array of keys.
+    """
+    return numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(keys)) + 1))
+
+
+def bucket_sizes(starts, n):
+    return numpy.diff(numpy.append(starts, n))
+
+
+def to_datapoints(xs, ys):
+    return [
+        {'x': int(x), 'y': y}
+        for x, y in izip(xs.tolist(), ys.tolist())]
+
+
+class VectorizedSummarizer(object):
+    def __init__(self, time_aligner, bucket_size, relative=False):
+        self.relative = relative
+        self.time_aligner = time_aligner
+        self.bucket_size = bucket_size
+
+    def align_times(self, ts, from_time):
+        relative_to = from_time if self.relative else None
+        return self.time_aligner(ts, self.bucket_size, relative_to=relative_to)
+
+    def __call__(self, from_time, datapoints):
+        if not isinstance(datapoints, Series):
+            datapoints = Series.from_datapoints(datapoints)
+
+        if not len(datapoints):
+            return []
+
+        xs = numpy.asarray(datapoints.xs, numpy.float64)
+        ys = numpy.asarray(datapoints.ys, numpy.float64)
+        step = self.align_times(numpy.float64(from_time), from_time)
+        return self.summarize(step, self.align_times(xs, from_time), ys)
+
+    def summarize(self, step, aligned_xs, ys):
+        raise NotImplementedError()
+
+
+class VectorizedLastDatapointSummarizer(VectorizedSummarizer):
+    def summarize(self, step, aligned_xs, ys):
+        # the first datapoint always falls into the first bucket
+        keys = aligned_xs.copy()
+        keys[0] = step
+        keys = numpy.maximum.accumulate(numpy.maximum(keys, step))
+
+        starts = bucket_starts(keys)
+        ends = numpy.append(starts[1:], len(ys)) - 1
+
+        bucket_xs = keys[starts]
+
+        # the last datapoint is placed at its own aligned time
+        bucket_xs[-1] = aligned_xs[-1]
+
+        return to_datapoints(bucket_xs, ys[ends])
+
+
+class VectorizedAggregatingSummarizer(VectorizedSummarizer):
+    def __init__(self, time_aligner, bucket_size, aggregator, relative=False):
+        super(VectorizedAggregatingSummarizer, self).__init__(
+            time_aligner, bucket_size, relative)
+        self.aggregator = aggregator
+
+    def summarize(self, step, aligned_xs, ys):
+        keys = numpy.maximum.accumulate(numpy.maximum(aligned_xs, step))
+        starts = bucket_starts(keys)
+        return to_datapoints(keys[starts], self.aggregator(ys, starts))
+
+
+def agg_sum(ys, starts):
+    return numpy.add.reduceat(ys, starts)
+
+
+def agg_max(ys, starts):
+    return numpy.maximum.reduceat(ys, starts)
+
+
+def agg_min(ys, starts):
+    return numpy.minimum.reduceat(ys, starts)
+
+
+def agg_avg(ys, starts):
+    return numpy.add.reduceat(ys, starts) / bucket_sizes(starts, len(ys))
+
+
+class VectorizedSummarizers(object):
+    """
+    Creates vectorized summarizers if NumPy is available, otherwise falls
+    back to the given python summarizers.
+    """
+
+    def __init__(self, summarizers, fallback):
+        self.summarizers = summarizers
+        self.fallback = fallback
+
+    def get(self, name, time_alignment, bucket_size, relative=False):
+        if numpy is None:
+            return self.fallback.get(
+                name, time_alignment, bucket_size, relative=relative)
+
+        time_aligner = time_aligners.get(time_alignment)
+
+        if name not in self.summarizers:
+            raise KeyError("No summarizer called '%s' exists" % name)
+
+        summarizer_cls, kwargs = self.summarizers[name]
+        return summarizer_cls(
+            time_aligner, bucket_size, relative=relative, **kwargs)
+
+
+time_aligners = {
+    'round': round_times,
+    'floor': floor_times,
+}
+
+summarizers = VectorizedSummarizers({
+    'sum': (VectorizedAggregatingSummarizer, {'aggregator': agg_sum}),
+    'max': (VectorizedAggregatingSummarizer, {'aggregator': agg_max}),
+    'min': (VectorizedAggregatingSummarizer, {'aggregator': agg_min}),
+    'avg': (VectorizedAggregatingSummarizer, {'aggregator': agg_avg}),
+    'last': (VectorizedLastDatapointSummarizer, {}),
+}, fallback=processors.summarizers)
@@ -0,0 +1,132 @@
+# -*- test-case-name: diamondash.tests.test_breaker -*-
+
+"""Circuit breakers that stop requests from being made to failing backends"""
+
+from twisted.internet.defer import maybeDeferred, fail, CancelledError
+
+from diamondash import utils
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a call while the circuit breaker guarding it is
+    open.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Fails calls straight away instead of making them once
+    ``failure_threshold`` calls in a row have failed. Once the breaker has
+    been open for ``reset_timeout`` milliseconds, up to ``probes`` calls at
+    a time are let through to find out whether calls succeed again. The
+    breaker closes once a probe succeeds, and opens again if a probe fails.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30000, probes=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+
+        # the number of calls in a row that have failed
+        self.failures = 0
+
+        # the time the breaker was last opened, or `None` if it is closed
+        self.opened_at = None
+
+        # the number of probes that haven't finished yet
+        self.probing = 0
+
+    def get_state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+
+        if utils.now() - self.opened_at < self.reset_timeout:
+            return self.OPEN
+
+        return self.HALF_OPEN
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Calls ``fn`` with the given args if the breaker allows it, returning
+        a deferred firing with its result. If the breaker doesn't allow it,
+        the deferred fails with a `CircuitOpenError` instead.
+        """
+        state = self.get_state()
+        probe = state == self.HALF_OPEN
+
+        if state == self.OPEN or (probe and self.probing >= self.probes):
+            return fail(CircuitOpenError(
+                "Circuit breaker open after %d failed calls" % self.failures))
+
+        if probe:
+            self.probing += 1
+
+        d = maybeDeferred(fn, *args, **kwargs)
+        d.addCallbacks(
+            self.succeeded, self.failed,
+            callbackArgs=(probe,), errbackArgs=(probe,))
+        return d
+
+    def succeeded(self, result, probe):
+        if probe:
+            self.probing -= 1
+
+        self.failures = 0
+        self.opened_at = None
+        return result
+
+    def failed(self, failure, probe):
+        if probe:
+            self.probing -= 1
+
+        # calls cancelled because their results are no longer needed say
+        # nothing about whether calls are failing
+        if failure.check(CancelledError):
+            return failure
+
+        self.failures += 1
+        if probe or self.failures >= self.failure_threshold:
+            self.opened_at = utils.now()
+
+        return failure
+
+    def get_stats(self):
+        return {
+            'state': self.get_state(),
+            'failures': self.failures,
+        }
+
+
+class CircuitBreakers(object):
+    """
+    Keeps a circuit breaker for each key (for example, each backend url), so
+    that everything making calls with the same key shares a breaker.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30000, probes=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.breakers = {}
+
+    def get(self, key):
+        breaker = self.breakers.get(key)
+
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=self.failure_threshold,
+                reset_timeout=self.reset_timeout,
+                probes=self.probes)
+            self.breakers[key] = breaker
+
+        return breaker
+
+    def get_stats(self):
+        return dict(
+            (key, breaker.get_stats())
+            for key, breaker in self.breakers.iteritems())
@@ -0,0 +1,228 @@
+# -*- test-case-name: diamondash.tests.test_cache -*-
+
+"""Caching of widget snapshots and pages shared between diamondash's viewers"""
+
+from twisted.internet.defer import (
+    Deferred, CancelledError, maybeDeferred, succeed)
+from twisted.python import log
+from twisted.python.failure import Failure
+
+from diamondash import utils
+
+
+class SnapshotCache(object):
+    """
+    Caches results for the time window they were requested in, so that
+    every request made in the same window gets the same result.
+
+    Requests made while a result is still being retrieved share the
+    retrieval already in progress instead of starting a new one.
+
+    If a retrieval fails, the last result retrieved for an earlier window is
+    given instead, and the key is marked as stale until a retrieval
+    succeeds again.
+    """
+
+    def __init__(self):
+        # key -> (window, result)
+        self.results = {}
+
+        # key -> (window, [deferreds waiting for the result], retrieval)
+        self.pending = {}
+
+        # the keys whose last retrieval failed and whose results are from an
+        # earlier window
+        self.stale = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+
+    @staticmethod
+    def window_for(ttl):
+        return utils.floor_time(utils.now(), ttl)
+
+    def get(self, key, ttl, getter, *args, **kwargs):
+        """
+        Returns a deferred firing with the result cached for ``key`` in the
+        current ``ttl`` millisecond window, calling ``getter`` to retrieve
+        the result if it isn't cached or being retrieved yet.
+        """
+        window = self.window_for(ttl)
+
+        cached_window, result = self.results.get(key, (None, None))
+        if cached_window == window:
+            self.hits += 1
+            return succeed(result)
+
+        pending_window, waiting, retrieval = self.pending.get(
+            key, (None, None, None))
+        if pending_window == window:
+            self.coalesced += 1
+            return self._wait(waiting, retrieval)
+
+        self.misses += 1
+        return self._retrieve(key, window, getter, *args, **kwargs)
+
+    def get_latest(self, key):
+        """
+        Returns a deferred firing with the latest result retrieved for
+        ``key``, whatever window it was retrieved in, or `None` if no result
+        has been retrieved for ``key`` yet.
+        """
+        if key not in self.results:
+            return None
+
+        self.hits += 1
+        _, result = self.results[key]
+        return succeed(result)
+
+    def refresh(self, key, ttl, getter, *args, **kwargs):
+        """
+        Retrieves a new result for ``key`` in the current ``ttl``
+        millisecond window, even if one is already cached. If a result for
+        the window is already being retrieved, that retrieval is shared
+        instead.
+        """
+        window = self.window_for(ttl)
+
+        pending_window, waiting, retrieval = self.pending.get(
+            key, (None, None, None))
+        if pending_window == window:
+            return self._wait(waiting, retrieval)
+
+        return self._retrieve(key, window, getter, *args, **kwargs)
+
+    def _retrieve(self, key, window, getter, *args, **kwargs):
+        waiting = []
+        retrieval = maybeDeferred(getter, *args, **kwargs)
+        self.pending[key] = (window, waiting, retrieval)
+
+        # the getter's result could already be available, so we need to
+        # start waiting on it before handling it
+        d = self._wait(waiting, retrieval)
+        retrieval.addBoth(self._retrieved, key, window, waiting)
+        return d
+
+    def _wait(self, waiting, retrieval):
+        def cancel(d):
+            # the retrieval is only cancelled once nothing is waiting on it
+            waiting.remove(d)
+            if not waiting:
+                retrieval.cancel()
+
+        d = Deferred(cancel)
+        waiting.append(d)
+        return d
+
+    def _retrieved(self, result, key, window, waiting):
+        if self.pending.get(key, (None,))[0] == window:
+            del self.pending[key]
+
+        if isinstance(result, Failure):
+            self._failed(result, key, waiting)
+            return
+
+        # a retrieval for a later window could have finished first
+        if self.results.get(key, (window,))[0] <= window:
+            self.results[key] = (window, result)
+            self.stale.discard(key)
+
+        for d in waiting:
+            d.callback(result)
+
+    def _failed(self, failure, key, waiting):
+        if key not in self.results or failure.check(CancelledError):
+            for d in waiting:
+                d.errback(failure)
+            return
+
+        log.msg("Giving stale result for '%s' after failed retrieval: %s"
+                % (key, failure.value))
+
+        self.stale.add(key)
+        self.stale_hits += len(waiting)
+
+        _, result = self.results[key]
+        for d in waiting:
+            d.callback(result)
+
+    def is_stale(self, key):
+        return key in self.stale
+
+    def remove(self, key):
+        self.results.pop(key, None)
+        self.stale.discard(key)
+
+    def get_stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'stale_hits': self.stale_hits,
+        }
+
+
+class PageCache(object):
+    """
+    Caches rendered pages until they are invalidated, so that pages only
+    get rendered again once what they display has changed.
+
+    Requests made while a page is still being rendered share the rendering
+    already in progress instead of starting a new one.
+    """
+
+    def __init__(self):
+        # key -> rendered page
+        self.pages = {}
+
+        # key -> [deferreds waiting for the page]
+        self.pending = {}
+
+    def get(self, key, render, *args, **kwargs):
+        """
+        Returns a deferred firing with the page cached for ``key``, calling
+        ``render`` to render the page if it isn't cached or being rendered
+        yet.
+        """
+        if key in self.pages:
+            return succeed(self.pages[key])
+
+        waiting = self.pending.get(key)
+        if waiting is not None:
+            return self._wait(waiting)
+
+        waiting = []
+        self.pending[key] = waiting
+
+        # the page could already be rendered, so we need to start waiting on
+        # it before we render it
+        d = self._wait(waiting)
+        rendering = maybeDeferred(render, *args, **kwargs)
+        rendering.addBoth(self._rendered, key, waiting)
+        return d
+
+    def _wait(self, waiting):
+        d = Deferred()
+        waiting.append(d)
+        return d
+
+    def _rendered(self, result, key, waiting):
+        # pages invalidated while they were being rendered aren't cached
+        if self.pending.get(key) is waiting:
+            del self.pending[key]
+
+            if not isinstance(result, Failure):
+                self.pages[key] = result
+
+        for d in waiting:
+            if isinstance(result, Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+
+    def invalidate(self, *keys):
+        for key in keys:
+            self.pages.pop(key, None)
+            self.pending.pop(key, None)
@@ -37,14 +37,59 @@ diamondash.dashboard = function() {
 
     initialize: function() {
       this.pollHandle = null;
+      this.eventSource = null;
+    },
+
+    snapshotUrl: function() {
+      return diamondash.url('api/dashboards', this.get('name'), 'snapshot');
+    },
+
+    eventsUrl: function() {
+      return diamondash.url('api/dashboards', this.get('name'), 'events');
+    },
+
+    snapshotVersions: function() {
+      return this.get('widgets')
+        .filter(function(m) {
+          return m instanceof dynamic.DynamicWidgetModel;
+        })
+        .map(function(m) {
+          return [m.id, _(m).result('snapshotVersion')];
+        })
+        .filter(function(version) { return version[1] !== null; })
+        .map(function(version) { return version.join(':'); });
     },
 
     fetchSnapshots: function(options) {
+      options = _.clone(options || {});
+      options.url = _(this).result('snapshotUrl');
+
+      // only ask for the changes made since the snapshots we already have
+      var since = this.snapshotVersions();
+      if (since.length) {
+        options.data = _({since: since}).extend(options.data);
+        options.traditional = true;
+      }
+
+      var self = this;
+      var success = options.success;
+
+      options.success = function(resp) {
+        self.setSnapshots(resp, options);
+        if (success) { success(self, resp, options); }
+      };
+
+      return this.sync('read', this, options);
+    },
+
+    setSnapshots: function(snapshots, options) {
       this.get('widgets').each(function(m) {
-        if (m instanceof dynamic.DynamicWidgetModel) {
-          m.fetchSnapshot(options);
+        if (m instanceof dynamic.DynamicWidgetModel && _(snapshots).has(m.id)) {
+          m.setSnapshot(snapshots[m.id], options);
         }
       });
+
+      return this;
     },
 
     poll: function(options) {
@@ -67,6 +112,33 @@ diamondash.dashboard = function() {
       }
 
       return this;
+    },
+
+    subscribe: function(options) {
+      // fall back to polling for browsers without server-sent events
+      if (typeof EventSource === 'undefined') {
+        return this.poll(options);
+      }
+
+      if (this.eventSource === null) {
+        var self = this;
+        this.eventSource = new EventSource(_(this).result('eventsUrl'));
+
+        this.eventSource.addEventListener('snapshot', function(e) {
+          self.setSnapshots(JSON.parse(e.data), options);
+        });
+      }
+
+      return this;
+    },
+
+    unsubscribe: function() {
+      if (this.eventSource !== null) {
+        this.eventSource.close();
+        this.eventSource = null;
+      }
+
+      return this.stopPolling();
     }
   });
 
@@ -49,21 +49,33 @@ describe("diamondash.dashboard", function(){
       clock.restore();
       server.restore();
 
-      model.stopPolling();
+      model.unsubscribe();
 
       widgets.registry.models.remove('dynamic_toy');
       widgets.registry.models.remove('static_toy');
     });
 
+    describe(".snapshotUrl()", function() {
+      it("should construct the snapshot url correctly", function() {
+        var config = diamondash.config;
+        config.set('url_prefix', 'foo');
+
+        assert.equal(
+          model.snapshotUrl(),
+          '/foo/api/dashboards/dashboard-1/snapshot');
+
+        config.set('url_prefix', config.previous('url_prefix'));
+      });
+    });
+
     describe(".fetchSnapshots()", function() {
       it("should fetch the snaphots of its dynamic widgets", function() {
         server.respondWith(
-          '/api/widgets/dashboard-1/widget-2/snapshot',
-          JSON.stringify({stuff: 'spam'}));
-
-        server.respondWith(
-          '/api/widgets/dashboard-1/widget-4/snapshot',
-          JSON.stringify({stuff: 'ham'}));
+          '/api/dashboards/dashboard-1/snapshot',
+          JSON.stringify({
+            'widget-2': {stuff: 'spam'},
+            'widget-4': {stuff: 'ham'}
+          }));
 
         assert.equal(widget2.get('stuff'), 'foo');
         assert.equal(widget4.get('stuff'), 'bar');
@@ -74,6 +86,53 @@ describe("diamondash.dashboard", function(){
         assert.equal(widget2.get('stuff'), 'spam');
         assert.equal(widget4.get('stuff'), 'ham');
       });
+
+      it("should fetch the snapshots with a single request", function() {
+        model.fetchSnapshots();
+        assert.equal(server.requests.length, 1);
+      });
+
+      it("should ask for changes since its widgets' snapshot versions",
+      function(done) {
+        widget2.snapshotVersion = function() { return 3000; };
+
+        server.respondWith(function(req) {
+          assert.equal(
+            req.url,
+            '/api/dashboards/dashboard-1/snapshot?since=widget-2%3A3000');
+          done();
+        });
+
+        model.fetchSnapshots();
+        server.respond();
+      });
+
+      it("should leave widgets missing from the response unchanged",
+      function() {
+        server.respondWith(
+          '/api/dashboards/dashboard-1/snapshot',
+          JSON.stringify({'widget-4': {stuff: 'ham'}}));
+
+        model.fetchSnapshots();
+        server.respond();
+
+        assert.equal(widget2.get('stuff'), 'foo');
+        assert.equal(widget4.get('stuff'), 'ham');
+      });
+
+      it("should trigger 'sync' events on the updated widgets", function() {
+        var synced = false;
+        widget2.on('sync', function() { synced = true; });
+
+        server.respondWith(
+          '/api/dashboards/dashboard-1/snapshot',
+          JSON.stringify({'widget-2': {stuff: 'spam'}}));
+
+        model.fetchSnapshots();
+        server.respond();
+
+        assert(synced);
+      });
     });
 
     describe(".poll()", function() {
@@ -84,12 +143,11 @@ describe("diamondash.dashboard", function(){
 
       it("should issue snapshot requests immediately", function() {
         server.respondWith(
-          '/api/widgets/dashboard-1/widget-2/snapshot',
-          JSON.stringify({stuff: 'spam'}));
-
-        server.respondWith(
-          '/api/widgets/dashboard-1/widget-4/snapshot',
-          JSON.stringify({stuff: 'ham'}));
+          '/api/dashboards/dashboard-1/snapshot',
+          JSON.stringify({
+            'widget-2': {stuff: 'spam'},
+            'widget-4': {stuff: 'ham'}
+          }));
 
         assert.equal(widget2.get('stuff'), 'foo');
         assert.equal(widget4.get('stuff'), 'bar');
@@ -102,28 +160,21 @@ describe("diamondash.dashboard", function(){
       });
 
       it("should issue snapshot requests each poll interval", function() {
-        var responses = {
-          widget2: [
-            {stuff: 'spam-0'},
-            {stuff: 'spam-1'},
-            {stuff: 'spam-2'}],
-          widget4: [
-            {stuff: 'ham-0'},
-            {stuff: 'ham-1'},
-            {stuff: 'ham-2'}]
-        };
+        var responses = [{
+          'widget-2': {stuff: 'spam-0'},
+          'widget-4': {stuff: 'ham-0'}
+        }, {
+          'widget-2': {stuff: 'spam-1'},
+          'widget-4': {stuff: 'ham-1'}
+        }, {
+          'widget-2': {stuff: 'spam-2'},
+          'widget-4': {stuff: 'ham-2'}
+        }];
 
         server.respondWith(
-          '/api/widgets/dashboard-1/widget-2/snapshot',
+          '/api/dashboards/dashboard-1/snapshot',
           function(req) {
-            var res = responses.widget2.shift();
-            req.respond(200, [], JSON.stringify(res));
-          });
-
-        server.respondWith(
-          '/api/widgets/dashboard-1/widget-4/snapshot',
-          function(req) {
-            var res = responses.widget4.shift();
+            var res = responses.shift();
             req.respond(200, [], JSON.stringify(res));
           });
 
@@ -155,7 +206,7 @@ describe("diamondash.dashboard", function(){
         var polls = 0;
 
         server.respondWith(
-          '/api/widgets/dashboard-1/widget-2/snapshot',
+          '/api/dashboards/dashboard-1/snapshot',
           function(req) {
             polls++;
             req.respond(200, [], '{}');
@@ -176,6 +227,86 @@ describe("diamondash.dashboard", function(){
         assert.equal(polls, 2);
       });
     });
+
+    describe(".subscribe()", function() {
+      var originalEventSource = window.EventSource;
+
+      var FakeEventSource = function(url) {
+        this.url = url;
+        this.listeners = {};
+        this.closed = false;
+        FakeEventSource.instances.push(this);
+      };
+
+      FakeEventSource.prototype.addEventListener = function(name, fn) {
+        this.listeners[name] = fn;
+      };
+
+      FakeEventSource.prototype.close = function() {
+        this.closed = true;
+      };
+
+      FakeEventSource.prototype.emit = function(name, data) {
+        this.listeners[name]({data: JSON.stringify(data)});
+      };
+
+      beforeEach(function() {
+        FakeEventSource.instances = [];
+        window.EventSource = FakeEventSource;
+      });
+
+      afterEach(function() {
+        window.EventSource = originalEventSource;
+      });
+
+      it("should subscribe to the dashboard's events", function() {
+        model.subscribe();
+
+        var source = FakeEventSource.instances[0];
+        assert.equal(source.url, '/api/dashboards/dashboard-1/events');
+      });
+
+      it("should subscribe only once", function() {
+        model.subscribe();
+        model.subscribe();
+        assert.equal(FakeEventSource.instances.length, 1);
+      });
+
+      it("should update its widgets with pushed snapshots", function() {
+        model.subscribe();
+
+        var source = FakeEventSource.instances[0];
+        source.emit('snapshot', {'widget-2': {stuff: 'spam'}});
+        assert.equal(widget2.get('stuff'), 'spam');
+        assert.equal(widget4.get('stuff'), 'bar');
+
+        source.emit('snapshot', {'widget-4': {stuff: 'ham'}});
+        assert.equal(widget2.get('stuff'), 'spam');
+        assert.equal(widget4.get('stuff'), 'ham');
+      });
+
+      it("should poll if server-sent events aren't supported", function() {
+        delete window.EventSource;
+        model.subscribe();
+
+        assert.equal(FakeEventSource.instances.length, 0);
+        assert.equal(server.requests.length, 1);
+        assert.equal(
+          server.requests[0].url,
+          '/api/dashboards/dashboard-1/snapshot');
+      });
+    });
+
+    describe(".unsubscribe()", function() {
+      it("should close the dashboard's event source", function() {
+        var closed = false;
+        model.eventSource = {close: function() { closed = true; }};
+
+        model.unsubscribe();
+        assert(closed);
+        assert.strictEqual(model.eventSource, null);
+      });
+    });
   });
 
   describe(".DashboardView", function() {
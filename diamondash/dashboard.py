@@ -6,9 +6,15 @@ import json
 from pkg_resources import resource_string
 
 from twisted.web.template import Element, renderer, XMLString
+from twisted.internet.defer import DeferredList, maybeDeferred
+from twisted.python import log
 
 from diamondash import utils, PageElement
+from diamondash.backends import BackendBatches
+from diamondash.cache import SnapshotCache
 from diamondash.config import Config, ConfigError
+from diamondash.events import DashboardEventSource
+from diamondash.stats import Stats, timer
 from diamondash.widgets.dynamic import DynamicWidget
 
 
@@ -135,11 +141,33 @@ class Dashboard(Element):
     loader = XMLString(
         resource_string(__name__, 'views/dashboard.xml'))
 
-    def __init__(self, config):
+    def __init__(self, config, agent=None, stats=None, breakers=None,
+                 limiters=None, rollups=None):
         self.config = config
+        self.agent = agent
+        self.stats = stats if stats is not None else Stats()
+
+        # the circuit breakers shared by backends with the same url, or
+        # `None` if backend requests aren't guarded by breakers
+        self.breakers = breakers
+
+        # the request limiters shared by backends with the same url, or
+        # `None` if backend requests aren't limited
+        self.limiters = limiters
+
+        # the store of rollups shared by the backends' metrics, or `None` if
+        # metrics are summarized from their raw datapoints
+        self.rollups = rollups
+
+        # whether the widgets' snapshots are being refreshed by a scheduler,
+        # in which case requests are given the latest refreshed snapshots
+        self.scheduled = False
 
         self.widgets = []
         self.widgets_by_name = {}
+        self.snapshots = SnapshotCache()
+        self.backend_batches = BackendBatches()
+        self.events = DashboardEventSource(self)
 
         for widget in self.config['widgets']:
             self.add_widget(widget, add_to_layout=False)
@@ -149,6 +177,25 @@ class Dashboard(Element):
         type_cls = utils.load_class_by_string(config['type'])
         widget = type_cls(config)
 
+        if isinstance(widget, DynamicWidget):
+            widget.stats = self.stats.widget_stats(
+                self.config['name'], config['name'])
+            widget.backend.stats = widget.stats
+            widget.backend.agent = self.agent
+            widget.backend.priority = widget.REQUEST_PRIORITY
+            widget.backend.rollups = self.rollups
+
+            if self.breakers is not None:
+                widget.backend.breaker = self.breakers.get(
+                    widget.backend.batch_key())
+
+            if self.limiters is not None:
+                widget.backend.limiter = self.limiters.get(
+                    widget.backend.batch_key())
+
+            self.backend_batches.add_backend(widget.backend)
+
+        self.snapshots.remove(config['name'])
         self.widgets_by_name[config['name']] = widget
         self.widgets.append(widget)
 
@@ -160,6 +207,84 @@ class Dashboard(Element):
         """Returns a widget using the passed in widget name."""
         return self.widgets_by_name.get(name, None)
 
+    def get_widget_snapshot(self, widget):
+        """
+        Returns a snapshot of a dynamic widget's data, shared between all
+        requests made within the widget's snapshot ttl. If the dashboard's
+        snapshots are being refreshed by a scheduler, the latest refreshed
+        snapshot is given instead.
+        """
+        name = widget.config['name']
+
+        if self.scheduled:
+            d = self.snapshots.get_latest(name)
+            if d is not None:
+                return d
+
+        ttl = widget.get_snapshot_ttl(self.config['poll_interval'])
+        return self.snapshots.get(
+            name, ttl, self.retrieve_widget_snapshot, widget)
+
+    def refresh_widget_snapshot(self, widget):
+        """
+        Retrieves a new snapshot of a dynamic widget's data, even if the
+        widget's current snapshot hasn't expired yet.
+        """
+        ttl = widget.get_snapshot_ttl(self.config['poll_interval'])
+        return self.snapshots.refresh(
+            widget.config['name'], ttl, self.retrieve_widget_snapshot, widget)
+
+    def retrieve_widget_snapshot(self, widget):
+        """
+        Retrieves a new snapshot of a dynamic widget's data, recording how
+        long the retrieval took.
+        """
+        elapsed = timer()
+        d = maybeDeferred(widget.get_snapshot)
+
+        def record(result):
+            widget.stats.record('snapshot', elapsed())
+            return result
+
+        d.addBoth(record)
+        return d
+
+    def get_dynamic_widgets(self):
+        return [w for w in self.widgets if isinstance(w, DynamicWidget)]
+
+    def get_snapshot(self, since=None):
+        """
+        Returns the snapshots of all of the dashboard's dynamic widgets, keyed
+        by widget name. Widgets whose snapshots could not be retrieved are
+        left out. ``since`` can map widget names to the snapshot versions a
+        client already holds, in which case those widgets' snapshots are
+        given as their changes since those versions.
+        """
+        since = since or {}
+        widgets = self.get_dynamic_widgets()
+        d = DeferredList(
+            [self.get_widget_snapshot(w) for w in widgets],
+            consumeErrors=True)
+
+        def collect_snapshots(results):
+            snapshots = {}
+
+            for widget, (success, result) in zip(widgets, results):
+                name = widget.config['name']
+
+                if success:
+                    if name in since:
+                        result = widget.get_snapshot_delta(result, since[name])
+                    snapshots[name] = result
+                else:
+                    log.msg("Error retrieving snapshot for widget '%s': %s"
+                            % (name, result.value))
+
+            return snapshots
+
+        d.addCallback(collect_snapshots)
+        return d
+
     def get_details(self):
         """Returns data describing the dashboard."""
         details = self.config.copy()
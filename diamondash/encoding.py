@@ -0,0 +1,143 @@
+# -*- test-case-name: diamondash.tests.test_encoding -*-
+
+"""Gzip encoding of diamondash's responses"""
+
+import zlib
+
+from twisted.web import http
+from twisted.web.static import File
+
+
+def accepts_gzip(request):
+    """Returns whether the request's client accepts gzipped responses"""
+    header = request.getHeader('accept-encoding') or ''
+
+    for coding in header.split(','):
+        params = [p.strip() for p in coding.split(';')]
+        if params[0].lower() not in ('gzip', 'x-gzip'):
+            continue
+
+        for param in params[1:]:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+
+        return True
+
+    return False
+
+
+def precompressed(resource):
+    """
+    Returns the gzipped variant of a static file if one exists alongside the
+    file and is at least as new as it, otherwise `None`.
+    """
+    if not isinstance(resource, File) or not resource.isfile():
+        return None
+
+    variant = resource.siblingExtension('.gz')
+    if not variant.isfile():
+        return None
+
+    if variant.getModificationTime() < resource.getModificationTime():
+        return None
+
+    return resource.createSimilarFile(variant.path)
+
+
+class GzipEncoder(object):
+    """
+    Gzips a response's body as it is written. Whether the body gets gzipped
+    is only decided once the response's headers are known: bodies that are
+    already encoded, event streams (which need each event to reach the
+    client as soon as it is written), partial responses and bodies that
+    don't compress well are left as they are.
+    """
+
+    COMPRESSIBLE_TYPES = [
+        'text/',
+        'application/json',
+        'application/javascript',
+        'application/x-javascript',
+        'image/svg+xml',
+    ]
+
+    UNCOMPRESSIBLE_TYPES = ['text/event-stream']
+
+    UNCOMPRESSIBLE_CODES = http.NO_BODY_CODES + (http.PARTIAL_CONTENT,)
+
+    def __init__(self, request, level):
+        self.request = request
+        self.level = level
+        self.started = False
+        self.compressor = None
+
+    @classmethod
+    def is_compressible(cls, content_type):
+        content_type = content_type.split(';')[0].strip().lower()
+
+        if any(content_type.startswith(t) for t in cls.UNCOMPRESSIBLE_TYPES):
+            return False
+
+        return any(content_type.startswith(t) for t in cls.COMPRESSIBLE_TYPES)
+
+    def start(self):
+        self.started = True
+        headers = self.request.responseHeaders
+
+        if self.request.code in self.UNCOMPRESSIBLE_CODES:
+            return
+
+        if headers.hasHeader('content-encoding'):
+            return
+
+        content_type = headers.getRawHeaders('content-type', [''])[0]
+        if not self.is_compressible(content_type):
+            return
+
+        headers.setRawHeaders('content-encoding', ['gzip'])
+        headers.removeHeader('content-length')
+
+        self.compressor = zlib.compressobj(
+            self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, data):
+        if not self.started:
+            self.start()
+
+        if self.compressor is None:
+            return data
+
+        return self.compressor.compress(data)
+
+    def finish(self):
+        if not self.started:
+            self.start()
+
+        if self.compressor is None:
+            return ''
+
+        return self.compressor.flush()
+
+
+class GzipEncoderFactory(object):
+    """
+    Gzips the responses of clients that accept gzip encoding. Meant to be
+    used with `twisted.web.resource.EncodingResourceWrapper`.
+    """
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def encoderForRequest(self, request):
+        # the response differs depending on the encodings the client accepts,
+        # so caches need to keep a response for each
+        request.setHeader('Vary', 'Accept-Encoding')
+
+        if not accepts_gzip(request):
+            return None
+
+        return GzipEncoder(request, self.level)
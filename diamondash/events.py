@@ -0,0 +1,206 @@
+# -*- test-case-name: diamondash.tests.test_events -*-
+
+"""Pushing of dashboard snapshots to clients as server-sent events"""
+
+import json
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+from diamondash import utils
+
+
+def format_event(data, event=None):
+    """Formats data as a server-sent event"""
+    lines = []
+
+    if event is not None:
+        lines.append('event: %s' % event)
+
+    lines.extend('data: %s' % line for line in data.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventStream(object):
+    """
+    A single client's stream of events. ``done`` fires once the stream is
+    closed by the server, and closes the stream if it is cancelled (eg.
+    when the client disconnects).
+    """
+
+    def __init__(self, request, on_close):
+        self.request = request
+        self.on_close = on_close
+        self.closed = False
+        self.last_write_time = utils.now()
+        self.done = Deferred(lambda d: self.close())
+
+    def write(self, data):
+        if self.closed:
+            return
+
+        self.request.write(data)
+        self.last_write_time = utils.now()
+
+    def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+        self.on_close(self)
+
+        if not self.done.called:
+            self.done.callback(None)
+
+
+class DashboardEventSource(object):
+    """
+    Computes a dashboard's snapshot once every poll interval while clients
+    are subscribed, and pushes the snapshots of the widgets whose data
+    changed to all of the subscribed clients.
+    """
+
+    clock = reactor
+
+    # how long a stream can go without any writes before a comment is sent to
+    # keep the connection alive
+    KEEPALIVE_INTERVAL = 15000
+
+    # how often streams are checked for whether they need a keepalive. This
+    # is done separately from pushing snapshots, so that streams are kept
+    # alive while snapshots are slow to compute or failing.
+    KEEPALIVE_CHECK_INTERVAL = 5000
+
+    def __init__(self, dashboard):
+        self.dashboard = dashboard
+        self.streams = []
+
+        # widget name -> (json encoded snapshot, snapshot)
+        self.snapshots = {}
+
+        self.loop = None
+        self.keepalive_loop = None
+
+    @property
+    def interval(self):
+        return self.dashboard.config['poll_interval']
+
+    def subscribe(self, request):
+        """
+        Subscribes a client's request to the dashboard's events, returning
+        a deferred that fires when the stream is closed.
+        """
+        request.setHeader('Content-Type', 'text/event-stream')
+        request.setHeader('Cache-Control', 'no-cache')
+
+        stream = EventStream(request, self.remove_stream)
+        self.streams.append(stream)
+
+        # tell the client how long to wait before reconnecting
+        stream.write('retry: %d\n\n' % self.interval)
+
+        if self.snapshots:
+            stream.write(self.format_snapshots(
+                dict((k, v) for k, (_, v) in self.snapshots.iteritems())))
+
+        if self.loop is None:
+            self.loop = LoopingCall(self.push)
+            self.loop.clock = self.clock
+            self.loop.start(self.interval / 1000.0, now=True)
+
+        if self.keepalive_loop is None:
+            self.keepalive_loop = LoopingCall(self.keep_alive)
+            self.keepalive_loop.clock = self.clock
+            self.keepalive_loop.start(
+                self.KEEPALIVE_CHECK_INTERVAL / 1000.0, now=False)
+
+        return stream.done
+
+    def remove_stream(self, stream):
+        if stream in self.streams:
+            self.streams.remove(stream)
+
+        if self.streams:
+            return
+
+        if self.loop is not None:
+            if self.loop.running:
+                self.loop.stop()
+            self.loop = None
+
+        if self.keepalive_loop is not None:
+            if self.keepalive_loop.running:
+                self.keepalive_loop.stop()
+            self.keepalive_loop = None
+
+    def close(self):
+        """Closes all of the subscribed streams."""
+        for stream in list(self.streams):
+            stream.close()
+
+    @staticmethod
+    def format_snapshots(snapshots):
+        return format_event(json.dumps(snapshots), 'snapshot')
+
+    def update_snapshots(self, snapshots):
+        """
+        Remembers the given snapshots, returning the changes to the ones that
+        changed since they were last updated.
+        """
+        changed = {}
+
+        for name, snapshot in snapshots.iteritems():
+            encoded = json.dumps(snapshot, sort_keys=True)
+            previous_encoded, previous = self.snapshots.get(name, (None, None))
+
+            if previous_encoded != encoded:
+                self.snapshots[name] = (encoded, snapshot)
+                changed[name] = self.get_snapshot_delta(
+                    name, previous, snapshot)
+
+        return changed
+
+    def get_snapshot_delta(self, name, previous, snapshot):
+        """
+        Returns the changes made to a widget's snapshot since the previous
+        snapshot pushed. Subscribers are sent the latest snapshots when they
+        subscribe, so all of them hold the previous snapshot.
+        """
+        widget = self.dashboard.get_widget(name)
+        if previous is None or widget is None:
+            return snapshot
+
+        since = widget.get_snapshot_version(previous)
+        if since is None:
+            return snapshot
+
+        return widget.get_snapshot_delta(snapshot, since)
+
+    def broadcast(self, data):
+        for stream in list(self.streams):
+            stream.write(data)
+
+    def keep_alive(self):
+        cutoff = utils.now() - self.KEEPALIVE_INTERVAL
+
+        for stream in list(self.streams):
+            if stream.last_write_time <= cutoff:
+                stream.write(': keepalive\n\n')
+
+    def push(self):
+        d = self.dashboard.get_snapshot()
+
+        def push_changes(snapshots):
+            changed = self.update_snapshots(snapshots)
+            if changed:
+                self.broadcast(self.format_snapshots(changed))
+
+        def log_error(f):
+            log.msg("Error pushing snapshots of dashboard '%s': %s"
+                    % (self.dashboard.config['name'], f.value))
+
+        d.addCallback(push_changes)
+        d.addErrback(log_error)
+        return d
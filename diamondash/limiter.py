@@ -0,0 +1,134 @@
+# -*- test-case-name: diamondash.tests.test_limiter -*-
+
+"""Limiting of the requests made to each backend at the same time"""
+
+import heapq
+from itertools import count
+
+from twisted.internet.defer import Deferred, maybeDeferred, succeed, fail
+
+from diamondash.stats import RollingHistogram, timer
+
+
+class QueueFullError(Exception):
+    """
+    Raised instead of queueing a request when a request limiter already has
+    as many requests waiting as it allows.
+    """
+
+
+class RequestLimiter(object):
+    """
+    Allows at most ``concurrency`` requests to be made at a time. Requests
+    made while the limit is reached wait in a queue of up to ``max_queued``
+    requests, and are made in order of priority (lowest first), then in the
+    order they were queued in. Requests made while the queue is full fail
+    with a `QueueFullError` instead.
+    """
+
+    def __init__(self, concurrency=10, max_queued=100):
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.tokens = concurrency
+
+        # a heap of (priority, sequence number, time waited, deferred) for
+        # each request waiting for a token
+        self.queue = []
+        self.seq = count()
+
+        self.rejected = 0
+
+        # how long (in milliseconds) requests waited for a token
+        self.waits = RollingHistogram()
+
+    def acquire(self, priority=0):
+        """
+        Returns a deferred firing once a token is available for a request
+        with the given ``priority``. The token needs to be given back with
+        `release` once the request is done.
+        """
+        if self.tokens > 0:
+            self.tokens -= 1
+            self.waits.record(0)
+            return succeed(None)
+
+        if len(self.queue) >= self.max_queued:
+            self.rejected += 1
+            return fail(QueueFullError(
+                "%d requests already waiting to be made" % len(self.queue)))
+
+        def cancel(d):
+            self.queue = [entry for entry in self.queue if entry[3] is not d]
+            heapq.heapify(self.queue)
+
+        d = Deferred(cancel)
+        heapq.heappush(
+            self.queue, (priority, next(self.seq), timer(), d))
+        return d
+
+    def release(self):
+        """
+        Gives back a token, handing it to the highest priority request
+        waiting for one if there is one.
+        """
+        if not self.queue:
+            self.tokens += 1
+            return
+
+        _, _, waited, d = heapq.heappop(self.queue)
+        self.waits.record(waited())
+        d.callback(None)
+
+    def run(self, priority, fn, *args, **kwargs):
+        """
+        Calls ``fn`` with the given args once a token is available for a
+        request with the given ``priority``, returning a deferred firing
+        with its result. The token is given back once ``fn``'s result is
+        available.
+        """
+        def acquired(_):
+            d = maybeDeferred(fn, *args, **kwargs)
+
+            def done(result):
+                self.release()
+                return result
+
+            return d.addBoth(done)
+
+        return self.acquire(priority).addCallback(acquired)
+
+    def get_stats(self):
+        return {
+            'active': self.concurrency - self.tokens,
+            'queued': len(self.queue),
+            'rejected': self.rejected,
+            'wait': self.waits.summary(),
+        }
+
+
+class RequestLimiters(object):
+    """
+    Keeps a request limiter for each key (for example, each backend url), so
+    that everything making requests with the same key shares a limit.
+    """
+
+    def __init__(self, concurrency=10, max_queued=100):
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.limiters = {}
+
+    def get(self, key):
+        limiter = self.limiters.get(key)
+
+        if limiter is None:
+            limiter = RequestLimiter(
+                concurrency=self.concurrency,
+                max_queued=self.max_queued)
+            self.limiters[key] = limiter
+
+        return limiter
+
+    def get_stats(self):
+        return dict(
+            (key, limiter.get_stats())
+            for key, limiter in self.limiters.iteritems())
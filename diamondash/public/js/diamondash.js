@@ -475,11 +475,32 @@ diamondash.widgets.dynamic = function() {
       return utils.joinPaths(_(this).result('url'), 'snapshot');
     },
 
+    snapshotVersion: function() {
+      return null;
+    },
+
     fetchSnapshot: function(options) {
       options = options || {};
       options.url = _(this).result('snapshotUrl');
-      
+
+      // only ask for the changes made since the snapshot we already have
+      var since = _(this).result('snapshotVersion');
+      if (since !== null) {
+        options.data = _({since: since}).extend(options.data);
+      }
+
       return this.fetch(options);
+    },
+
+    setSnapshot: function(snapshot, options) {
+      options = options || {};
+
+      if (!this.set(this.parse(snapshot, options), options)) {
+        return false;
+      }
+
+      this.trigger('sync', this, snapshot, options);
+      return this;
     }
   });
 
@@ -575,6 +596,55 @@ diamondash.widgets.chart.models = function() {
       'metrics': []
     },
 
+    snapshotVersion: function() {
+      var lastTimes = this.get('metrics')
+        .map(function(m) {
+          var datapoints = m.get('datapoints');
+
+          return datapoints.length
+            ? datapoints[datapoints.length - 1].x
+            : null;
+        })
+        .filter(function(x) { return x !== null; });
+
+      return lastTimes.length
+        ? _(lastTimes).min()
+        : null;
+    },
+
+    parse: function(resp, options) {
+      if (!_(resp).has('since')) {
+        return resp;
+      }
+
+      var self = this,
+          since = resp.since;
+
+      resp = _(resp).omit('since');
+      resp.metrics = _(resp.metrics).map(function(m) {
+        return self.mergeDelta(m, since);
+      });
+
+      return resp;
+    },
+
+    mergeDelta: function(delta, since) {
+      // merges the buckets changed since the given version into the metric's
+      // existing buckets, evicting buckets that fell off the start of the
+      // metric's series
+      var metric = this.get('metrics').get(delta.id),
+          datapoints = metric ? metric.get('datapoints') : [];
+
+      var retained = _(datapoints).filter(function(d) {
+        return delta.start !== null && d.x >= delta.start && d.x < since;
+      });
+
+      return {
+        id: delta.id,
+        datapoints: retained.concat(delta.datapoints)
+      };
+    },
+
     xMin: function() {
       return utils.min(this.get('metrics').map(function(m) {
         return m.xMin();
@@ -1673,14 +1743,59 @@ diamondash.dashboard = function() {
 
     initialize: function() {
       this.pollHandle = null;
+      this.eventSource = null;
+    },
+
+    snapshotUrl: function() {
+      return diamondash.url('api/dashboards', this.get('name'), 'snapshot');
+    },
+
+    eventsUrl: function() {
+      return diamondash.url('api/dashboards', this.get('name'), 'events');
+    },
+
+    snapshotVersions: function() {
+      return this.get('widgets')
+        .filter(function(m) {
+          return m instanceof dynamic.DynamicWidgetModel;
+        })
+        .map(function(m) {
+          return [m.id, _(m).result('snapshotVersion')];
+        })
+        .filter(function(version) { return version[1] !== null; })
+        .map(function(version) { return version.join(':'); });
     },
 
     fetchSnapshots: function(options) {
+      options = _.clone(options || {});
+      options.url = _(this).result('snapshotUrl');
+
+      // only ask for the changes made since the snapshots we already have
+      var since = this.snapshotVersions();
+      if (since.length) {
+        options.data = _({since: since}).extend(options.data);
+        options.traditional = true;
+      }
+
+      var self = this;
+      var success = options.success;
+
+      options.success = function(resp) {
+        self.setSnapshots(resp, options);
+        if (success) { success(self, resp, options); }
+      };
+
+      return this.sync('read', this, options);
+    },
+
+    setSnapshots: function(snapshots, options) {
       this.get('widgets').each(function(m) {
-        if (m instanceof dynamic.DynamicWidgetModel) {
-          m.fetchSnapshot(options);
+        if (m instanceof dynamic.DynamicWidgetModel && _(snapshots).has(m.id)) {
+          m.setSnapshot(snapshots[m.id], options);
         }
       });
+
+      return this;
     },
 
     poll: function(options) {
@@ -1703,6 +1818,33 @@ diamondash.dashboard = function() {
       }
 
       return this;
+    },
+
+    subscribe: function(options) {
+      // fall back to polling for browsers without server-sent events
+      if (typeof EventSource === 'undefined') {
+        return this.poll(options);
+      }
+
+      if (this.eventSource === null) {
+        var self = this;
+        this.eventSource = new EventSource(_(this).result('eventsUrl'));
+
+        this.eventSource.addEventListener('snapshot', function(e) {
+          self.setSnapshots(JSON.parse(e.data), options);
+        });
+      }
+
+      return this;
+    },
+
+    unsubscribe: function() {
+      if (this.eventSource !== null) {
+        this.eventSource.close();
+        this.eventSource = null;
+      }
+
+      return this.stopPolling();
     }
   });
 
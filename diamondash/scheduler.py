@@ -0,0 +1,113 @@
+# -*- test-case-name: diamondash.tests.test_scheduler -*-
+
+"""Refreshing of widget snapshots ahead of the requests for them"""
+
+import random
+
+from twisted.internet import reactor
+from twisted.internet.defer import DeferredSemaphore
+from twisted.internet.task import LoopingCall
+from twisted.application.service import Service
+from twisted.python import log
+
+
+class RefreshScheduler(Service):
+    """
+    Refreshes the snapshot of each dynamic widget once every snapshot ttl
+    (derived from the dashboard's poll interval and the widget's bucket
+    size), so that requests for snapshots can be given the refreshed
+    snapshots without waiting on the backends.
+
+    Each refresh is scheduled at a random offset of up to ``jitter`` times
+    the widget's ttl to spread the load on the backends, and at most
+    ``concurrency`` refreshes are made at a time.
+    """
+
+    clock = reactor
+
+    # how often (in milliseconds) the scheduler checks for snapshots that are
+    # due to be refreshed
+    TICK_INTERVAL = 1000
+
+    def __init__(self, diamondash, jitter=0.1, concurrency=4):
+        self.diamondash = diamondash
+        self.jitter = jitter
+        self.semaphore = DeferredSemaphore(concurrency)
+        self.loop = None
+
+        # (dashboard name, widget name) -> the time (in milliseconds) the
+        # widget's snapshot is next due to be refreshed
+        self.due = {}
+
+        # the (dashboard name, widget name) pairs of the snapshots being
+        # refreshed
+        self.refreshing = set()
+
+    def startService(self):
+        Service.startService(self)
+        self.loop = LoopingCall(self.tick)
+        self.loop.clock = self.clock
+        self.loop.start(self.TICK_INTERVAL / 1000.0)
+
+    def stopService(self):
+        Service.stopService(self)
+
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+
+        for dashboard in self.diamondash.dashboards_by_name.itervalues():
+            dashboard.scheduled = False
+
+    def now(self):
+        return self.clock.seconds() * 1000
+
+    def first_due(self, now, ttl):
+        return now + random.uniform(0, self.jitter * ttl)
+
+    def next_due(self, now, ttl):
+        return now + ttl * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def tick(self):
+        """
+        Refreshes the snapshots that are due to be refreshed, and starts
+        scheduling the snapshots of widgets added since the last tick.
+        """
+        now = self.now()
+        keys = set()
+
+        for dashboard in self.diamondash.dashboards_by_name.values():
+            dashboard.scheduled = True
+            poll_interval = dashboard.config['poll_interval']
+
+            for widget in dashboard.get_dynamic_widgets():
+                key = (dashboard.config['name'], widget.config['name'])
+                keys.add(key)
+
+                ttl = widget.get_snapshot_ttl(poll_interval)
+                due = self.due.get(key)
+
+                if due is None:
+                    due = self.due[key] = self.first_due(now, ttl)
+
+                if due <= now and key not in self.refreshing:
+                    self.due[key] = self.next_due(now, ttl)
+                    self.refresh(key, dashboard, widget)
+
+        # forget the widgets that have been removed
+        for key in set(self.due) - keys:
+            del self.due[key]
+
+    def refresh(self, key, dashboard, widget):
+        self.refreshing.add(key)
+        d = self.semaphore.run(dashboard.refresh_widget_snapshot, widget)
+
+        def failed(f):
+            log.msg("Error refreshing snapshot for widget '%s' of dashboard "
+                    "'%s': %s" % (key[1], key[0], f.value))
+
+        def done(_):
+            self.refreshing.discard(key)
+
+        d.addErrback(failed)
+        d.addBoth(done)
+        return d
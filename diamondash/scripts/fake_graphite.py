@@ -0,0 +1,259 @@
+# -*- test-case-name: diamondash.scripts.tests.test_fake_graphite -*-
+
+"""
+A stand-in for graphite's render api, for load testing diamondash without
+a real graphite.
+
+Series are synthesized deterministically from their target names, so the
+same target and time window always give the same datapoints.
+"""
+
+import re
+import json
+import math
+import time
+import zlib
+import random
+
+from zope.interface import implements
+from twisted.python import usage, log
+from twisted.plugin import IPlugin
+from twisted.application import strports
+from twisted.application.service import IServiceMaker
+from twisted.internet import reactor
+from twisted.internet.task import deferLater
+from twisted.internet.defer import CancelledError
+from twisted.web import http
+from twisted.web.server import Site, NOT_DONE_YET
+from twisted.web.resource import Resource
+
+from diamondash import utils
+
+
+class Options(usage.Options):
+    optParameters = [
+        ['port', 'p', 8000, "Port to listen on", int],
+        ['step', 's', 10, "Seconds between datapoints", int],
+        ['max-points', 'm', 0,
+         "Maximum datapoints per series, 0 for no maximum", int],
+        ['latency', 'l', '0s', "Delay before responding (eg. '200ms')"],
+        ['jitter', 'j', '0s', "Maximum random delay added to the latency"],
+        ['null-ratio', 'n', 0.05, "Fraction of datapoints that are null",
+         float]]
+
+    def postOptions(self):
+        self['latency'] = parse_duration(self['latency'])
+        self['jitter'] = parse_duration(self['jitter'])
+
+
+def parse_duration(duration):
+    """
+    Parses a duration like diamondash's intervals, also allowing an 'ms'
+    suffix for milliseconds. Returns the duration in milliseconds.
+    """
+    if duration.endswith('ms'):
+        return int(duration[:-2])
+    return utils.parse_interval(duration)
+
+
+_relative_time_re = re.compile(r'^-(\d+)([a-z]+)$')
+
+_time_units = [
+    ('s', 1),
+    ('min', 60),
+    ('h', 3600),
+    ('d', 86400),
+    ('w', 604800),
+    ('mon', 2592000),
+    ('y', 31536000),
+]
+
+
+def parse_time(value, now):
+    """
+    Parses a graphite `from` or `until` param into a unix timestamp. Handles
+    timestamps, 'now' and relative times like '-24h' or '-5min'.
+    """
+    if value == 'now':
+        return now
+
+    if value.isdigit():
+        return int(value)
+
+    match = _relative_time_re.match(value)
+    if match is None:
+        raise ValueError("Unrecognised time '%s'" % value)
+
+    n, unit = match.groups()
+    for name, seconds in _time_units:
+        if unit.startswith(name):
+            return now - (int(n) * seconds)
+
+    raise ValueError("Unrecognised time unit '%s'" % unit)
+
+
+_alias_re = re.compile(r'''^alias\((.*),\s*(?:'([^']*)'|"([^"]*)")\s*\)$''')
+
+
+def parse_target(target):
+    """
+    Returns the name the series of ``target`` should be given and the
+    expression its datapoints should be synthesized from, unwrapping any
+    `alias()` calls.
+    """
+    name = None
+    target = target.strip()
+
+    match = _alias_re.match(target)
+    while match is not None:
+        expr, single_quoted, double_quoted = match.groups()
+        if name is None:
+            name = (
+                single_quoted if single_quoted is not None
+                else double_quoted)
+        target = expr.strip()
+        match = _alias_re.match(target)
+
+    return (name if name is not None else target), target
+
+
+def hash_fraction(*parts):
+    """Deterministically maps the given parts to a float in [0, 1)"""
+    h = zlib.crc32(':'.join(str(p) for p in parts)) & 0xffffffff
+    return h / 4294967296.0
+
+
+def synthesize_datapoints(expr, from_time, until_time, step,
+                          null_ratio=0.05):
+    """
+    Synthesizes `[value, timestamp]` datapoints for ``expr`` between the
+    unix timestamps ``from_time`` and ``until_time``. Each expression gets
+    its own scale, period and phase, and a bit of noise.
+    """
+    scale = 10 ** int(hash_fraction(expr, 'scale') * 6)
+    period = step * (20 + int(hash_fraction(expr, 'period') * 200))
+    phase = hash_fraction(expr, 'phase') * 2 * math.pi
+
+    start = from_time - (from_time % step)
+    if start < from_time:
+        start += step
+
+    datapoints = []
+    for t in xrange(start, until_time + 1, step):
+        if hash_fraction(expr, t, 'null') < null_ratio:
+            datapoints.append([None, t])
+            continue
+
+        wave = 1 + math.sin((2 * math.pi * t / period) + phase)
+        noise = hash_fraction(expr, t)
+        datapoints.append([round(scale * (wave + 0.2 * noise), 3), t])
+
+    return datapoints
+
+
+class RenderResource(Resource):
+    """Responds to graphite render requests with synthesized series"""
+
+    isLeaf = True
+
+    clock = reactor
+
+    def __init__(self, step=10, max_points=0, latency=0, jitter=0,
+                 null_ratio=0.05):
+        Resource.__init__(self)
+        self.step = step
+        self.max_points = max_points
+        self.latency = latency
+        self.jitter = jitter
+        self.null_ratio = null_ratio
+
+    def get_step(self, from_time, until_time):
+        """
+        Returns the seconds between datapoints, increased if needed to keep
+        each series within the maximum number of datapoints.
+        """
+        step = self.step
+        if self.max_points:
+            span = until_time - from_time
+            step = max(step, int(math.ceil(span / float(self.max_points))))
+        return step
+
+    def render_series(self, targets, from_time, until_time):
+        step = self.get_step(from_time, until_time)
+        series = []
+
+        for target in targets:
+            name, expr = parse_target(target)
+            series.append({
+                'target': name,
+                'datapoints': synthesize_datapoints(
+                    expr, from_time, until_time, step, self.null_ratio),
+            })
+
+        return series
+
+    def get_delay(self):
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        return delay / 1000.0
+
+    def render(self, request):
+        now = int(time.time())
+        args = request.args
+
+        try:
+            from_time = parse_time(args.get('from', ['-1d'])[0], now)
+            until_time = parse_time(args.get('until', ['now'])[0], now)
+        except ValueError, e:
+            request.setResponseCode(http.BAD_REQUEST)
+            return str(e)
+
+        targets = args.get('target', [])
+        series = self.render_series(targets, from_time, until_time)
+
+        request.setHeader('Content-Type', 'application/json')
+        body = json.dumps(series)
+
+        delay = self.get_delay()
+        if not delay:
+            return body
+
+        d = deferLater(self.clock, delay, lambda: body)
+        d.addCallback(self.finish_request, request)
+        d.addErrback(lambda f: f.trap(CancelledError))
+
+        # stop waiting if the client goes away before we respond
+        request.notifyFinish().addErrback(lambda _: d.cancel())
+        return NOT_DONE_YET
+
+    def finish_request(self, body, request):
+        request.write(body)
+        request.finish()
+
+
+class RootResource(Resource):
+    def __init__(self, render_resource):
+        Resource.__init__(self)
+        self.putChild('render', render_resource)
+
+
+class FakeGraphiteServiceMaker(object):
+    implements(IServiceMaker, IPlugin)
+    tapname = "fake-graphite"
+    description = "Serve synthesized graphite render responses"
+    options = Options
+
+    def makeService(self, options):
+        render_resource = RenderResource(
+            step=options['step'],
+            max_points=options['max-points'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            null_ratio=options['null-ratio'])
+
+        log.msg("Serving fake graphite render responses on port %s"
+                % options['port'])
+
+        site = Site(RootResource(render_resource))
+        return strports.service('tcp:%s' % options['port'], site)
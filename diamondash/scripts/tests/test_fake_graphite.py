@@ -0,0 +1,156 @@
+import json
+import time
+
+from twisted.trial import unittest
+from twisted.web.error import Error
+from twisted.web.server import Site
+from twisted.internet import reactor
+from twisted.internet.task import Clock
+from twisted.internet.defer import inlineCallbacks
+from twisted.web.test.requesthelper import DummyRequest
+
+from diamondash import utils
+from diamondash.scripts.fake_graphite import (
+    Options, RenderResource, RootResource, parse_time, parse_target,
+    synthesize_datapoints)
+
+
+class FakeGraphiteTestCase(unittest.TestCase):
+    def test_options(self):
+        options = Options()
+        options.parseOptions(['--latency', '200ms', '--jitter', '1s'])
+        self.assertEqual(options['latency'], 200)
+        self.assertEqual(options['jitter'], 1000)
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time('now', 1000), 1000)
+        self.assertEqual(parse_time('500', 1000), 500)
+        self.assertEqual(parse_time('-10s', 1000), 990)
+        self.assertEqual(parse_time('-2min', 1000), 880)
+        self.assertEqual(parse_time('-1h', 7200), 3600)
+        self.assertEqual(parse_time('-1d', 86400), 0)
+        self.assertEqual(parse_time('-24hours', 86400), 0)
+
+    def test_parse_time_for_bad_times(self):
+        self.assertRaises(ValueError, parse_time, 'yesterday', 1000)
+        self.assertRaises(ValueError, parse_time, '-3fortnights', 1000)
+
+    def test_parse_target(self):
+        self.assertEqual(parse_target('a.b'), ('a.b', 'a.b'))
+        self.assertEqual(
+            parse_target("alias(a.b, 'foo')"),
+            ('foo', 'a.b'))
+        self.assertEqual(
+            parse_target('alias(sumSeries(a.*), "foo")'),
+            ('foo', 'sumSeries(a.*)'))
+        self.assertEqual(
+            parse_target("alias(alias(a.b, 'bar'), 'foo')"),
+            ('foo', 'a.b'))
+
+    def test_synthesize_datapoints(self):
+        datapoints = synthesize_datapoints('a.b', 95, 150, 10, null_ratio=0)
+        self.assertEqual(
+            [t for v, t in datapoints],
+            [100, 110, 120, 130, 140, 150])
+        self.assertTrue(all(v is not None for v, t in datapoints))
+
+    def test_synthesize_datapoints_determinism(self):
+        self.assertEqual(
+            synthesize_datapoints('a.b', 0, 1000, 10),
+            synthesize_datapoints('a.b', 0, 1000, 10))
+
+        self.assertNotEqual(
+            synthesize_datapoints('a.b', 0, 1000, 10),
+            synthesize_datapoints('a.c', 0, 1000, 10))
+
+    def test_synthesize_datapoints_for_nulls(self):
+        datapoints = synthesize_datapoints('a.b', 0, 1000, 10, null_ratio=1)
+        self.assertTrue(all(v is None for v, t in datapoints))
+
+    def test_max_points(self):
+        resource = RenderResource(step=10, max_points=10)
+        self.assertEqual(resource.get_step(0, 50), 10)
+        self.assertEqual(resource.get_step(0, 1000), 100)
+
+    def test_render_latency(self):
+        resource = RenderResource(latency=200)
+        resource.clock = Clock()
+
+        request = DummyRequest([''])
+        request.args = {
+            'target': ['a.b'],
+            'from': ['0'],
+            'until': ['100'],
+        }
+
+        d = request.notifyFinish()
+        resource.render(request)
+        self.assertEqual(request.written, [])
+
+        resource.clock.advance(0.2)
+        [body] = request.written
+        self.assertEqual(json.loads(body), [{
+            'target': 'a.b',
+            'datapoints': synthesize_datapoints('a.b', 0, 100, 10),
+        }])
+        return d
+
+
+class RenderResourceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patch(time, 'time', lambda: 3600)
+        self.resource = RenderResource(step=60, null_ratio=0)
+        return self.start_server()
+
+    def tearDown(self):
+        return self.ws.loseConnection()
+
+    @inlineCallbacks
+    def start_server(self):
+        site_factory = Site(RootResource(self.resource))
+        self.ws = yield reactor.listenTCP(0, site_factory)
+        addr = self.ws.getHost()
+        self.url = "http://%s:%s" % (addr.host, addr.port)
+
+    @inlineCallbacks
+    def test_render(self):
+        response = yield utils.http_request(
+            "%s/render/?target=alias(a.b,'foo')&target=c.d"
+            "&from=-5min&until=now&format=json" % self.url)
+
+        self.assertEqual(response['headers']['content-type'],
+                         ['application/json'])
+
+        self.assertEqual(json.loads(response['body']), [{
+            'target': 'foo',
+            'datapoints': synthesize_datapoints('a.b', 3300, 3600, 60, 0),
+        }, {
+            'target': 'c.d',
+            'datapoints': synthesize_datapoints('c.d', 3300, 3600, 60, 0),
+        }])
+
+    @inlineCallbacks
+    def test_render_post(self):
+        response = yield utils.http_request(
+            "%s/render/" % self.url,
+            method='POST',
+            data="target=a.b&from=-5min&until=now&format=json",
+            headers={'Content-Type': 'application/x-www-form-urlencoded'})
+
+        self.assertEqual(json.loads(response['body']), [{
+            'target': 'a.b',
+            'datapoints': synthesize_datapoints('a.b', 3300, 3600, 60, 0),
+        }])
+
+    @inlineCallbacks
+    def test_render_defaults(self):
+        response = yield utils.http_request(
+            "%s/render?target=a.b" % self.url)
+
+        [series] = json.loads(response['body'])
+        self.assertEqual(series['datapoints'][0][1], 3600 - 86400)
+        self.assertEqual(series['datapoints'][-1][1], 3600)
+
+    def test_render_for_bad_times(self):
+        d = utils.http_request("%s/render/?target=a.b&from=-1x" % self.url)
+        return self.assertFailure(d, Error)
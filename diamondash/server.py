@@ -4,19 +4,29 @@
 
 import yaml
 import json
+import hashlib
 from os import path
 from glob import glob
 from pkg_resources import resource_filename, resource_string
 
 from twisted.web import http
 from twisted.web.static import File
-from twisted.web.template import Element, renderer, XMLString, tags
-from twisted.internet.defer import maybeDeferred
+from twisted.web.resource import EncodingResourceWrapper
+from twisted.web.template import (
+    Element, renderer, XMLString, tags, flattenString)
+from twisted.internet.defer import maybeDeferred, CancelledError
+from twisted.internet.error import TimeoutError
 from twisted.python import log
 from klein import Klein
 
 from diamondash import utils, PageElement
 from diamondash.config import Config, ConfigError
+from diamondash.stats import Stats
+from diamondash.cache import PageCache
+from diamondash.breaker import CircuitBreakers
+from diamondash.limiter import RequestLimiters
+from diamondash.backends.rollups import RollupStore
+from diamondash.encoding import GzipEncoderFactory, accepts_gzip, precompressed
 from dashboard import DashboardConfig, Dashboard, DashboardPage
 from diamondash.widgets.dynamic import DynamicWidget
 
@@ -29,11 +39,84 @@ class DiamondashConfig(Config):
         'backend': {
             'type': 'diamondash.backends.graphite.GraphiteBackend',
             'url': 'http://127.0.0.1:8080',
-        }
+        },
+        'http_client': {
+            'max_persistent_per_host': 10,
+            'idle_timeout': '240s',
+            'connect_timeout': '30s',
+        },
+        'circuit_breaker': {
+            'failure_threshold': 5,
+            'reset_timeout': '30s',
+            'probes': 1,
+        },
+        'request_limiter': {
+            'concurrency': 10,
+            'max_queued': 100,
+        },
+        'rollups': {
+            'enabled': False,
+            'bucket_sizes': ['5m', '1h'],
+            'max_points': 1000000,
+            'retention': '7d',
+        },
+        'scheduler': {
+            'enabled': False,
+            'jitter': 0.1,
+            'concurrency': 4,
+        },
+        'stats': {
+            'window': '60s',
+            'carbon': None,
+        },
+    }
+
+    CARBON_DEFAULTS = {
+        'host': 'localhost',
+        'port': 2003,
+        'interval': '30s',
+        'prefix': 'diamondash',
     }
 
     @classmethod
     def parse(cls, config):
+        http_client = utils.add_dicts(
+            cls.DEFAULTS['http_client'], config['http_client'])
+
+        for field in ('idle_timeout', 'connect_timeout'):
+            http_client[field] = utils.parse_interval(http_client[field])
+
+        config['http_client'] = http_client
+
+        circuit_breaker = utils.add_dicts(
+            cls.DEFAULTS['circuit_breaker'], config['circuit_breaker'])
+        circuit_breaker['reset_timeout'] = utils.parse_interval(
+            circuit_breaker['reset_timeout'])
+        config['circuit_breaker'] = circuit_breaker
+
+        config['request_limiter'] = utils.add_dicts(
+            cls.DEFAULTS['request_limiter'], config['request_limiter'])
+
+        rollups = utils.add_dicts(cls.DEFAULTS['rollups'], config['rollups'])
+        rollups['bucket_sizes'] = [
+            utils.parse_interval(size) for size in rollups['bucket_sizes']]
+        rollups['retention'] = utils.parse_interval(rollups['retention'])
+        config['rollups'] = rollups
+
+        config['scheduler'] = utils.add_dicts(
+            cls.DEFAULTS['scheduler'], config['scheduler'])
+
+        stats = utils.add_dicts(cls.DEFAULTS['stats'], config['stats'])
+        stats['window'] = utils.parse_interval(stats['window'])
+
+        if stats['carbon'] is not None:
+            stats['carbon'] = utils.add_dicts(
+                cls.CARBON_DEFAULTS, stats['carbon'])
+            stats['carbon']['interval'] = utils.parse_interval(
+                stats['carbon']['interval'])
+
+        config['stats'] = stats
+
         dashboard_configs = sorted(
             config.get('dashboards', []),
             key=lambda d: d['name'])
@@ -84,16 +167,58 @@ class DiamondashServer(object):
         self.dashboards_by_name = {}
         self.dashboards_by_share_id = {}
 
+        http_client = config['http_client']
+        self.http_pool = utils.mk_http_pool(
+            max_persistent_per_host=http_client['max_persistent_per_host'],
+            idle_timeout=http_client['idle_timeout'])
+        self.agent = utils.mk_http_agent(
+            self.http_pool,
+            connect_timeout=http_client['connect_timeout'])
+
+        self.stats = Stats(window=config['stats']['window'])
+        self.breakers = CircuitBreakers(**config['circuit_breaker'])
+        self.limiters = RequestLimiters(**config['request_limiter'])
+        self.rollups = self.create_rollups(config['rollups'])
+
         self.index = Index()
+        self.pages = PageCache()
         self.resources = self.create_resources()
 
         for dashboard_config in config['dashboards']:
             self.add_dashboard(dashboard_config)
 
+    @staticmethod
+    def create_rollups(config):
+        if not config['enabled']:
+            return None
+
+        return RollupStore(
+            bucket_sizes=config['bucket_sizes'],
+            max_points=config['max_points'],
+            retention=config['retention'])
+
     @classmethod
     def create_resources(cls):
         return File(path.join(cls.RESOURCE_DIRNAME))
 
+    def resource(self):
+        """
+        Returns the resource serving the server's routes, gzipping responses
+        for clients that accept it.
+        """
+        return EncodingResourceWrapper(
+            self.app.resource(), [GzipEncoderFactory()])
+
+    def stop(self):
+        """
+        Closes the dashboards' event streams and the server's persistent
+        backend connections.
+        """
+        for dashboard in self.dashboards_by_name.itervalues():
+            dashboard.events.close()
+
+        return self.http_pool.closeCachedConnections()
+
     def get_dashboard(self, name):
         return self.dashboards_by_name.get(name)
 
@@ -108,23 +233,37 @@ class DiamondashServer(object):
         if not overwrite and self.has_dashboard(config['name']):
             return log.msg("Dashboard '%s' already exists" % config['name'])
 
-        dashboard = Dashboard(config)
+        old_dashboard = self.get_dashboard(config['name'])
+        if old_dashboard is not None:
+            old_dashboard.events.close()
+
+        dashboard = Dashboard(
+            config,
+            agent=self.agent,
+            stats=self.stats,
+            breakers=self.breakers,
+            limiters=self.limiters,
+            rollups=self.rollups)
         self.dashboards_by_name[config['name']] = dashboard
 
         if 'share_id' in config:
             self.dashboards_by_share_id[config['share_id']] = dashboard
 
         self.index.add_dashboard(dashboard)
+        self.invalidate_pages(config['name'])
 
     def remove_dashboard(self, name):
         dashboard = self.get_dashboard(name)
         if dashboard is None:
             return None
 
+        dashboard.events.close()
         self.index.remove_dashboard(name)
+        self.stats.remove_dashboard(name)
         if 'share_id' in dashboard.config:
             del self.dashboards_by_share_id[dashboard.config['share_id']]
         del self.dashboards_by_name[name]
+        self.invalidate_pages(name)
 
     # Rendering
     # =========
@@ -133,15 +272,40 @@ class DiamondashServer(object):
         request.setResponseCode(code)
         return ErrorPage(code, message)
 
+    def render_page(self, key, element):
+        """
+        Returns a deferred firing with the element's rendered html, cached
+        under ``key`` until the page is invalidated.
+        """
+        return self.pages.get(key, flattenString, None, element)
+
+    def invalidate_pages(self, name):
+        """
+        Invalidates the rendered pages that display the dashboard called
+        ``name``.
+        """
+        self.pages.invalidate(
+            ('index',),
+            ('dashboard', name, False),
+            ('dashboard', name, True))
+
     @app.route('/')
     def show_index(self, request):
-        return self.index
+        return self.render_page(('index',), self.index)
 
     @app.route('/public/<string:res_type>/<string:name>')
     def serve_resource(self, request, res_type, name):
-        """Routing for all public resources"""
+        """
+        Routing for all public resources. Gzipped variants of the resources
+        are served instead where they exist.
+        """
         res_dir = self.resources.getChild(res_type, request)
-        return res_dir.getChild(name, request)
+        resource = res_dir.getChild(name, request)
+
+        if accepts_gzip(request):
+            return precompressed(resource) or resource
+
+        return resource
 
     @app.route('/favicon.ico')
     def favicon(self, request):
@@ -156,7 +320,10 @@ class DiamondashServer(object):
                 request,
                 code=http.NOT_FOUND,
                 message="Dashboard '%s' does not exist" % name)
-        return DashboardPage(dashboard)
+
+        return self.render_page(
+            ('dashboard', dashboard.config['name'], False),
+            DashboardPage(dashboard))
 
     @app.route('/shared/<string:share_id>')
     def render_shared_dashboard(self, request, share_id):
@@ -169,7 +336,10 @@ class DiamondashServer(object):
                 message=(
                     "Dashboard with share id '%s' does not exist "
                     "or is not shared" % share_id))
-        return DashboardPage(dashboard, shared=True)
+
+        return self.render_page(
+            ('dashboard', dashboard.config['name'], True),
+            DashboardPage(dashboard, shared=True))
 
     # API
     # ===)
@@ -184,6 +354,25 @@ class DiamondashServer(object):
         request.setResponseCode(code)
         return json.dumps(data)
 
+    @classmethod
+    def api_cacheable_response(cls, request, data, max_age):
+        """
+        Responds with the given data, tagged with a hash of its encoding so
+        that clients holding the same data get a 304 response without a
+        body. ``max_age`` is how long (in milliseconds) clients and proxies
+        can reuse the response for without asking again.
+        """
+        body = cls.api_response(request, data)
+
+        request.responseHeaders.setRawHeaders(
+            'Cache-Control', ['max-age=%d' % (max_age // 1000)])
+
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if request.setETag(etag) == http.CACHED:
+            return ''
+
+        return body
+
     @classmethod
     def api_success_response(cls, request, data=None, code=http.OK):
         return cls.api_response(request, code=code, data={
@@ -198,20 +387,74 @@ class DiamondashServer(object):
             'message': message,
         })
 
+    @classmethod
+    def api_mark_stale(cls, data, request, dashboard, widgets):
+        """
+        Warns the client that the given snapshot data is stale if any of the
+        given widgets' snapshots had to be given from an earlier window
+        because retrieving them failed.
+        """
+        if any(dashboard.snapshots.is_stale(w.config['name'])
+               for w in widgets):
+            request.responseHeaders.setRawHeaders(
+                'Warning', ['110 - "Response is Stale"'])
+
+        return data
+
+    @classmethod
+    def api_timeout_error(cls, f, request):
+        f.trap(TimeoutError)
+        log.msg("Timed out during api request: %s" % f.value)
+        return cls.api_error_response(
+            request,
+            code=http.GATEWAY_TIMEOUT,
+            message="Timed out waiting for the backend to respond")
+
+    @classmethod
+    def api_unhandled_error(cls, f, request):
+        # the request was cancelled because the client went away, so there
+        # is no one to respond to
+        if f.check(CancelledError):
+            return f
+
+        f.trap(Exception)
+        log.msg("Unhandled error occured during api request: %s" % f.value)
+        return cls.api_error_response(
+            request,
+            code=http.INTERNAL_SERVER_ERROR,
+            message="Some unhandled error occurred")
+
     @classmethod
     def api_get(cls, request, getter, *args, **kwargs):
         d = maybeDeferred(getter, *args, **kwargs)
+        d.addCallback(lambda data: cls.api_response(request, data))
+        d.addErrback(cls.api_unhandled_error, request)
+        return d
 
-        def trap_unhandled_error(f):
-            f.trap(Exception)
-            log.msg("Unhandled error occured during api request: %s" % f.value)
-            return cls.api_error_response(
-                request,
-                code=http.INTERNAL_SERVER_ERROR,
-                message="Some unhandled error occurred")
+    @classmethod
+    def api_get_cacheable(cls, request, max_age, getter, *args, **kwargs):
+        """
+        Like `api_get`, but responds with an ETag and a max age of
+        ``max_age`` milliseconds.
+        """
+        d = maybeDeferred(getter, *args, **kwargs)
+        d.addCallback(
+            lambda data: cls.api_cacheable_response(request, data, max_age))
+        d.addErrback(cls.api_unhandled_error, request)
+        return d
 
-        d.addCallback(lambda data: cls.api_response(request, data))
-        d.addErrback(trap_unhandled_error)
+    @classmethod
+    def api_get_snapshot(cls, request, stats, max_age, getter,
+                         *args, **kwargs):
+        """
+        Like `api_get_cacheable`, but also records how long the snapshot took
+        to encode in the given stats.
+        """
+        d = maybeDeferred(getter, *args, **kwargs)
+        d.addCallback(lambda data: stats.timed(
+            'encode', cls.api_cacheable_response, request, data, max_age))
+        d.addErrback(cls.api_timeout_error, request)
+        d.addErrback(cls.api_unhandled_error, request)
         return d
 
     # Dashboard API
@@ -269,7 +512,53 @@ class DiamondashServer(object):
                 request,
                 code=http.NOT_FOUND,
                 message="Dashboard '%s' does not exist" % name)
-        return self.api_get(request, dashboard.get_details)
+        return self.api_get_cacheable(
+            request, dashboard.config['poll_interval'], dashboard.get_details)
+
+    @app.route('/api/dashboards/<string:name>/snapshot', methods=['GET'])
+    def api_get_dashboard_snapshot(self, request, name):
+        dashboard = self.get_dashboard(name.encode('utf-8'))
+        if dashboard is None:
+            return self.api_error_response(
+                request,
+                code=http.NOT_FOUND,
+                message="Dashboard '%s' does not exist" % name)
+
+        # the snapshot versions the client holds, given as 'widget:version'
+        since = {}
+        for value in request.args.get('since', []):
+            try:
+                widget_name, version = value.rsplit(':', 1)
+                since[widget_name] = int(version)
+            except ValueError:
+                return self.api_error_response(
+                    request,
+                    code=http.BAD_REQUEST,
+                    message="'since' needs to be a widget name and a "
+                            "snapshot version, as 'widget:version'")
+
+        def get_snapshot():
+            d = dashboard.get_snapshot(since)
+            d.addCallback(
+                self.api_mark_stale, request, dashboard,
+                dashboard.get_dynamic_widgets())
+            return d
+
+        return self.api_get_snapshot(
+            request,
+            self.stats.widget_stats(dashboard.config['name'], None),
+            dashboard.config['poll_interval'],
+            get_snapshot)
+
+    @app.route('/api/dashboards/<string:name>/events', methods=['GET'])
+    def api_get_dashboard_events(self, request, name):
+        dashboard = self.get_dashboard(name.encode('utf-8'))
+        if dashboard is None:
+            return self.api_error_response(
+                request,
+                code=http.NOT_FOUND,
+                message="Dashboard '%s' does not exist" % name)
+        return dashboard.events.subscribe(request)
 
     @app.route('/api/dashboards', methods=['POST'])
     def api_create_dashboard(self, request):
@@ -343,7 +632,61 @@ class DiamondashServer(object):
                 code=http.BAD_REQUEST,
                 message="Widget '%s' is not dynamic" % widget_name)
 
-        return self.api_get(request, widget.get_snapshot)
+        max_age = widget.get_snapshot_ttl(dashboard.config['poll_interval'])
+
+        since = request.args.get('since', [None])[0]
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return self.api_error_response(
+                    request,
+                    code=http.BAD_REQUEST,
+                    message="'since' needs to be a snapshot version")
+
+        def get_snapshot():
+            d = dashboard.get_widget_snapshot(widget)
+            d.addCallback(self.api_mark_stale, request, dashboard, [widget])
+
+            if since is not None:
+                d.addCallback(widget.get_snapshot_delta, since)
+
+            return d
+
+        return self.api_get_snapshot(
+            request, widget.stats, max_age, get_snapshot)
+
+    # Stats API
+    # ---------
+
+    def get_stats(self):
+        """
+        Returns the timings recorded for each dashboard and widget, along with
+        the snapshot cache stats of each dashboard, the state of the circuit
+        breaker and request limiter for each backend url, and the rollup
+        store stats if rollups are enabled.
+        """
+        stats = self.stats.get_stats()
+
+        for name, dashboard in self.dashboards_by_name.iteritems():
+            dashboard_stats = stats.setdefault(name, {
+                'stages': {},
+                'widgets': {},
+            })
+            dashboard_stats['snapshot_cache'] = dashboard.snapshots.get_stats()
+
+        return {
+            'dashboards': stats,
+            'breakers': self.breakers.get_stats(),
+            'limiters': self.limiters.get_stats(),
+            'rollups': (
+                self.rollups.get_stats() if self.rollups is not None
+                else None),
+        }
+
+    @app.route('/api/stats', methods=['GET'])
+    def api_get_stats(self, request):
+        return self.api_get(request, self.get_stats)
 
 
 class Index(PageElement):
@@ -1,8 +1,11 @@
 from twisted.web import server
 from twisted.python import usage
 from twisted.application import service, strports
+from twisted.application.internet import TCPClient
 
 from diamondash.server import DiamondashConfig, DiamondashServer
+from diamondash.scheduler import RefreshScheduler
+from diamondash.stats import CarbonClientFactory
 
 DEFAULT_PORT = '8080'
 DEFAULT_CONFIG_DIR = 'etc'
@@ -17,13 +20,52 @@ class Options(usage.Options):
                       "Config dir"]]
 
 
+class DiamondashServerService(service.Service):
+    """Stops the diamondash server when the application shuts down"""
+
+    def __init__(self, diamondash):
+        self.diamondash = diamondash
+
+    def stopService(self):
+        service.Service.stopService(self)
+        return self.diamondash.stop()
+
+
 def makeService(options):
     config = DiamondashConfig.from_dir(options['config_dir'])
     diamondash = DiamondashServer(config)
 
-    site = server.Site(diamondash.app.resource())
+    site = server.Site(diamondash.resource())
     diamondash_service = service.MultiService()
     strports_service = strports.service(options['port'], site)
     strports_service.setServiceParent(diamondash_service)
 
+    server_service = DiamondashServerService(diamondash)
+    server_service.setServiceParent(diamondash_service)
+
+    scheduler = config['scheduler']
+    if scheduler['enabled']:
+        scheduler_service = RefreshScheduler(
+            diamondash,
+            jitter=scheduler['jitter'],
+            concurrency=scheduler['concurrency'])
+        scheduler_service.setServiceParent(diamondash_service)
+
+    carbon = config['stats']['carbon']
+    if carbon is not None:
+        stats_service = mk_stats_emitting_service(diamondash, carbon)
+        stats_service.setServiceParent(diamondash_service)
+
     return diamondash_service
+
+
+def mk_stats_emitting_service(diamondash, carbon_config):
+    """
+    Creates a service that periodically sends diamondash's stats to carbon.
+    """
+    prefix = carbon_config['prefix']
+    factory = CarbonClientFactory(
+        carbon_config['interval'] / 1000.0,
+        lambda: diamondash.stats.get_metrics(prefix))
+
+    return TCPClient(carbon_config['host'], carbon_config['port'], factory)
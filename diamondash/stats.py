@@ -0,0 +1,286 @@
+# -*- test-case-name: diamondash.tests.test_stats -*-
+
+"""Timing of the stages snapshots go through, and sending timings to carbon"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+from timeit import default_timer
+
+from twisted.internet import reactor
+from twisted.internet.protocol import ReconnectingClientFactory
+from twisted.internet.task import LoopingCall
+from twisted.protocols.basic import LineOnlyReceiver
+
+from diamondash import utils
+
+
+def timer():
+    """Returns a function returning the milliseconds since it was created"""
+    start = default_timer()
+    return lambda: (default_timer() - start) * 1000
+
+
+class HistogramSlot(object):
+    def __init__(self, index, size):
+        self.index = index
+        self.counts = [0] * size
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+
+class RollingHistogram(object):
+    """
+    A histogram of the durations recorded in the last ``window``
+    milliseconds. The window is divided into ``slots`` slots that are
+    dropped as they fall outside of the window, so that the memory used
+    doesn't grow with the number of durations recorded.
+    """
+
+    # upper bounds (in milliseconds) of the histogram's buckets, excluding the
+    # last bucket, which has no upper bound
+    BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+    def __init__(self, window=60000, slots=6):
+        self.slot_duration = max(window / slots, 1)
+        self.max_slots = slots
+        self.slots = deque()
+
+    def expire(self, index):
+        while self.slots and self.slots[0].index <= index - self.max_slots:
+            self.slots.popleft()
+
+    def current_slot(self):
+        index = utils.now() // self.slot_duration
+        self.expire(index)
+
+        if not self.slots or self.slots[-1].index != index:
+            self.slots.append(HistogramSlot(index, len(self.BOUNDS) + 1))
+
+        return self.slots[-1]
+
+    def record(self, duration):
+        slot = self.current_slot()
+        slot.counts[bisect_left(self.BOUNDS, duration)] += 1
+        slot.count += 1
+        slot.total += duration
+
+        if slot.min is None or duration < slot.min:
+            slot.min = duration
+
+        if slot.max is None or duration > slot.max:
+            slot.max = duration
+
+    def percentile(self, counts, count, max_duration, p):
+        """
+        Estimates the ``p``th percentile as the upper bound of the bucket it
+        falls in, capped at the longest duration recorded.
+        """
+        rank = p / 100.0 * count
+        seen = 0
+
+        for bound, n in zip(self.BOUNDS, counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, max_duration)
+
+        return max_duration
+
+    def summary(self):
+        self.expire(utils.now() // self.slot_duration)
+        slots = list(self.slots)
+
+        count = sum(s.count for s in slots)
+        if not count:
+            return {'count': 0}
+
+        counts = [sum(c) for c in zip(*(s.counts for s in slots))]
+        total = sum(s.total for s in slots)
+        max_duration = max(s.max for s in slots if s.max is not None)
+
+        return {
+            'count': count,
+            'mean': total / count,
+            'min': min(s.min for s in slots if s.min is not None),
+            'max': max_duration,
+            'p50': self.percentile(counts, count, max_duration, 50),
+            'p90': self.percentile(counts, count, max_duration, 90),
+            'p99': self.percentile(counts, count, max_duration, 99),
+            'buckets': [
+                [bound, n]
+                for bound, n in zip(self.BOUNDS + [None], counts) if n],
+        }
+
+
+class Stats(object):
+    """
+    Collects rolling histograms of stage timings for each of diamondash's
+    dashboards and their widgets.
+    """
+
+    def __init__(self, window=60000, slots=6):
+        self.window = window
+        self.slots = slots
+        self.histograms = {}
+
+    def histogram(self, key):
+        histogram = self.histograms.get(key)
+
+        if histogram is None:
+            histogram = RollingHistogram(self.window, self.slots)
+            self.histograms[key] = histogram
+
+        return histogram
+
+    def record(self, key, duration):
+        self.histogram(key).record(duration)
+
+    def widget_stats(self, dashboard_name, widget_name):
+        return WidgetStats(self, dashboard_name, widget_name)
+
+    def remove_dashboard(self, dashboard_name):
+        for key in self.histograms.keys():
+            if key[0] == dashboard_name:
+                del self.histograms[key]
+
+    def get_stats(self):
+        """
+        Returns the summaries of the recorded timings, keyed by dashboard,
+        then by widget (or `None` for timings of the whole dashboard), then
+        by stage.
+        """
+        stats = {}
+
+        for (dashboard_name, widget_name, stage), histogram in (
+                self.histograms.iteritems()):
+            dashboard_stats = stats.setdefault(dashboard_name, {
+                'stages': {},
+                'widgets': {},
+            })
+
+            if widget_name is None:
+                stage_stats = dashboard_stats['stages']
+            else:
+                stage_stats = dashboard_stats['widgets'].setdefault(
+                    widget_name, {})
+
+            stage_stats[stage] = histogram.summary()
+
+        return stats
+
+    def get_metrics(self, prefix='diamondash'):
+        """
+        Returns the summaries of the recorded timings as a flat dict of
+        graphite metric names and values.
+        """
+        metrics = {}
+
+        for (dashboard_name, widget_name, stage), histogram in (
+                self.histograms.iteritems()):
+            parts = [prefix, 'dashboards', dashboard_name]
+            if widget_name is not None:
+                parts.extend(['widgets', widget_name])
+            parts.append(stage)
+            name = '.'.join(parts)
+
+            summary = histogram.summary()
+            for field in ('count', 'mean', 'max', 'p50', 'p90', 'p99'):
+                if field in summary:
+                    metrics['%s.%s' % (name, field)] = summary[field]
+
+        return metrics
+
+
+class WidgetStats(object):
+    """
+    Records a widget's stage timings, both for the widget and for its
+    dashboard as a whole. If ``widget_name`` is `None`, timings are only
+    recorded for the dashboard.
+    """
+
+    def __init__(self, stats, dashboard_name, widget_name):
+        self.stats = stats
+        self.dashboard_name = dashboard_name
+        self.widget_name = widget_name
+
+    def record(self, stage, duration):
+        if self.widget_name is not None:
+            self.stats.record(
+                (self.dashboard_name, self.widget_name, stage), duration)
+
+        self.stats.record((self.dashboard_name, None, stage), duration)
+
+    def timed(self, stage, fn, *args, **kwargs):
+        """
+        Calls ``fn`` with the given args, recording how long it took under
+        ``stage``.
+        """
+        elapsed = timer()
+        result = fn(*args, **kwargs)
+        self.record(stage, elapsed())
+        return result
+
+
+class NullWidgetStats(object):
+    """Stands in for the stats of widgets that aren't on a dashboard"""
+
+    def record(self, stage, duration):
+        pass
+
+    def timed(self, stage, fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+
+null_stats = NullWidgetStats()
+
+
+class CarbonClient(LineOnlyReceiver):
+    """
+    Sends the metrics returned by ``get_metrics`` to carbon over its
+    plaintext line protocol every ``interval`` seconds while connected.
+    """
+
+    def __init__(self, interval, get_metrics, clock=reactor):
+        self.interval = interval
+        self.get_metrics = get_metrics
+        self.loop = LoopingCall(self.send_metrics)
+        self.loop.clock = clock
+
+    def connectionMade(self):
+        self.loop.start(self.interval)
+
+    def connectionLost(self, reason):
+        if self.loop.running:
+            self.loop.stop()
+
+    def lineReceived(self, line):
+        pass
+
+    def send_metrics(self):
+        now = int(time.time())
+        lines = [
+            "%s %s %d" % (name, value, now)
+            for name, value in sorted(self.get_metrics().iteritems())]
+
+        if lines:
+            self.transport.write(
+                self.delimiter.join(lines) + self.delimiter)
+
+
+class CarbonClientFactory(ReconnectingClientFactory):
+    """Reconnects to carbon whenever the connection to it is lost"""
+
+    protocol = CarbonClient
+    clock = reactor
+
+    def __init__(self, interval, get_metrics):
+        self.interval = interval
+        self.get_metrics = get_metrics
+
+    def buildProtocol(self, addr):
+        self.resetDelay()
+        client = self.protocol(self.interval, self.get_metrics, self.clock)
+        client.factory = self
+        return client
@@ -0,0 +1,115 @@
+import time
+
+from twisted.trial import unittest
+from twisted.internet.defer import Deferred, CancelledError, succeed, fail
+
+from diamondash.breaker import (
+    CircuitBreaker, CircuitBreakers, CircuitOpenError)
+
+
+class MockError(Exception):
+    """I am fake"""
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(
+            failure_threshold=2, reset_timeout=30000, probes=1)
+        self.calls = []
+        self.stub_time(10)
+
+    def stub_time(self, t):
+        self.patch(time, 'time', lambda: t)
+
+    def succeed(self, result='foo'):
+        self.calls.append(result)
+        return succeed(result)
+
+    def fail(self):
+        self.calls.append(None)
+        return fail(MockError())
+
+    def open_breaker(self):
+        for i in range(2):
+            self.failureResultOf(self.breaker.call(self.fail), MockError)
+        self.calls = []
+
+    def test_call(self):
+        d = self.breaker.call(self.succeed, 'bar')
+        self.assertEqual(self.successResultOf(d), 'bar')
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.CLOSED)
+
+    def test_call_for_failures_below_threshold(self):
+        self.failureResultOf(self.breaker.call(self.fail), MockError)
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.CLOSED)
+
+        # a success should reset the failure count
+        self.breaker.call(self.succeed)
+        self.failureResultOf(self.breaker.call(self.fail), MockError)
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.CLOSED)
+
+    def test_call_for_open_breakers(self):
+        self.open_breaker()
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.OPEN)
+
+        d = self.breaker.call(self.succeed)
+        self.failureResultOf(d, CircuitOpenError)
+        self.assertEqual(self.calls, [])
+
+    def test_call_for_half_open_breakers(self):
+        self.open_breaker()
+        self.stub_time(40)
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.HALF_OPEN)
+
+        probe = Deferred()
+        self.breaker.call(lambda: probe)
+
+        # only one probe is allowed at a time
+        self.failureResultOf(self.breaker.call(self.succeed), CircuitOpenError)
+
+        probe.callback('foo')
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.CLOSED)
+        self.successResultOf(self.breaker.call(self.succeed))
+
+    def test_call_for_failed_probes(self):
+        self.open_breaker()
+        self.stub_time(40)
+
+        self.failureResultOf(self.breaker.call(self.fail), MockError)
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.OPEN)
+
+        self.stub_time(70)
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.HALF_OPEN)
+
+    def test_call_for_cancelled_calls(self):
+        for i in range(2):
+            d = self.breaker.call(Deferred)
+            d.cancel()
+            self.failureResultOf(d, CancelledError)
+
+        self.assertEqual(self.breaker.get_state(), CircuitBreaker.CLOSED)
+
+    def test_get_stats(self):
+        self.failureResultOf(self.breaker.call(self.fail), MockError)
+        self.assertEqual(self.breaker.get_stats(), {
+            'state': 'closed',
+            'failures': 1,
+        })
+
+
+class CircuitBreakersTestCase(unittest.TestCase):
+    def test_get(self):
+        breakers = CircuitBreakers(failure_threshold=3)
+        breaker = breakers.get('http://a.moc')
+
+        self.assertEqual(breaker.failure_threshold, 3)
+        self.assertTrue(breakers.get('http://a.moc') is breaker)
+        self.assertFalse(breakers.get('http://b.moc') is breaker)
+
+    def test_get_stats(self):
+        breakers = CircuitBreakers()
+        breakers.get('http://a.moc')
+
+        self.assertEqual(breakers.get_stats(), {
+            'http://a.moc': {'state': 'closed', 'failures': 0},
+        })
@@ -0,0 +1,203 @@
+import time
+
+from twisted.trial import unittest
+from twisted.internet.defer import Deferred, CancelledError, succeed, fail
+
+from diamondash.cache import SnapshotCache, PageCache
+
+
+class MockError(Exception):
+    """I am fake"""
+
+
+class SnapshotCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache = SnapshotCache()
+        self.calls = []
+        self.stub_time(10)
+
+    def stub_time(self, t):
+        self.patch(time, 'time', lambda: t)
+
+    def getter(self, result):
+        self.calls.append(result)
+        return succeed(result)
+
+    def assert_stats(self, hits, misses, coalesced, stale_hits=0):
+        self.assertEqual(self.cache.get_stats(), {
+            'hits': hits,
+            'misses': misses,
+            'coalesced': coalesced,
+            'stale_hits': stale_hits,
+        })
+
+    def test_get(self):
+        d = self.cache.get('a', 5000, self.getter, 'foo')
+        d.addCallback(self.assertEqual, 'foo')
+        self.assertEqual(self.calls, ['foo'])
+        self.assert_stats(hits=0, misses=1, coalesced=0)
+        return d
+
+    def test_get_for_cached_results(self):
+        self.cache.get('a', 5000, self.getter, 'foo')
+        self.stub_time(14)
+
+        d = self.cache.get('a', 5000, self.getter, 'bar')
+        d.addCallback(self.assertEqual, 'foo')
+        self.assertEqual(self.calls, ['foo'])
+        self.assert_stats(hits=1, misses=1, coalesced=0)
+        return d
+
+    def test_get_for_expired_results(self):
+        self.cache.get('a', 5000, self.getter, 'foo')
+        self.stub_time(15)
+
+        d = self.cache.get('a', 5000, self.getter, 'bar')
+        d.addCallback(self.assertEqual, 'bar')
+        self.assertEqual(self.calls, ['foo', 'bar'])
+        self.assert_stats(hits=0, misses=2, coalesced=0)
+        return d
+
+    def test_get_for_different_keys(self):
+        self.cache.get('a', 5000, self.getter, 'foo')
+        d = self.cache.get('b', 5000, self.getter, 'bar')
+        d.addCallback(self.assertEqual, 'bar')
+        self.assertEqual(self.calls, ['foo', 'bar'])
+        return d
+
+    def test_get_for_pending_results(self):
+        retrieval = Deferred()
+        d1 = self.cache.get('a', 5000, lambda: retrieval)
+        d2 = self.cache.get('a', 5000, self.getter, 'bar')
+
+        self.assertEqual(self.calls, [])
+        self.assert_stats(hits=0, misses=1, coalesced=1)
+
+        retrieval.callback('foo')
+        d1.addCallback(self.assertEqual, 'foo')
+        d2.addCallback(self.assertEqual, 'foo')
+        return d1.addCallback(lambda _: d2)
+
+    def test_get_for_failed_retrievals(self):
+        retrieval = Deferred()
+        d1 = self.cache.get('a', 5000, lambda: retrieval)
+        d2 = self.cache.get('a', 5000, self.getter, 'bar')
+        retrieval.errback(MockError())
+
+        self.assertFailure(d1, MockError)
+        self.assertFailure(d2, MockError)
+
+        # failures should not be cached
+        d3 = self.cache.get('a', 5000, self.getter, 'bar')
+        d3.addCallback(self.assertEqual, 'bar')
+        self.assertEqual(self.calls, ['bar'])
+        return d1.addCallback(lambda _: d2)
+
+    def test_get_for_stale_results(self):
+        self.cache.get('a', 5000, self.getter, 'foo')
+
+        self.stub_time(15)
+        d = self.cache.get('a', 5000, lambda: fail(MockError()))
+        self.assertEqual(self.successResultOf(d), 'foo')
+        self.assertTrue(self.cache.is_stale('a'))
+        self.assert_stats(hits=0, misses=2, coalesced=0, stale_hits=1)
+
+        # the next successful retrieval should no longer be stale
+        d = self.cache.get('a', 5000, self.getter, 'bar')
+        self.assertEqual(self.successResultOf(d), 'bar')
+        self.assertFalse(self.cache.is_stale('a'))
+
+    def test_get_cancellation(self):
+        retrieval = Deferred()
+        d1 = self.cache.get('a', 5000, lambda: retrieval)
+        d2 = self.cache.get('a', 5000, lambda: retrieval)
+
+        # the retrieval is still needed by d2
+        d1.cancel()
+        self.failureResultOf(d1, CancelledError)
+        self.assertNoResult(retrieval)
+
+        d2.cancel()
+        self.failureResultOf(d2, CancelledError)
+        self.assertTrue(retrieval.called)
+
+        # cancelled retrievals should not be shared with later requests
+        d3 = self.cache.get('a', 5000, self.getter, 'bar')
+        self.assertEqual(self.successResultOf(d3), 'bar')
+
+    def test_remove(self):
+        self.cache.get('a', 5000, self.getter, 'foo')
+        self.cache.remove('a')
+
+        d = self.cache.get('a', 5000, self.getter, 'bar')
+        d.addCallback(self.assertEqual, 'bar')
+        return d
+
+
+class PageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache = PageCache()
+        self.calls = []
+
+    def render(self, page):
+        self.calls.append(page)
+        return succeed(page)
+
+    def test_get(self):
+        d = self.cache.get('a', self.render, 'foo')
+        d.addCallback(self.assertEqual, 'foo')
+        self.assertEqual(self.calls, ['foo'])
+        return d
+
+    def test_get_for_cached_pages(self):
+        self.cache.get('a', self.render, 'foo')
+
+        d = self.cache.get('a', self.render, 'bar')
+        d.addCallback(self.assertEqual, 'foo')
+        self.assertEqual(self.calls, ['foo'])
+        return d
+
+    def test_get_for_pending_pages(self):
+        rendering = Deferred()
+        d1 = self.cache.get('a', lambda: rendering)
+        d2 = self.cache.get('a', self.render, 'bar')
+        self.assertEqual(self.calls, [])
+
+        rendering.callback('foo')
+        d1.addCallback(self.assertEqual, 'foo')
+        d2.addCallback(self.assertEqual, 'foo')
+        return d2
+
+    def test_get_for_render_failures(self):
+        d = self.cache.get('a', lambda: self.raise_error())
+        self.assertFailure(d, MockError)
+
+        d.addCallback(lambda _: self.cache.get('a', self.render, 'foo'))
+        d.addCallback(self.assertEqual, 'foo')
+        return d
+
+    def raise_error(self):
+        raise MockError()
+
+    def test_invalidate(self):
+        self.cache.get('a', self.render, 'foo')
+        self.cache.get('b', self.render, 'bar')
+        self.cache.invalidate('a')
+
+        self.cache.get('a', self.render, 'baz')
+        self.cache.get('b', self.render, 'qux')
+        self.assertEqual(self.calls, ['foo', 'bar', 'baz'])
+
+    def test_invalidate_for_pending_pages(self):
+        rendering = Deferred()
+        d = self.cache.get('a', lambda: rendering)
+        self.cache.invalidate('a')
+
+        # the outdated page is still given to requests waiting on it, but
+        # isn't cached
+        rendering.callback('foo')
+        d.addCallback(self.assertEqual, 'foo')
+
+        self.cache.get('a', self.render, 'bar')
+        self.assertEqual(self.calls, ['bar'])
+        return d
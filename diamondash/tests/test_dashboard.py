@@ -4,9 +4,13 @@ import json
 
 from twisted.trial import unittest
 from twisted.web.template import flattenString
+from twisted.internet.defer import fail
 
 from diamondash import utils
 from diamondash.config import ConfigError
+from diamondash.breaker import CircuitBreakers
+from diamondash.limiter import RequestLimiters
+from diamondash.backends.rollups import RollupStore
 from diamondash.widgets.widget import WidgetConfig
 from diamondash.widgets.dynamic import DynamicWidgetConfig
 from diamondash.dashboard import (
@@ -287,6 +291,108 @@ class DashboardTestCase(unittest.TestCase):
             dashboard.widgets[-1].config,
             widget_config)
 
+    def test_widget_adding_for_circuit_breakers(self):
+        breakers = CircuitBreakers()
+        dashboard = Dashboard(
+            DashboardConfig(mk_config_data()), breakers=breakers)
+
+        widget = dashboard.get_widget('widget2')
+        self.assertTrue(
+            widget.backend.breaker is breakers.get('http://127.0.0.1:3000'))
+
+    def test_widget_adding_for_request_limiters(self):
+        limiters = RequestLimiters()
+        dashboard = Dashboard(
+            DashboardConfig(mk_config_data()), limiters=limiters)
+
+        widget = dashboard.get_widget('widget2')
+        self.assertTrue(
+            widget.backend.limiter is limiters.get('http://127.0.0.1:3000'))
+        self.assertEqual(widget.backend.priority, 1)
+
+    def test_widget_adding_for_rollups(self):
+        rollups = RollupStore()
+        dashboard = Dashboard(
+            DashboardConfig(mk_config_data()), rollups=rollups)
+
+        widget = dashboard.get_widget('widget2')
+        self.assertTrue(widget.backend.rollups is rollups)
+
+    def test_widget_snapshot_retrieval(self):
+        dashboard = mk_dashboard()
+        widget = dashboard.get_widget('widget2')
+
+        calls = []
+        self.patch(widget, 'get_snapshot', lambda: calls.append(1) or [1])
+
+        d = dashboard.get_widget_snapshot(widget)
+        d.addCallback(self.assertEqual, [1])
+        d.addCallback(lambda _: dashboard.get_widget_snapshot(widget))
+        d.addCallback(self.assertEqual, [1])
+        d.addCallback(lambda _: self.assertEqual(calls, [1]))
+        d.addCallback(lambda _: self.assertEqual(
+            dashboard.snapshots.get_stats(),
+            {'hits': 1, 'misses': 1, 'coalesced': 0, 'stale_hits': 0}))
+        return d
+
+    def test_snapshot_retrieval(self):
+        dashboard = mk_dashboard(widgets=[{
+            'name': 'widget1',
+            'type': 'diamondash.widgets.widget.Widget',
+        }, {
+            'name': 'widget2',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }, {
+            'name': 'widget3',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }])
+
+        d = dashboard.get_snapshot()
+        d.addCallback(self.assertEqual, {
+            'widget2': ['widget2'],
+            'widget3': ['widget3'],
+        })
+        return d
+
+    def test_snapshot_retrieval_since(self):
+        dashboard = mk_dashboard(widgets=[{
+            'name': 'widget2',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }, {
+            'name': 'widget3',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }])
+
+        widget = dashboard.get_widget('widget2')
+        self.patch(widget, 'get_snapshot_delta', lambda snapshot, since: {
+            'since': since,
+            'snapshot': snapshot,
+        })
+
+        # only the widgets with a version given are delta-encoded
+        d = dashboard.get_snapshot({'widget2': 3})
+        d.addCallback(self.assertEqual, {
+            'widget2': {'since': 3, 'snapshot': ['widget2']},
+            'widget3': ['widget3'],
+        })
+        return d
+
+    def test_snapshot_retrieval_for_failed_widgets(self):
+        dashboard = mk_dashboard(widgets=[{
+            'name': 'widget2',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }, {
+            'name': 'widget3',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }])
+
+        widget = dashboard.get_widget('widget3')
+        self.patch(widget, 'get_snapshot', lambda: fail(Exception(':(')))
+
+        d = dashboard.get_snapshot()
+        d.addCallback(self.assertEqual, {'widget2': ['widget2']})
+        return d
+
     def test_title_rendering(self):
         dashboard = mk_dashboard()
         d = flattenString(None, dashboard)
@@ -0,0 +1,90 @@
+import os
+
+from twisted.trial import unittest
+from twisted.web.static import File
+from twisted.web.test.requesthelper import DummyRequest
+
+from diamondash.encoding import (
+    GzipEncoder, GzipEncoderFactory, accepts_gzip, precompressed)
+
+
+def mk_request(accept_encoding=None):
+    request = DummyRequest([''])
+    if accept_encoding is not None:
+        request.headers['accept-encoding'] = accept_encoding
+    return request
+
+
+class EncodingTestCase(unittest.TestCase):
+    def mk_file(self, dirname, name, content, mtime):
+        filename = os.path.join(dirname, name)
+        with open(filename, 'w') as f:
+            f.write(content)
+        os.utime(filename, (mtime, mtime))
+        return filename
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip(mk_request('gzip')))
+        self.assertTrue(accepts_gzip(mk_request('deflate, gzip')))
+        self.assertTrue(accepts_gzip(mk_request('gzip;q=0.5, deflate')))
+        self.assertTrue(accepts_gzip(mk_request('x-gzip')))
+
+    def test_accepts_gzip_for_unaccepted_gzip(self):
+        self.assertFalse(accepts_gzip(mk_request()))
+        self.assertFalse(accepts_gzip(mk_request('deflate')))
+        self.assertFalse(accepts_gzip(mk_request('gzip;q=0, deflate')))
+        self.assertFalse(accepts_gzip(mk_request('gzip;q=foo')))
+
+    def test_precompressed(self):
+        dirname = self.mktemp()
+        os.mkdir(dirname)
+        self.mk_file(dirname, 'foo.js', 'foo', 1000)
+        self.mk_file(dirname, 'foo.js.gz', 'gzipped foo', 1000)
+
+        resource = File(dirname).getChild('foo.js', mk_request())
+        variant = precompressed(resource)
+        self.assertEqual(variant.path, os.path.join(
+            os.path.abspath(dirname), 'foo.js.gz'))
+
+    def test_precompressed_for_stale_variants(self):
+        dirname = self.mktemp()
+        os.mkdir(dirname)
+        self.mk_file(dirname, 'foo.js', 'foo', 2000)
+        self.mk_file(dirname, 'foo.js.gz', 'gzipped foo', 1000)
+
+        resource = File(dirname).getChild('foo.js', mk_request())
+        self.assertEqual(precompressed(resource), None)
+
+    def test_precompressed_for_no_variants(self):
+        dirname = self.mktemp()
+        os.mkdir(dirname)
+        self.mk_file(dirname, 'foo.js', 'foo', 1000)
+
+        resource = File(dirname).getChild('foo.js', mk_request())
+        self.assertEqual(precompressed(resource), None)
+
+        resource = File(dirname).getChild('bar.js', mk_request())
+        self.assertEqual(precompressed(resource), None)
+
+    def test_is_compressible(self):
+        self.assertTrue(GzipEncoder.is_compressible('text/html'))
+        self.assertTrue(GzipEncoder.is_compressible(
+            'application/json; charset=utf-8'))
+        self.assertTrue(GzipEncoder.is_compressible('application/javascript'))
+        self.assertFalse(GzipEncoder.is_compressible('text/event-stream'))
+        self.assertFalse(GzipEncoder.is_compressible('image/png'))
+        self.assertFalse(GzipEncoder.is_compressible(''))
+
+    def test_encoder_factory(self):
+        factory = GzipEncoderFactory()
+
+        request = mk_request('gzip')
+        self.assertTrue(isinstance(
+            factory.encoderForRequest(request), GzipEncoder))
+        self.assertEqual(
+            request.outgoingHeaders['vary'], 'Accept-Encoding')
+
+        request = mk_request()
+        self.assertEqual(factory.encoderForRequest(request), None)
+        self.assertEqual(
+            request.outgoingHeaders['vary'], 'Accept-Encoding')
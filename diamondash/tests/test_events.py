@@ -0,0 +1,205 @@
+import json
+import time
+
+from twisted.trial import unittest
+from twisted.internet.task import Clock
+from twisted.internet.defer import Deferred, succeed, fail
+from twisted.web.test.requesthelper import DummyRequest
+
+from diamondash.dashboard import Dashboard, DashboardConfig
+from diamondash.events import DashboardEventSource, format_event
+
+
+def mk_dashboard():
+    return Dashboard(DashboardConfig({
+        'name': 'Some Dashboard',
+        'poll_interval': '10s',
+        'backend': {
+            'type': 'diamondash.tests.utils.ToyBackend',
+            'url': 'http://127.0.0.1:3000',
+        },
+        'widgets': [{
+            'name': 'Widget 1',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }],
+    }))
+
+
+def parse_events(written):
+    """Returns the data of the snapshot events in the written chunks"""
+    events = []
+    for chunk in written:
+        if chunk.startswith('event: snapshot'):
+            events.append(json.loads(chunk.split('data: ', 1)[1]))
+    return events
+
+
+class FormatEventTestCase(unittest.TestCase):
+    def test_format_event(self):
+        self.assertEqual(format_event('foo'), 'data: foo\n\n')
+        self.assertEqual(
+            format_event('foo\nbar', 'baz'),
+            'event: baz\ndata: foo\ndata: bar\n\n')
+
+
+class DashboardEventSourceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.time = 0
+        self.patch(time, 'time', lambda: self.time)
+
+        self.clock = Clock()
+        self.patch(DashboardEventSource, 'clock', self.clock)
+
+        self.dashboard = mk_dashboard()
+        self.events = self.dashboard.events
+        self.snapshots = {'widget-1': 'foo'}
+        self.snapshot_requests = 0
+        self.patch(self.dashboard, 'get_snapshot', self.get_snapshot)
+
+    def tearDown(self):
+        self.events.close()
+
+    def get_snapshot(self):
+        self.snapshot_requests += 1
+        return succeed(dict(self.snapshots))
+
+    def advance(self, seconds):
+        self.time += seconds
+        self.clock.advance(seconds)
+
+    def test_subscribe(self):
+        request = DummyRequest([''])
+        self.events.subscribe(request)
+
+        self.assertEqual(
+            request.outgoingHeaders['content-type'], 'text/event-stream')
+        self.assertEqual(request.written[0], 'retry: 10000\n\n')
+        self.assertEqual(parse_events(request.written), [{'widget-1': 'foo'}])
+
+    def test_push_for_changed_snapshots(self):
+        request = DummyRequest([''])
+        self.events.subscribe(request)
+
+        self.snapshots = {'widget-1': 'bar', 'widget-2': 'baz'}
+        self.advance(10)
+
+        self.snapshots = {'widget-1': 'bar', 'widget-2': 'qux'}
+        self.advance(10)
+
+        self.assertEqual(parse_events(request.written), [
+            {'widget-1': 'foo'},
+            {'widget-1': 'bar', 'widget-2': 'baz'},
+            {'widget-2': 'qux'},
+        ])
+
+    def test_push_for_unchanged_snapshots(self):
+        request = DummyRequest([''])
+        self.events.subscribe(request)
+        self.advance(10)
+        self.assertEqual(parse_events(request.written), [{'widget-1': 'foo'}])
+
+    def test_push_fan_out(self):
+        request1 = DummyRequest([''])
+        request2 = DummyRequest([''])
+        self.events.subscribe(request1)
+        self.events.subscribe(request2)
+
+        self.snapshots = {'widget-1': 'bar'}
+        self.advance(10)
+
+        # a single snapshot is computed for each interval, regardless of the
+        # number of subscribers
+        self.assertEqual(self.snapshot_requests, 2)
+
+        self.assertEqual(
+            parse_events(request1.written),
+            [{'widget-1': 'foo'}, {'widget-1': 'bar'}])
+
+        # subscribers joining later get the latest snapshots straight away
+        self.assertEqual(
+            parse_events(request2.written),
+            [{'widget-1': 'foo'}, {'widget-1': 'bar'}])
+
+    def test_push_deltas(self):
+        widget = self.dashboard.get_widget('widget-1')
+        self.patch(widget, 'get_snapshot_version', lambda snapshot: snapshot)
+        self.patch(widget, 'get_snapshot_delta', lambda snapshot, since: {
+            'since': since,
+            'snapshot': snapshot,
+        })
+
+        request = DummyRequest([''])
+        self.events.subscribe(request)
+
+        self.snapshots = {'widget-1': 'bar'}
+        self.advance(10)
+
+        # subscribers joining later get the whole latest snapshot
+        request2 = DummyRequest([''])
+        self.events.subscribe(request2)
+
+        self.assertEqual(parse_events(request.written), [
+            {'widget-1': 'foo'},
+            {'widget-1': {'since': 'foo', 'snapshot': 'bar'}},
+        ])
+
+        self.assertEqual(parse_events(request2.written), [
+            {'widget-1': 'bar'},
+        ])
+
+    def test_keepalive(self):
+        request = DummyRequest([''])
+        self.events.subscribe(request)
+
+        self.advance(10)
+        self.assertFalse(': keepalive\n\n' in request.written)
+
+        self.advance(10)
+        self.assertTrue(': keepalive\n\n' in request.written)
+
+    def test_keepalive_for_slow_snapshots(self):
+        self.patch(self.dashboard, 'get_snapshot', Deferred)
+        request = DummyRequest([''])
+        self.events.subscribe(request)
+
+        self.advance(5)
+        self.advance(5)
+        self.advance(5)
+        self.assertTrue(': keepalive\n\n' in request.written)
+
+    def test_keepalive_for_failed_snapshots(self):
+        self.patch(
+            self.dashboard, 'get_snapshot', lambda: fail(Exception(':(')))
+        request = DummyRequest([''])
+        self.events.subscribe(request)
+
+        self.advance(5)
+        self.advance(5)
+        self.advance(5)
+        self.assertTrue(': keepalive\n\n' in request.written)
+
+    def test_keepalive_stopping(self):
+        d = self.events.subscribe(DummyRequest(['']))
+        d.cancel()
+        self.assertEqual(self.events.keepalive_loop, None)
+
+    def test_unsubscribe(self):
+        d = self.events.subscribe(DummyRequest(['']))
+        self.assertTrue(self.events.loop.running)
+
+        d.cancel()
+        self.assertEqual(self.events.streams, [])
+        self.assertEqual(self.events.loop, None)
+
+        self.advance(10)
+        self.assertEqual(self.snapshot_requests, 1)
+
+    def test_close(self):
+        d1 = self.events.subscribe(DummyRequest(['']))
+        d2 = self.events.subscribe(DummyRequest(['']))
+        self.events.close()
+
+        self.assertTrue(d1.called)
+        self.assertTrue(d2.called)
+        self.assertEqual(self.events.streams, [])
+        self.assertEqual(self.events.loop, None)
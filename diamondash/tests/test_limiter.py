@@ -0,0 +1,137 @@
+from twisted.trial import unittest
+from twisted.internet.defer import Deferred, CancelledError, fail
+
+from diamondash import stats
+from diamondash.limiter import RequestLimiter, RequestLimiters, QueueFullError
+
+
+class MockError(Exception):
+    """I am fake"""
+
+
+class RequestLimiterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RequestLimiter(concurrency=2, max_queued=2)
+        self.calls = []
+        self.stub_timer(10)
+
+    def stub_timer(self, t):
+        self.patch(stats, 'default_timer', lambda: t)
+
+    def call(self, name):
+        self.calls.append(name)
+        return Deferred()
+
+    def fill(self):
+        running = [Deferred(), Deferred()]
+        for d in running:
+            self.limiter.run(0, lambda d=d: d)
+        return running
+
+    def test_run(self):
+        d = self.limiter.run(0, lambda x: x * 2, 21)
+        self.assertEqual(self.successResultOf(d), 42)
+        self.assertEqual(self.limiter.tokens, 2)
+
+    def test_run_for_failures(self):
+        d = self.limiter.run(0, lambda: fail(MockError()))
+        self.failureResultOf(d, MockError)
+        self.assertEqual(self.limiter.tokens, 2)
+
+    def test_run_for_full_concurrency(self):
+        running = self.fill()
+        d = self.limiter.run(0, self.call, 'a')
+        self.assertEqual(self.calls, [])
+
+        running[0].callback(None)
+        self.assertEqual(self.calls, ['a'])
+        self.assertNoResult(d)
+
+    def test_run_for_priorities(self):
+        running = self.fill()
+        self.limiter.run(1, self.call, 'chart')
+        self.limiter.run(0, self.call, 'lvalue')
+
+        # requests with lower priorities are made first
+        running[0].callback(None)
+        self.assertEqual(self.calls, ['lvalue'])
+
+        running[1].callback(None)
+        self.assertEqual(self.calls, ['lvalue', 'chart'])
+
+    def test_run_for_equal_priorities(self):
+        running = self.fill()
+        self.limiter.run(0, self.call, 'a')
+        self.limiter.run(0, self.call, 'b')
+
+        running[0].callback(None)
+        running[1].callback(None)
+        self.assertEqual(self.calls, ['a', 'b'])
+
+    def test_run_for_full_queues(self):
+        self.fill()
+        self.limiter.run(0, self.call, 'a')
+        self.limiter.run(0, self.call, 'b')
+
+        d = self.limiter.run(0, self.call, 'c')
+        self.failureResultOf(d, QueueFullError)
+        self.assertEqual(self.limiter.rejected, 1)
+
+    def test_run_for_cancelled_queued_requests(self):
+        running = self.fill()
+        d = self.limiter.run(0, self.call, 'a')
+        self.limiter.run(0, self.call, 'b')
+
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+        self.assertEqual(len(self.limiter.queue), 1)
+
+        running[0].callback(None)
+        self.assertEqual(self.calls, ['b'])
+
+    def test_run_for_cancelled_running_requests(self):
+        d = self.limiter.run(0, Deferred)
+        d.cancel()
+
+        self.failureResultOf(d, CancelledError)
+        self.assertEqual(self.limiter.tokens, 2)
+
+    def test_get_stats(self):
+        running = self.fill()
+        self.limiter.run(0, self.call, 'a')
+        self.limiter.run(0, self.call, 'b')
+        self.failureResultOf(
+            self.limiter.run(0, self.call, 'c'), QueueFullError)
+
+        self.stub_timer(10.5)
+        running[0].callback(None)
+
+        stats = self.limiter.get_stats()
+        self.assertEqual(stats['active'], 2)
+        self.assertEqual(stats['queued'], 1)
+        self.assertEqual(stats['rejected'], 1)
+        self.assertEqual(stats['wait']['count'], 3)
+        self.assertEqual(stats['wait']['max'], 500)
+
+
+class RequestLimitersTestCase(unittest.TestCase):
+    def test_get(self):
+        limiters = RequestLimiters(concurrency=3)
+        limiter = limiters.get('http://a.moc')
+
+        self.assertEqual(limiter.concurrency, 3)
+        self.assertTrue(limiters.get('http://a.moc') is limiter)
+        self.assertFalse(limiters.get('http://b.moc') is limiter)
+
+    def test_get_stats(self):
+        limiters = RequestLimiters()
+        limiters.get('http://a.moc')
+
+        self.assertEqual(limiters.get_stats(), {
+            'http://a.moc': {
+                'active': 0,
+                'queued': 0,
+                'rejected': 0,
+                'wait': {'count': 0},
+            },
+        })
@@ -0,0 +1,131 @@
+import time
+
+from twisted.trial import unittest
+from twisted.internet.task import Clock
+from twisted.internet.defer import Deferred
+
+from diamondash import utils
+from diamondash.dashboard import Dashboard, DashboardConfig
+from diamondash.scheduler import RefreshScheduler
+
+
+def mk_dashboard(**overrides):
+    return Dashboard(DashboardConfig(utils.add_dicts({
+        'name': 'Some Dashboard',
+        'poll_interval': '10s',
+        'widgets': [{
+            'name': 'widget1',
+            'type': 'diamondash.tests.utils.ToyDynamicWidget',
+        }, {
+            'name': 'widget2',
+            'type': 'diamondash.widgets.widget.Widget',
+        }],
+        'backend': {
+            'type': 'diamondash.tests.utils.ToyBackend',
+            'url': 'http://127.0.0.1:3000',
+        }
+    }, overrides)))
+
+
+class ToyDiamondash(object):
+    def __init__(self, *dashboards):
+        self.dashboards_by_name = dict(
+            (d.config['name'], d) for d in dashboards)
+
+
+class RefreshSchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.patch(RefreshScheduler, 'clock', self.clock)
+        self.patch(time, 'time', self.clock.seconds)
+
+        self.dashboard = mk_dashboard()
+        self.widget = self.dashboard.get_widget('widget1')
+        self.calls = []
+        self.patch(self.widget, 'get_snapshot', self.get_snapshot)
+
+        self.diamondash = ToyDiamondash(self.dashboard)
+
+    def get_snapshot(self):
+        self.calls.append(self.clock.seconds())
+        return [len(self.calls)]
+
+    def mk_scheduler(self, **kwargs):
+        scheduler = RefreshScheduler(self.diamondash, **kwargs)
+        scheduler.startService()
+        self.addCleanup(scheduler.stopService)
+        return scheduler
+
+    def test_refreshing(self):
+        self.mk_scheduler(jitter=0)
+        self.assertTrue(self.dashboard.scheduled)
+        self.assertEqual(self.calls, [0])
+
+        self.clock.advance(9)
+        self.assertEqual(self.calls, [0])
+
+        self.clock.advance(1)
+        self.assertEqual(self.calls, [0, 10])
+
+    def test_refreshing_for_jitter(self):
+        self.mk_scheduler(jitter=0.5)
+        self.clock.pump([1] * 30)
+
+        # the first refresh should be within half a ttl of starting, and the
+        # following ones between half a ttl and one and a half ttls apart
+        self.assertTrue(self.calls[0] <= 5)
+        for prev, t in zip(self.calls, self.calls[1:]):
+            self.assertTrue(5 <= t - prev <= 15)
+
+    def test_refreshing_for_concurrency(self):
+        dashboard = mk_dashboard(name='Other Dashboard')
+        self.diamondash.dashboards_by_name['other-dashboard'] = dashboard
+
+        retrievals = []
+        for d in (self.dashboard, dashboard):
+            self.patch(
+                d.get_widget('widget1'), 'get_snapshot',
+                lambda: retrievals.append(Deferred()) or retrievals[-1])
+
+        self.mk_scheduler(jitter=0, concurrency=1)
+        self.assertEqual(len(retrievals), 1)
+
+        retrievals[0].callback([1])
+        self.assertEqual(len(retrievals), 2)
+
+    def test_refreshing_for_slow_refreshes(self):
+        retrievals = []
+        self.patch(
+            self.widget, 'get_snapshot',
+            lambda: retrievals.append(Deferred()) or retrievals[-1])
+
+        self.mk_scheduler(jitter=0)
+        self.clock.advance(20)
+
+        # a refresh shouldn't start while the last one is still going
+        self.assertEqual(len(retrievals), 1)
+
+    def test_refreshing_for_removed_widgets(self):
+        scheduler = self.mk_scheduler(jitter=0)
+        self.assertEqual(scheduler.due.keys(), [('some-dashboard', 'widget1')])
+
+        del self.diamondash.dashboards_by_name['some-dashboard']
+        self.clock.advance(1)
+        self.assertEqual(scheduler.due, {})
+
+    def test_snapshot_retrieval(self):
+        self.mk_scheduler(jitter=0)
+        self.clock.advance(10)
+
+        # requests should be given the latest refreshed snapshot
+        d = self.dashboard.get_widget_snapshot(self.widget)
+        self.assertEqual(self.successResultOf(d), [2])
+        self.assertEqual(self.calls, [0, 10])
+
+    def test_stop_service(self):
+        scheduler = self.mk_scheduler(jitter=0)
+        scheduler.stopService()
+
+        self.assertFalse(self.dashboard.scheduled)
+        self.clock.advance(10)
+        self.assertEqual(self.calls, [0])
@@ -1,16 +1,23 @@
 """Tests for diamondash's server"""
 
 import os
+import time
+import zlib
 import json
+import hashlib
 
 from twisted import web
 from twisted.web import http
 from twisted.trial import unittest
 from twisted.web.server import Site
+from twisted.web.static import File
 from twisted.internet import reactor
-from twisted.internet.defer import inlineCallbacks, gatherResults
+from twisted.internet.error import TimeoutError
+from twisted.internet.defer import (
+    Deferred, inlineCallbacks, gatherResults, fail)
 from twisted.python.failure import Failure
 from twisted.web.template import flattenString
+from twisted.web.test.requesthelper import DummyRequest
 
 from diamondash import utils
 from diamondash.config import ConfigError
@@ -90,6 +97,84 @@ class DiamondashConfigTestCase(unittest.TestCase):
             widget1_config['backend']['url'],
             'http://127.0.0.1:7118')
 
+    def test_http_client_parsing(self):
+        config = DiamondashConfig(mk_server_config_data(http_client={
+            'idle_timeout': '10s',
+        }))
+
+        self.assertEqual(config['http_client'], {
+            'max_persistent_per_host': 10,
+            'idle_timeout': 10000,
+            'connect_timeout': 30000,
+        })
+
+    def test_circuit_breaker_parsing(self):
+        config = DiamondashConfig(mk_server_config_data(circuit_breaker={
+            'reset_timeout': '1m',
+        }))
+
+        self.assertEqual(config['circuit_breaker'], {
+            'failure_threshold': 5,
+            'reset_timeout': 60000,
+            'probes': 1,
+        })
+
+    def test_request_limiter_parsing(self):
+        config = DiamondashConfig(mk_server_config_data(request_limiter={
+            'concurrency': 2,
+        }))
+
+        self.assertEqual(config['request_limiter'], {
+            'concurrency': 2,
+            'max_queued': 100,
+        })
+
+    def test_rollups_parsing(self):
+        config = DiamondashConfig(mk_server_config_data(rollups={
+            'enabled': True,
+            'bucket_sizes': ['1m', '1h'],
+        }))
+
+        self.assertEqual(config['rollups'], {
+            'enabled': True,
+            'bucket_sizes': [60000, 3600000],
+            'max_points': 1000000,
+            'retention': 604800000,
+        })
+
+    def test_scheduler_parsing(self):
+        config = DiamondashConfig(mk_server_config_data(scheduler={
+            'enabled': True,
+        }))
+
+        self.assertEqual(config['scheduler'], {
+            'enabled': True,
+            'jitter': 0.1,
+            'concurrency': 4,
+        })
+
+    def test_stats_parsing(self):
+        config = DiamondashConfig(mk_server_config_data(stats={
+            'window': '2m',
+        }))
+
+        self.assertEqual(config['stats'], {
+            'window': 120000,
+            'carbon': None,
+        })
+
+    def test_stats_parsing_for_carbon(self):
+        config = DiamondashConfig(mk_server_config_data(stats={
+            'carbon': {'port': 2004, 'interval': '10s'},
+        }))
+
+        self.assertEqual(config['stats']['carbon'], {
+            'host': 'localhost',
+            'port': 2004,
+            'interval': 10000,
+            'prefix': 'diamondash',
+        })
+
 
 class DiamondashServerTestCase(unittest.TestCase):
     def setUp(self):
@@ -104,7 +189,7 @@ class DiamondashServerTestCase(unittest.TestCase):
 
     @inlineCallbacks
     def start_server(self):
-        site_factory = Site(self.server.app.resource())
+        site_factory = Site(self.server.resource())
         self.ws = yield reactor.listenTCP(0, site_factory)
         addr = self.ws.getHost()
         self.url = "http://%s:%s" % (addr.host, addr.port)
@@ -174,6 +259,77 @@ class DiamondashServerTestCase(unittest.TestCase):
         d.addBoth(self.assert_unhappy_response, http.NOT_FOUND)
         return d
 
+    @inlineCallbacks
+    def test_gzipped_api_responses(self):
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot',
+            headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response['headers']['content-encoding'], ['gzip'])
+        self.assertEqual(response['headers']['vary'], ['Accept-Encoding'])
+        self.assertEqual(
+            zlib.decompress(response['body'], 16 + zlib.MAX_WBITS),
+            json.dumps(['widget-1']))
+
+    @inlineCallbacks
+    def test_gzipped_api_responses_for_unaccepted_gzip(self):
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot')
+
+        self.assertFalse('content-encoding' in response['headers'])
+        self.assert_json_response(response, ['widget-1'])
+
+    @inlineCallbacks
+    def test_gzipped_not_modified_responses(self):
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot')
+        [etag] = response['headers']['etag']
+
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot',
+            headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'})
+        self.assertFalse('content-encoding' in response['headers'])
+        self.assert_response(response, '', code=http.NOT_MODIFIED)
+
+    @inlineCallbacks
+    def test_gzipped_public_resources(self):
+        dirname = self.mktemp()
+        os.makedirs(os.path.join(dirname, 'js'))
+        with open(os.path.join(dirname, 'js', 'foo.js'), 'w') as f:
+            f.write('foo();')
+        self.server.resources = File(dirname)
+
+        response = yield self.request(
+            '/public/js/foo.js', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(response['headers']['content-encoding'], ['gzip'])
+        self.assertEqual(
+            zlib.decompress(response['body'], 16 + zlib.MAX_WBITS),
+            'foo();')
+
+    @inlineCallbacks
+    def test_precompressed_public_resources(self):
+        dirname = self.mktemp()
+        os.makedirs(os.path.join(dirname, 'js'))
+        with open(os.path.join(dirname, 'js', 'foo.js'), 'w') as f:
+            f.write('foo();')
+
+        with open(os.path.join(dirname, 'js', 'foo.js.gz'), 'w') as f:
+            f.write(zlib.compress('precompressed foo();'))
+        self.server.resources = File(dirname)
+
+        response = yield self.request(
+            '/public/js/foo.js', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['headers']['content-encoding'], ['gzip'])
+        self.assertEqual(
+            response['headers']['content-type'], ['text/javascript'])
+        self.assertEqual(
+            zlib.decompress(response['body']), 'precompressed foo();')
+
+        response = yield self.request('/public/js/foo.js')
+        self.assertFalse('content-encoding' in response['headers'])
+        self.assertEqual(response['body'], 'foo();')
+
     def test_unhandled_api_get_error_trapping(self):
         @self.server.app.route('/test')
         def api_method(slf, request):
@@ -188,6 +344,51 @@ class DiamondashServerTestCase(unittest.TestCase):
         d.addCallback(self.assert_json_response, self.dashboard1.get_details())
         return d
 
+    def test_api_dashboard_snapshot_retrieval(self):
+        d = self.request('/api/dashboards/dashboard-1/snapshot')
+        d.addCallback(self.assert_json_response, {'widget-1': ['widget-1']})
+        return d
+
+    def test_api_dashboard_snapshot_retrieval_since(self):
+        widget = self.dashboard1.get_widget('widget-1')
+        self.patch(widget, 'get_snapshot_delta', lambda snapshot, since: {
+            'since': since,
+            'snapshot': snapshot,
+        })
+
+        d = self.request(
+            '/api/dashboards/dashboard-1/snapshot?since=widget-1%3A3')
+        d.addCallback(self.assert_json_response, {
+            'widget-1': {'since': 3, 'snapshot': ['widget-1']},
+        })
+        return d
+
+    def test_api_dashboard_snapshot_retrieval_for_bad_since(self):
+        d = self.request(
+            '/api/dashboards/dashboard-1/snapshot?since=widget-1%3Ayesterday')
+        d.addBoth(self.assert_unhappy_response, http.BAD_REQUEST)
+        return d
+
+    def test_api_dashboard_snapshot_retrieval_for_nonexistent_dashboard(self):
+        d = self.request('/api/dashboards/dashboard-3/snapshot')
+        d.addBoth(self.assert_unhappy_response, http.NOT_FOUND)
+        return d
+
+    def test_api_dashboard_events_for_nonexistent_dashboard(self):
+        d = self.request('/api/dashboards/dashboard-3/events')
+        d.addBoth(self.assert_unhappy_response, http.NOT_FOUND)
+        return d
+
+    def test_dashboard_events_closing_for_removed_dashboards(self):
+        d = self.dashboard1.events.subscribe(DummyRequest(['']))
+        self.server.remove_dashboard('dashboard-1')
+        self.assertTrue(d.called)
+
+    def test_dashboard_events_closing_for_replaced_dashboards(self):
+        d = self.dashboard1.events.subscribe(DummyRequest(['']))
+        self.server.add_dashboard(self.dashboard1.config, overwrite=True)
+        self.assertTrue(d.called)
+
     def test_api_dashboard_creation(self):
         data = mk_dashboard_config_data(name='Dashboard 3')
 
@@ -394,6 +595,208 @@ class DiamondashServerTestCase(unittest.TestCase):
         d.addBoth(self.assert_unhappy_response, http.BAD_REQUEST)
         return d
 
+    def test_api_widget_snapshot_retrieval_since(self):
+        widget = self.dashboard1.get_widget('widget-1')
+        self.patch(widget, 'get_snapshot_delta', lambda snapshot, since: {
+            'since': since,
+            'snapshot': snapshot,
+        })
+
+        d = self.request('/api/widgets/dashboard-1/widget-1/snapshot?since=3')
+        d.addCallback(self.assert_json_response, {
+            'since': 3,
+            'snapshot': ['widget-1'],
+        })
+        return d
+
+    def test_api_widget_snapshot_retrieval_for_bad_since(self):
+        d = self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot?since=yesterday')
+        d.addBoth(self.assert_unhappy_response, http.BAD_REQUEST)
+        return d
+
+    def test_api_widget_snapshot_retrieval_for_timeouts(self):
+        widget = self.dashboard1.get_widget('widget-1')
+        self.patch(widget, 'get_snapshot', lambda: fail(TimeoutError()))
+
+        d = self.request('/api/widgets/dashboard-1/widget-1/snapshot')
+        d.addBoth(self.assert_unhappy_response, http.GATEWAY_TIMEOUT)
+        return d
+
+    @inlineCallbacks
+    def test_api_widget_snapshot_retrieval_cancellation(self):
+        requested = Deferred()
+        cancelled = Deferred()
+
+        def get_snapshot():
+            requested.callback(None)
+            return Deferred(lambda _: cancelled.callback(None))
+
+        widget = self.dashboard1.get_widget('widget-1')
+        self.patch(widget, 'get_snapshot', get_snapshot)
+
+        d = self.request('/api/widgets/dashboard-1/widget-1/snapshot')
+        yield requested
+
+        # the client going away should cancel the snapshot retrieval
+        d.addErrback(lambda f: None)
+        d.cancel()
+        yield d
+        yield cancelled
+
+    @inlineCallbacks
+    def test_api_widget_snapshot_retrieval_for_stale_snapshots(self):
+        self.patch(time, 'time', lambda: 60)
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot')
+        self.assertFalse('warning' in response['headers'])
+
+        # the last good snapshot should be given if retrieval fails
+        widget = self.dashboard1.get_widget('widget-1')
+        self.patch(widget, 'get_snapshot', lambda: fail(MockError()))
+        self.patch(time, 'time', lambda: 120)
+
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot')
+        self.assert_json_response(response, ['widget-1'], headers={
+            'warning': ['110 - "Response is Stale"'],
+        })
+
+        response = yield self.request('/api/dashboards/dashboard-1/snapshot')
+        self.assertEqual(
+            response['headers']['warning'], ['110 - "Response is Stale"'])
+
+    def test_api_widget_snapshot_retrieval_caching_headers(self):
+        d = self.request('/api/widgets/dashboard-1/widget-1/snapshot')
+
+        etag = '"%s"' % hashlib.sha1(json.dumps(['widget-1'])).hexdigest()
+
+        d.addCallback(self.assert_json_response, ['widget-1'], headers={
+            'etag': [etag],
+            'cache-control': ['max-age=60'],
+        })
+        return d
+
+    @inlineCallbacks
+    def test_api_widget_snapshot_retrieval_not_modified(self):
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot')
+        [etag] = response['headers']['etag']
+
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot',
+            headers={'If-None-Match': etag})
+        self.assert_response(response, '', code=http.NOT_MODIFIED)
+
+    @inlineCallbacks
+    def test_api_widget_snapshot_retrieval_modified(self):
+        response = yield self.request(
+            '/api/widgets/dashboard-1/widget-1/snapshot',
+            headers={'If-None-Match': '"some-other-etag"'})
+        self.assert_json_response(response, ['widget-1'])
+
+    @inlineCallbacks
+    def test_api_dashboard_snapshot_retrieval_not_modified(self):
+        response = yield self.request('/api/dashboards/dashboard-1/snapshot')
+        self.assertEqual(response['headers']['cache-control'], ['max-age=60'])
+        [etag] = response['headers']['etag']
+
+        response = yield self.request(
+            '/api/dashboards/dashboard-1/snapshot',
+            headers={'If-None-Match': etag})
+        self.assert_response(response, '', code=http.NOT_MODIFIED)
+
+    @inlineCallbacks
+    def test_api_dashboard_details_retrieval_not_modified(self):
+        response = yield self.request('/api/dashboards/dashboard-1')
+        self.assertEqual(response['headers']['cache-control'], ['max-age=60'])
+        [etag] = response['headers']['etag']
+
+        response = yield self.request(
+            '/api/dashboards/dashboard-1',
+            headers={'If-None-Match': etag})
+        self.assert_response(response, '', code=http.NOT_MODIFIED)
+
+    def test_api_widget_snapshot_retrieval_stats(self):
+        d = self.request('/api/widgets/dashboard-1/widget-1/snapshot')
+
+        def assert_stats(response):
+            stats = self.server.get_stats()['dashboards']['dashboard-1']
+            widget_stats = stats['widgets']['widget-1']
+            self.assertEqual(widget_stats['snapshot']['count'], 1)
+            self.assertEqual(widget_stats['encode']['count'], 1)
+            self.assertEqual(stats['stages']['encode']['count'], 1)
+
+        d.addCallback(assert_stats)
+        return d
+
+    def test_api_dashboard_snapshot_retrieval_stats(self):
+        d = self.request('/api/dashboards/dashboard-1/snapshot')
+
+        def assert_stats(response):
+            stats = self.server.get_stats()['dashboards']['dashboard-1']
+            self.assertEqual(stats['stages']['encode']['count'], 1)
+            self.assertEqual(stats['stages']['snapshot']['count'], 1)
+            self.assertEqual(stats['widgets'].keys(), ['widget-1'])
+            self.assertFalse('encode' in stats['widgets']['widget-1'])
+
+        d.addCallback(assert_stats)
+        return d
+
+    def test_api_stats_retrieval(self):
+        d = self.request('/api/stats')
+        d.addCallback(self.assert_json_response, {
+            'dashboards': {
+                'dashboard-1': {
+                    'stages': {},
+                    'widgets': {},
+                    'snapshot_cache': {
+                        'hits': 0,
+                        'misses': 0,
+                        'coalesced': 0,
+                        'stale_hits': 0,
+                    },
+                },
+                'dashboard-2': {
+                    'stages': {},
+                    'widgets': {},
+                    'snapshot_cache': {
+                        'hits': 0,
+                        'misses': 0,
+                        'coalesced': 0,
+                        'stale_hits': 0,
+                    },
+                },
+            },
+            'breakers': {
+                'http://127.0.0.1:3000': {'state': 'closed', 'failures': 0},
+            },
+            'limiters': {
+                'http://127.0.0.1:3000': {
+                    'active': 0,
+                    'queued': 0,
+                    'rejected': 0,
+                    'wait': {'count': 0},
+                },
+            },
+            'rollups': None,
+        })
+        return d
+
+    def test_stats_removal_for_removed_dashboards(self):
+        self.dashboard1.get_widget('widget-1').stats.record('fetch', 1)
+        self.server.remove_dashboard('dashboard-1')
+        self.assertEqual(self.server.stats.get_stats(), {})
+
+    def test_http_pool_creation(self):
+        self.assertEqual(self.server.http_pool.maxPersistentPerHost, 10)
+        self.assertEqual(self.server.http_pool.cachedConnectionTimeout, 240)
+        self.assertTrue(self.server.agent._pool is self.server.http_pool)
+
+    def test_backend_agent_injection(self):
+        backend = self.dashboard1.get_widget('widget-1').backend
+        self.assertTrue(backend.agent is self.server.agent)
+
     def test_add_dashboard(self):
         """Should add a dashboard to the server."""
         config = DashboardConfig(mk_dashboard_config_data())
@@ -406,6 +809,50 @@ class DiamondashServerTestCase(unittest.TestCase):
             self.server.dashboards_by_share_id['some-share-id'].config,
             config)
 
+    @inlineCallbacks
+    def test_page_caching(self):
+        yield self.request('/dashboard-1')
+        yield self.request('/shared/dashboard-1-share-id')
+        yield self.request('/')
+
+        self.assertEqual(sorted(self.server.pages.pages.keys()), [
+            ('dashboard', 'dashboard-1', False),
+            ('dashboard', 'dashboard-1', True),
+            ('index',),
+        ])
+
+        response = yield self.request('/dashboard-1')
+        yield self.assert_rendering(response, DashboardPage(self.dashboard1))
+
+    @inlineCallbacks
+    def test_page_invalidation_for_replaced_dashboards(self):
+        yield self.request('/dashboard-1')
+        yield self.request('/')
+
+        self.server.add_dashboard(DashboardConfig(mk_dashboard_config_data(
+            name='Dashboard 1',
+            title='Replaced Dashboard 1',
+            share_id='dashboard-1-share-id')), overwrite=True)
+        dashboard = self.server.get_dashboard('dashboard-1')
+
+        response = yield self.request('/dashboard-1')
+        yield self.assert_rendering(response, DashboardPage(dashboard))
+
+        response = yield self.request('/')
+        yield self.assert_rendering(
+            response, Index([dashboard, self.dashboard2]))
+
+    @inlineCallbacks
+    def test_page_invalidation_for_removed_dashboards(self):
+        yield self.request('/dashboard-1')
+        yield self.request('/')
+
+        self.server.remove_dashboard('dashboard-1')
+        self.assertEqual(self.server.pages.pages, {})
+
+        response = yield self.request('/')
+        yield self.assert_rendering(response, Index([self.dashboard2]))
+
 
 class DashboardIndexListItemTestCase(unittest.TestCase):
     def test_from_dashboard(self):
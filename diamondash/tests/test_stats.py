@@ -0,0 +1,158 @@
+import time
+
+from twisted.trial import unittest
+from twisted.internet.task import Clock
+from twisted.test.proto_helpers import StringTransport
+
+from diamondash.stats import (
+    RollingHistogram, Stats, null_stats, CarbonClientFactory)
+
+
+class RollingHistogramTestCase(unittest.TestCase):
+    def setUp(self):
+        self.stub_time(0)
+
+    def stub_time(self, t):
+        self.patch(time, 'time', lambda: t)
+
+    def test_summary(self):
+        histogram = RollingHistogram(window=60000, slots=6)
+        for duration in [0.5, 3, 3, 4, 40, 700]:
+            histogram.record(duration)
+
+        self.assertEqual(histogram.summary(), {
+            'count': 6,
+            'mean': 125.08333333333333,
+            'min': 0.5,
+            'max': 700,
+            'p50': 5,
+            'p90': 700,
+            'p99': 700,
+            'buckets': [[1, 1], [5, 3], [50, 1], [1000, 1]],
+        })
+
+    def test_summary_for_no_durations(self):
+        histogram = RollingHistogram()
+        self.assertEqual(histogram.summary(), {'count': 0})
+
+    def test_summary_for_long_durations(self):
+        histogram = RollingHistogram()
+        histogram.record(20000)
+        summary = histogram.summary()
+        self.assertEqual(summary['p99'], 20000)
+        self.assertEqual(summary['buckets'], [[None, 1]])
+
+    def test_expiry(self):
+        histogram = RollingHistogram(window=60000, slots=6)
+        histogram.record(1)
+
+        self.stub_time(30)
+        histogram.record(2)
+        self.assertEqual(histogram.summary()['count'], 2)
+
+        self.stub_time(60)
+        self.assertEqual(histogram.summary()['count'], 1)
+        self.assertEqual(histogram.summary()['min'], 2)
+
+        self.stub_time(90)
+        self.assertEqual(histogram.summary(), {'count': 0})
+        self.assertEqual(len(histogram.slots), 0)
+
+
+class StatsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patch(time, 'time', lambda: 0)
+        self.stats = Stats()
+
+    def test_widget_stats_recording(self):
+        widget_stats = self.stats.widget_stats('dashboard-1', 'widget-1')
+        widget_stats.record('fetch', 2)
+        widget_stats.record('fetch', 4)
+
+        stats = self.stats.get_stats()
+        dashboard_stats = stats['dashboard-1']
+
+        self.assertEqual(
+            dashboard_stats['widgets']['widget-1']['fetch']['count'], 2)
+        self.assertEqual(dashboard_stats['stages']['fetch']['count'], 2)
+        self.assertEqual(dashboard_stats['stages']['fetch']['mean'], 3)
+
+    def test_dashboard_stats_recording(self):
+        dashboard_stats = self.stats.widget_stats('dashboard-1', None)
+        dashboard_stats.record('encode', 2)
+
+        stats = self.stats.get_stats()
+        self.assertEqual(stats['dashboard-1']['widgets'], {})
+        self.assertEqual(
+            stats['dashboard-1']['stages']['encode']['count'], 1)
+
+    def test_timed(self):
+        widget_stats = self.stats.widget_stats('dashboard-1', 'widget-1')
+        result = widget_stats.timed('process', lambda a, b: a + b, 1, b=2)
+
+        self.assertEqual(result, 3)
+
+        stages = self.stats.get_stats()['dashboard-1']['stages']
+        self.assertEqual(stages['process']['count'], 1)
+
+    def test_null_stats(self):
+        self.assertEqual(null_stats.timed('process', lambda a: a, 3), 3)
+        null_stats.record('process', 3)
+
+    def test_remove_dashboard(self):
+        self.stats.widget_stats('dashboard-1', 'widget-1').record('fetch', 2)
+        self.stats.widget_stats('dashboard-2', 'widget-1').record('fetch', 2)
+        self.stats.remove_dashboard('dashboard-1')
+        self.assertEqual(self.stats.get_stats().keys(), ['dashboard-2'])
+
+    def test_get_metrics(self):
+        self.stats.widget_stats('dashboard-1', 'widget-1').record('fetch', 2)
+
+        self.assertEqual(self.stats.get_metrics('dd'), {
+            'dd.dashboards.dashboard-1.fetch.count': 1,
+            'dd.dashboards.dashboard-1.fetch.mean': 2,
+            'dd.dashboards.dashboard-1.fetch.max': 2,
+            'dd.dashboards.dashboard-1.fetch.p50': 2,
+            'dd.dashboards.dashboard-1.fetch.p90': 2,
+            'dd.dashboards.dashboard-1.fetch.p99': 2,
+            'dd.dashboards.dashboard-1.widgets.widget-1.fetch.count': 1,
+            'dd.dashboards.dashboard-1.widgets.widget-1.fetch.mean': 2,
+            'dd.dashboards.dashboard-1.widgets.widget-1.fetch.max': 2,
+            'dd.dashboards.dashboard-1.widgets.widget-1.fetch.p50': 2,
+            'dd.dashboards.dashboard-1.widgets.widget-1.fetch.p90': 2,
+            'dd.dashboards.dashboard-1.widgets.widget-1.fetch.p99': 2,
+        })
+
+
+class CarbonClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.patch(time, 'time', lambda: 1000)
+        self.clock = Clock()
+        self.patch(CarbonClientFactory, 'clock', self.clock)
+
+        self.metrics = {'a.b': 1, 'a.c': 2.5}
+        factory = CarbonClientFactory(30, lambda: self.metrics)
+        self.client = factory.buildProtocol(None)
+        self.transport = StringTransport()
+
+    def tearDown(self):
+        self.client.connectionLost(None)
+
+    def test_send_metrics(self):
+        self.client.makeConnection(self.transport)
+        self.assertEqual(
+            self.transport.value(),
+            "a.b 1 1000\r\na.c 2.5 1000\r\n")
+
+        self.transport.clear()
+        self.metrics = {'a.b': 3}
+        self.clock.advance(30)
+        self.assertEqual(self.transport.value(), "a.b 3 1000\r\n")
+
+    def test_send_metrics_for_lost_connections(self):
+        self.client.makeConnection(self.transport)
+        self.client.connectionLost(None)
+        self.transport.clear()
+
+        self.clock.advance(30)
+        self.assertEqual(self.transport.value(), "")
@@ -2,8 +2,14 @@ import json
 from urllib import urlencode
 
 from twisted.web import http
+from twisted.web.http import PotentialDataLoss
+from twisted.web.client import ResponseFailed, PartialDownloadError
 from twisted.trial import unittest
-from twisted.internet.defer import inlineCallbacks
+from twisted.python.failure import Failure
+from twisted.internet.task import Clock
+from twisted.internet.error import TimeoutError
+from twisted.internet.defer import (
+    Deferred, CancelledError, succeed, inlineCallbacks)
 
 from diamondash import utils
 from diamondash.tests.utils import MockHttpServer
@@ -148,6 +154,69 @@ class UtilsTestCase(unittest.TestCase):
         self.assertEqual(utils.floor_time(14, 5, 18), 13)
 
 
+class TimeoutTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def test_add_timeout(self):
+        d = utils.add_timeout(Deferred(), 1000, self.clock)
+        d.callback('foo')
+        self.assertEqual(self.successResultOf(d), 'foo')
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_add_timeout_for_timeouts(self):
+        d = utils.add_timeout(Deferred(), 1000, self.clock)
+        self.clock.advance(0.9)
+        self.assertNoResult(d)
+
+        self.clock.advance(0.1)
+        self.failureResultOf(d, TimeoutError)
+
+    def test_add_timeout_for_cancellation(self):
+        d = utils.add_timeout(Deferred(), 1000, self.clock)
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+
+class ToyTransport(object):
+    def __init__(self):
+        self.stopped = False
+
+    def stopProducing(self):
+        self.stopped = True
+
+
+class ToyConnectionTransport(ToyTransport):
+    def __init__(self):
+        super(ToyConnectionTransport, self).__init__()
+        self.lost = False
+
+    def loseConnection(self):
+        self.lost = True
+
+
+class ToyResponse(object):
+    code = http.OK
+    phrase = 'OK'
+
+    def __init__(self, transport=None):
+        self.transport = transport if transport is not None else ToyTransport()
+        self.protocol = None
+
+    def deliverBody(self, protocol):
+        self.protocol = protocol
+        protocol.makeConnection(self.transport)
+
+
+class ToyAgent(object):
+    def __init__(self, response):
+        self.response = response
+
+    def request(self, method, url, headers, body_producer):
+        return succeed(self.response)
+
+
 class HttpUtilsTestCase(unittest.TestCase):
     def setUp(self):
         self.set_response_data("", http.OK, {})
@@ -211,6 +280,56 @@ class HttpUtilsTestCase(unittest.TestCase):
             code=http.CREATED,
             headers={'luke': ['Skywalker']})
 
+    @inlineCallbacks
+    def test_http_request_for_persistent_agents(self):
+        pool = utils.mk_http_pool(max_persistent_per_host=1)
+        self.addCleanup(pool.closeCachedConnections)
+        agent = utils.mk_http_agent(pool, connect_timeout=1000)
+
+        self.set_response_data("foo", http.OK, {})
+        response = yield utils.http_request(self.server.url, agent=agent)
+        self.assertEqual(response['body'], "foo")
+        request = yield self.server.queue.get()
+        first_client = request.transport.getPeer()
+
+        response = yield utils.http_request(self.server.url, agent=agent)
+        self.assertEqual(response['body'], "foo")
+        request = yield self.server.queue.get()
+
+        # the same connection should have been reused
+        self.assertEqual(request.transport.getPeer(), first_client)
+
+    def test_http_request_cancellation_while_reading_body(self):
+        response = ToyResponse()
+        d = utils.http_request(self.server.url, agent=ToyAgent(response))
+        self.assertNoResult(d)
+
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+        self.assertTrue(response.transport.stopped)
+
+        # the body's result should be ignored once the connection is closed
+        response.protocol.connectionLost(
+            Failure(ResponseFailed([Failure(CancelledError())])))
+
+    def test_http_request_cancellation_for_closable_transports(self):
+        response = ToyResponse(ToyConnectionTransport())
+        d = utils.http_request(self.server.url, agent=ToyAgent(response))
+
+        d.cancel()
+        self.failureResultOf(d, CancelledError)
+        self.assertTrue(response.transport.lost)
+        self.assertFalse(response.transport.stopped)
+
+    def test_http_request_for_partial_bodies(self):
+        response = ToyResponse()
+        d = utils.http_request(self.server.url, agent=ToyAgent(response))
+
+        response.protocol.dataReceived('foo')
+        response.protocol.connectionLost(Failure(PotentialDataLoss()))
+        failure = self.failureResultOf(d, PartialDownloadError)
+        self.assertEqual(failure.value.response, 'foo')
+
     def test_http_request_for_GET(self):
         utils.http_request(
             "%s?%s" % (self.server.url, urlencode({'a': 'lerp', 'b': 'larp'})),
@@ -2,12 +2,21 @@ import re
 import sys
 import time
 from os import path
+from StringIO import StringIO
 from unidecode import unidecode
-from urlparse import urlparse
 from math import floor
 
 from twisted.internet import reactor
-from twisted.web.client import HTTPClientFactory
+from twisted.internet.defer import Deferred, CancelledError
+from twisted.internet.error import TimeoutError
+from twisted.internet.protocol import Protocol
+from twisted.python.failure import Failure
+from twisted.web.error import Error
+from twisted.web.http import PotentialDataLoss
+from twisted.web.http_headers import Headers
+from twisted.web.client import (
+    Agent, HTTPConnectionPool, FileBodyProducer, ResponseDone,
+    PartialDownloadError)
 
 _punct_re = re.compile(r'[^a-zA-Z0-9]+')
 _number_suffixes = ['', 'K', 'M', 'B', 'T']
@@ -107,24 +116,138 @@ def absolute_time(t):
     return relative_to_now(t) if t < 0 else t
 
 
-def http_request(url, data=None, headers={}, method='GET'):
-    parsed_url = urlparse(url)
-    factory = HTTPClientFactory(
+def mk_http_pool(max_persistent_per_host=2, idle_timeout=240000):
+    """
+    Creates a pool of persistent http connections. The idle timeout is
+    given in milliseconds.
+    """
+    pool = HTTPConnectionPool(reactor, persistent=True)
+    pool.maxPersistentPerHost = max_persistent_per_host
+    pool.cachedConnectionTimeout = idle_timeout / 1000.0
+    return pool
+
+
+def mk_http_agent(pool=None, connect_timeout=None):
+    """
+    Creates an agent for making http requests, using connections from the
+    given pool if one is given. The connect timeout is given in milliseconds.
+    """
+    if connect_timeout is not None:
+        connect_timeout = connect_timeout / 1000.0
+
+    return Agent(reactor, connectTimeout=connect_timeout, pool=pool)
+
+
+class BodyReader(Protocol):
+    """
+    Collects a response's body, firing ``finished`` with the body once all
+    of it has been received. Unlike `twisted.web.client.readBody`, the
+    reader keeps the transport the body is delivered over, so that reading
+    the body can be aborted.
+    """
+
+    def __init__(self, status, message, finished):
+        self.status = status
+        self.message = message
+        self.finished = finished
+        self.data = []
+
+    def dataReceived(self, data):
+        self.data.append(data)
+
+    def connectionLost(self, reason):
+        # the body is no longer wanted once reading it has been aborted
+        if self.finished.called:
+            return
+
+        body = ''.join(self.data)
+
+        if reason.check(ResponseDone):
+            self.finished.callback(body)
+        elif reason.check(PotentialDataLoss):
+            self.finished.errback(
+                PartialDownloadError(self.status, self.message, body))
+        else:
+            self.finished.errback(reason)
+
+    def abort(self):
+        """Stops reading the body by closing the connection it is sent over."""
+        if self.transport is None:
+            return
+
+        lose_connection = getattr(self.transport, 'loseConnection', None)
+        if lose_connection is not None:
+            lose_connection()
+        else:
+            self.transport.stopProducing()
+
+
+def http_request(url, data=None, headers={}, method='GET', agent=None):
+    """
+    Makes an http request using the given agent, or a new non-persistent
+    agent if no agent is given. Responses with error status codes result in
+    a failure wrapping a `twisted.web.error.Error`.
+    """
+    if agent is None:
+        agent = mk_http_agent()
+
+    d = agent.request(
+        method,
         url,
-        postdata=data,
-        method=method,
-        headers=headers)
-    reactor.connectTCP(parsed_url.hostname, parsed_url.port, factory)
+        Headers(dict((k, [v]) for k, v in headers.iteritems())),
+        FileBodyProducer(StringIO(data)) if data is not None else None)
+
+    def got_response(response):
+        d = Deferred(lambda _: reader.abort())
+        reader = BodyReader(response.code, response.phrase, d)
+        response.deliverBody(reader)
+
+        d.addCallback(got_body, response)
+        return d
+
+    def got_body(body, response):
+        status = str(response.code)
+
+        if response.code >= 400:
+            raise Error(status, response.phrase, body)
 
-    def got_response(body):
         return {
             'body': body,
-            'status': factory.status,
-            'headers': factory.response_headers,
+            'status': status,
+            'headers': dict(
+                (k.lower(), v)
+                for k, v in response.headers.getAllRawHeaders()),
         }
 
-    factory.deferred.addCallback(got_response)
-    return factory.deferred
+    d.addCallback(got_response)
+    return d
+
+
+def add_timeout(d, timeout, clock=reactor):
+    """
+    Cancels the given deferred if it hasn't fired within ``timeout``
+    milliseconds, failing it with a `twisted.internet.error.TimeoutError`
+    instead of a `CancelledError`.
+    """
+    timed_out = []
+
+    def expire():
+        timed_out.append(True)
+        d.cancel()
+
+    delayed = clock.callLater(timeout / 1000.0, expire)
+
+    def fired(result):
+        if delayed.active():
+            delayed.cancel()
+        elif (timed_out and isinstance(result, Failure)
+                and result.check(CancelledError)):
+            raise TimeoutError(string="No response after %sms" % timeout)
+
+        return result
+
+    d.addBoth(fired)
+    return d
 
 
 def floor_time(t, interval, relative_to=None):
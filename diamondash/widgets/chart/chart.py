@@ -9,6 +9,12 @@ class ChartWidgetConfig(DynamicWidgetConfig):
         'bucket_size': '1h',
         'default_value' : 0,
         'align_to_start': False,
+        'incremental_fetch': True,
+
+        # how often the whole time range is fetched again when fetching
+        # incrementally, so that data arriving late for older buckets is
+        # picked up, or `None` to never fetch it again
+        'full_fetch_interval': '1h',
     }
 
     TYPE_NAME = 'chart'
@@ -27,6 +33,10 @@ class ChartWidgetConfig(DynamicWidgetConfig):
         config['time_range'] = utils.parse_interval(config['time_range'])
         config['bucket_size'] = utils.parse_interval(config['bucket_size'])
 
+        if config['full_fetch_interval'] is not None:
+            config['full_fetch_interval'] = utils.parse_interval(
+                config['full_fetch_interval'])
+
         config['backend'].update({
             'bucket_size': config['bucket_size'],
             'metrics': [cls.parse_metric(m) for m in config.pop('metrics')],
@@ -60,6 +70,16 @@ class ChartWidgetConfig(DynamicWidgetConfig):
 class ChartWidget(DynamicWidget):
     CONFIG_CLS = ChartWidgetConfig
 
+    def __init__(self, config):
+        super(ChartWidget, self).__init__(config)
+
+        # the summarized datapoints of each metric retained from previous
+        # polls, keyed by metric id
+        self.window = None
+
+        # when the whole time range was last fetched
+        self.full_fetch_time = None
+
     def process_backend_response(self, metric_data):
         for metric in metric_data:
             # x values are converted to milliseconds for client
@@ -75,13 +95,151 @@ class ChartWidget(DynamicWidget):
 
         return {'metrics': output_metric_data}
 
+    def get_snapshot_version(self, snapshot):
+        """
+        Returns the start of the earliest last bucket of the snapshot's
+        metrics. Only buckets from there onwards can change on later polls.
+        """
+        last_times = [
+            m['datapoints'][-1]['x']
+            for m in snapshot['metrics'] if m['datapoints']]
+
+        return min(last_times) if last_times else None
+
+    def get_snapshot_delta(self, snapshot, since):
+        """
+        Returns the buckets of each metric from ``since`` onwards, along with
+        the start of each metric's series so that clients can evict buckets
+        that fell off the start of the time range. If ``since`` isn't the
+        start of one of the snapshot's buckets (eg. the buckets are aligned
+        relative to the start of the time range), the whole snapshot is
+        returned.
+        """
+        if not any(
+                d['x'] == since
+                for m in snapshot['metrics'] for d in m['datapoints']):
+            return snapshot
+
+        return {
+            'since': since,
+            'metrics': [{
+                'id': m['id'],
+                'start': m['datapoints'][0]['x'] if m['datapoints'] else None,
+                'datapoints': [d for d in m['datapoints'] if d['x'] >= since],
+            } for m in snapshot['metrics']]
+        }
+
+    def get_snapshot_ttl(self, poll_interval):
+        return min(poll_interval, self.config['bucket_size'])
+
+    def can_fetch_incrementally(self):
+        """
+        Buckets aligned relative to the start of the requested time window
+        move with it, so they can't be reused across polls.
+        """
+        return self.config['incremental_fetch'] and not any(
+            m.get('relative_time') for m in self.config['metrics'])
+
+    def needs_full_fetch(self, now):
+        """
+        Returns whether the whole time range should be fetched again, since
+        data can arrive late for buckets older than the last one.
+        """
+        interval = self.config['full_fetch_interval']
+        return (
+            interval is not None
+            and now - self.full_fetch_time >= interval)
+
+    def get_fetch_from_time(self, from_time, now):
+        """
+        Returns the time to fetch data from to bring the retained window up
+        to date: the start of the last complete bucket retained for all of
+        the metrics, or the start of the time range if nothing can be
+        reused or the whole time range is due to be fetched again.
+        """
+        if (self.window is None
+                or not self.can_fetch_incrementally()
+                or self.needs_full_fetch(now)):
+            return from_time
+
+        last_times = [
+            datapoints[-1]['x']
+            for datapoints in self.window.itervalues() if datapoints]
+
+        if not last_times:
+            return from_time
+
+        return max(min(last_times) - self.config['bucket_size'], from_time)
+
+    def get_window_start(self, metric_config, from_time):
+        """
+        Returns the start of the first bucket of the metric's series for a
+        time range starting at ``from_time``, which is ``from_time`` aligned
+        the same way the metric's buckets are.
+        """
+        time_aligner = utils.time_aligners[
+            metric_config.get('time_alignment', 'round')]
+        return time_aligner(from_time, self.config['bucket_size'])
+
+    def merge_window(self, metric_data, from_time, fetch_from_time, now):
+        """
+        Merges the buckets fetched from ``fetch_from_time`` onwards into the
+        retained window, evicting buckets that fall off the start of the
+        time range.
+        """
+        if fetch_from_time == from_time:
+            self.full_fetch_time = now
+            self.window = dict(
+                (m['id'], m['datapoints']) for m in metric_data)
+            return metric_data
+
+        # the first bucket fetched is only partially covered by the fetch, so
+        # buckets from the one after it onwards replace the retained buckets
+        tail_start = fetch_from_time + self.config['bucket_size']
+        metric_configs = dict(
+            (m.get('id'), m) for m in self.config['metrics'])
+
+        for metric in metric_data:
+            window_start = self.get_window_start(
+                metric_configs.get(metric['id'], {}), from_time)
+
+            retained = [
+                d for d in self.window.get(metric['id'], [])
+                if window_start <= d['x'] < tail_start]
+
+            metric['datapoints'] = retained + [
+                d for d in metric['datapoints'] if d['x'] >= tail_start]
+
+        self.window = dict((m['id'], m['datapoints']) for m in metric_data)
+        return metric_data
+
+    def get_max_datapoints(self, from_time, until_time):
+        """
+        Returns the most datapoints the chart can draw for the given time
+        window: one for each bucket the window spans. Backends can use this
+        to consolidate the datapoints they send for metrics that allow it.
+        """
+        return (until_time - from_time) // self.config['bucket_size'] + 1
+
     def get_snapshot(self):
+        now = utils.now()
         time_range = self.config['time_range']
         if self.config['align_to_start']:
-            from_time = utils.floor_time(utils.now(), time_range)
+            from_time = utils.floor_time(now, time_range)
         else:
-            from_time = utils.relative_to_now(-time_range)
+            from_time = now - time_range
+
+        fetch_from_time = self.get_fetch_from_time(from_time, now)
+
+        params = {'from_time': fetch_from_time}
+
+        # datapoints consolidated across the last few buckets wouldn't line
+        # up with the buckets retained from earlier fetches
+        if fetch_from_time == from_time:
+            params['max_datapoints'] = self.get_max_datapoints(from_time, now)
 
-        d = self.backend.get_data(from_time=from_time)
-        d.addCallback(self.process_backend_response)
+        d = self.backend.get_data(**params)
+        d.addCallback(self.merge_window, from_time, fetch_from_time, now)
+        d.addCallback(lambda metric_data: self.stats.timed(
+            'process', self.process_backend_response, metric_data))
         return d
@@ -78,6 +78,55 @@ diamondash.widgets.chart.models = function() {
       'metrics': []
     },
 
+    snapshotVersion: function() {
+      var lastTimes = this.get('metrics')
+        .map(function(m) {
+          var datapoints = m.get('datapoints');
+
+          return datapoints.length
+            ? datapoints[datapoints.length - 1].x
+            : null;
+        })
+        .filter(function(x) { return x !== null; });
+
+      return lastTimes.length
+        ? _(lastTimes).min()
+        : null;
+    },
+
+    parse: function(resp, options) {
+      if (!_(resp).has('since')) {
+        return resp;
+      }
+
+      var self = this,
+          since = resp.since;
+
+      resp = _(resp).omit('since');
+      resp.metrics = _(resp.metrics).map(function(m) {
+        return self.mergeDelta(m, since);
+      });
+
+      return resp;
+    },
+
+    mergeDelta: function(delta, since) {
+      // merges the buckets changed since the given version into the metric's
+      // existing buckets, evicting buckets that fell off the start of the
+      // metric's series
+      var metric = this.get('metrics').get(delta.id),
+          datapoints = metric ? metric.get('datapoints') : [];
+
+      var retained = _(datapoints).filter(function(d) {
+        return delta.start !== null && d.x >= delta.start && d.x < since;
+      });
+
+      return {
+        id: delta.id,
+        datapoints: retained.concat(delta.datapoints)
+      };
+    },
+
     xMin: function() {
       return utils.min(this.get('metrics').map(function(m) {
         return m.xMin();
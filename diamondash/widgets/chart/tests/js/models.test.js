@@ -130,5 +130,69 @@ describe("diamondash.widgets.chart.models", function() {
         assert.deepEqual(model.range(), [2, 24]);
       });
     });
+
+    describe(".snapshotVersion()", function() {
+      it("should return the earliest last x value of its metrics",
+      function() {
+        model.get('metrics').get('metric-b').set('datapoints', [
+          {x: 1340875995000, y: 8},
+          {x: 1340876295000, y: 22}]);
+
+        assert.equal(model.snapshotVersion(), 1340876295000);
+      });
+
+      it("should return null if it has no datapoints", function() {
+        model.get('metrics').each(function(m) {
+          m.set('datapoints', []);
+        });
+
+        assert.strictEqual(model.snapshotVersion(), null);
+      });
+    });
+
+    describe(".setSnapshot()", function() {
+      it("should merge snapshot deltas into its datapoints", function() {
+        model.setSnapshot({
+          since: 1340877495000,
+          metrics: [{
+            id: 'metric-a',
+            start: 1340876295000,
+            datapoints: [
+              {x: 1340877495000, y: 25},
+              {x: 1340877795000, y: 3}]
+          }, {
+            id: 'metric-b',
+            start: null,
+            datapoints: []
+          }]
+        });
+
+        assert.deepEqual(
+          model.get('metrics').get('metric-a').get('datapoints'), [
+            {x: 1340876295000, y: 12},
+            {x: 1340876595000, y: 6},
+            {x: 1340876895000, y: 16},
+            {x: 1340877195000, y: 14},
+            {x: 1340877495000, y: 25},
+            {x: 1340877795000, y: 3}]);
+
+        assert.deepEqual(
+          model.get('metrics').get('metric-b').get('datapoints'),
+          []);
+      });
+
+      it("should replace its datapoints with whole snapshots", function() {
+        model.setSnapshot({
+          metrics: [{
+            id: 'metric-a',
+            datapoints: [{x: 1340877795000, y: 3}]
+          }]
+        });
+
+        assert.deepEqual(
+          model.get('metrics').get('metric-a').get('datapoints'),
+          [{x: 1340877795000, y: 3}]);
+      });
+    });
   });
 });
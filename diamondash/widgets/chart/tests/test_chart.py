@@ -2,10 +2,11 @@ import time
 from itertools import count
 
 from twisted.trial import unittest
+from twisted.internet.defer import succeed, gatherResults
 
 from diamondash import utils
 from diamondash.config import ConfigError
-from diamondash.backends import base as backends
+from diamondash.backends import base as backends, processors
 from diamondash.widgets.chart import ChartWidgetConfig, ChartWidget
 
 
@@ -33,6 +34,7 @@ class ChartWidgetConfigTestCase(unittest.TestCase):
 
         self.assertEqual(config['time_range'], 86400000)
         self.assertEqual(config['bucket_size'], 3600000)
+        self.assertEqual(config['full_fetch_interval'], 3600000)
 
         self.assertEqual(config['backend']['bucket_size'], 3600000)
         self.assertEqual(config['backend']['null_filter'], 'zeroize')
@@ -46,6 +48,10 @@ class ChartWidgetConfigTestCase(unittest.TestCase):
         self.assertEqual(m2_config['name'], 'random-avg')
         self.assertEqual(m2_config['title'], 'random avg')
 
+    def test_parsing_for_no_full_fetch_interval(self):
+        config = ChartWidgetConfig(mk_config_data(full_fetch_interval=None))
+        self.assertEqual(config['full_fetch_interval'], None)
+
     def test_parsing_for_no_metrics(self):
         config = mk_config_data()
         del config['name']
@@ -99,7 +105,7 @@ class ChartWidgetTestCase(unittest.TestCase):
 
         self.assertEqual(
             self.widget.backend.get_requests(),
-            [{'from_time': 1340789597000}])
+            [{'from_time': 1340789597000, 'max_datapoints': 25}])
 
         d.addCallback(self.assertEqual, {
             'metrics': [
@@ -134,7 +140,7 @@ class ChartWidgetTestCase(unittest.TestCase):
 
         self.assertEqual(
             self.widget.backend.get_requests(),
-            [{'from_time': 1340789597000}])
+            [{'from_time': 1340789597000, 'max_datapoints': 25}])
 
         d.addCallback(self.assertEqual, {
             'metrics': [
@@ -150,4 +156,299 @@ class ChartWidgetTestCase(unittest.TestCase):
         self.widget.get_snapshot()
         self.assertEqual(
             self.widget.backend.get_requests(),
-            [{'from_time': 1340841600000}])
+            [{'from_time': 1340841600000, 'max_datapoints': 10}])
+
+    def test_max_datapoints(self):
+        widget = self.mk_widget(time_range='1d', bucket_size='1h')
+        self.assertEqual(widget.get_max_datapoints(0, 86400000), 25)
+        self.assertEqual(widget.get_max_datapoints(0, 5400000), 2)
+
+    def test_snapshot_ttl(self):
+        self.assertEqual(self.widget.get_snapshot_ttl(60000), 60000)
+        self.assertEqual(self.widget.get_snapshot_ttl(7200000), 3600000)
+
+    def test_snapshot_retrieval_incremental(self):
+        self.stub_time(18000)
+        widget = self.mk_widget(time_range='4h', bucket_size='1h')
+
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [
+                {'x': 3600000, 'y': 1},
+                {'x': 7200000, 'y': 2},
+                {'x': 10800000, 'y': 3},
+                {'x': 14400000, 'y': 4},
+                {'x': 18000000, 'y': 5}]
+        }])
+        widget.get_snapshot()
+
+        self.stub_time(18010)
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [
+                {'x': 14400000, 'y': 40},
+                {'x': 18000000, 'y': 50}]
+        }])
+        d = widget.get_snapshot()
+
+        # only the buckets from the last complete bucket onwards are fetched
+        self.assertEqual(
+            widget.backend.get_requests(),
+            [{'from_time': 3600000, 'max_datapoints': 5},
+             {'from_time': 14400000}])
+
+        d.addCallback(self.assertEqual, {
+            'metrics': [{
+                'id': '0',
+                'datapoints': [
+                    {'x': 3600000, 'y': 1},
+                    {'x': 7200000, 'y': 2},
+                    {'x': 10800000, 'y': 3},
+                    {'x': 14400000, 'y': 4},
+                    {'x': 18000000, 'y': 50}]
+            }]
+        })
+        return d
+
+    def test_snapshot_retrieval_incremental_eviction(self):
+        self.stub_time(18000)
+        widget = self.mk_widget(
+            time_range='4h', bucket_size='1h', full_fetch_interval=None)
+
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [
+                {'x': 3600000, 'y': 1},
+                {'x': 7200000, 'y': 2},
+                {'x': 10800000, 'y': 3},
+                {'x': 14400000, 'y': 4},
+                {'x': 18000000, 'y': 5}]
+        }])
+        widget.get_snapshot()
+
+        self.stub_time(25200)
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [
+                {'x': 14400000, 'y': 40},
+                {'x': 18000000, 'y': 50},
+                {'x': 21600000, 'y': 60},
+                {'x': 25200000, 'y': 70}]
+        }])
+        d = widget.get_snapshot()
+
+        d.addCallback(self.assertEqual, {
+            'metrics': [{
+                'id': '0',
+                'datapoints': [
+                    {'x': 10800000, 'y': 3},
+                    {'x': 14400000, 'y': 4},
+                    {'x': 18000000, 'y': 50},
+                    {'x': 21600000, 'y': 60},
+                    {'x': 25200000, 'y': 70}]
+            }]
+        })
+        return d
+
+    def test_snapshot_retrieval_incremental_after_time_range(self):
+        self.stub_time(18000)
+        widget = self.mk_widget(time_range='4h', bucket_size='1h')
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [{'x': 18000000, 'y': 5}]
+        }])
+        widget.get_snapshot()
+
+        # the retained buckets have all fallen off the start of the window
+        self.stub_time(36000)
+        widget.get_snapshot()
+
+        self.assertEqual(
+            widget.backend.get_requests(),
+            [{'from_time': 3600000, 'max_datapoints': 5},
+             {'from_time': 21600000, 'max_datapoints': 5}])
+
+    def test_snapshot_retrieval_incremental_for_rounded_up_window(self):
+        summarizer = processors.summarizers.get('sum', 'round', 3600000)
+        datapoints = [(x, 1) for x in xrange(300000, 36000000, 600000)]
+
+        def get_data(from_time, **params):
+            until_time = utils.now()
+            return succeed([{
+                'id': '0',
+                'datapoints': summarizer(from_time, [
+                    d for d in datapoints
+                    if from_time <= d[0] <= until_time])
+            }])
+
+        def mk_widget(**kwargs):
+            widget = self.mk_widget(
+                time_range='4h', bucket_size='1h', **kwargs)
+            self.patch(widget.backend, 'get_data', get_data)
+            return widget
+
+        self.stub_time(15000)
+        widget = mk_widget()
+        widget.get_snapshot()
+
+        # the time range now starts just after the middle of an hour, so the
+        # first bucket of the window is rounded up to the next hour
+        self.stub_time(16320)
+        d = gatherResults([
+            widget.get_snapshot(),
+            mk_widget(incremental_fetch=False).get_snapshot()])
+
+        def assert_snapshots(snapshots):
+            incremental, full = snapshots
+            self.assertEqual(incremental, full)
+            self.assertEqual(
+                [p['x'] for p in full['metrics'][0]['datapoints']],
+                [3600000, 7200000, 10800000, 14400000])
+
+        d.addCallback(assert_snapshots)
+        return d
+
+    def test_snapshot_retrieval_incremental_full_fetches(self):
+        self.stub_time(18000)
+        widget = self.mk_widget(
+            time_range='4h', bucket_size='1h', full_fetch_interval='1h')
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [{'x': 18000000, 'y': 5}]
+        }])
+        widget.get_snapshot()
+
+        self.stub_time(21599)
+        widget.get_snapshot()
+
+        # data could have arrived late for any of the retained buckets, so
+        # the whole time range is fetched again every full fetch interval
+        self.stub_time(21600)
+        widget.get_snapshot()
+
+        self.stub_time(21610)
+        widget.get_snapshot()
+
+        self.assertEqual(
+            widget.backend.get_requests(),
+            [{'from_time': 3600000, 'max_datapoints': 5},
+             {'from_time': 14400000},
+             {'from_time': 7200000, 'max_datapoints': 5},
+             {'from_time': 14400000}])
+
+    def test_snapshot_retrieval_incremental_for_no_full_fetches(self):
+        self.stub_time(18000)
+        widget = self.mk_widget(
+            time_range='4h', bucket_size='1h', full_fetch_interval=None)
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [{'x': 18000000, 'y': 5}]
+        }])
+        widget.get_snapshot()
+
+        self.stub_time(25200)
+        widget.get_snapshot()
+
+        self.assertEqual(
+            widget.backend.get_requests(),
+            [{'from_time': 3600000, 'max_datapoints': 5},
+             {'from_time': 14400000}])
+
+    def test_snapshot_retrieval_incremental_for_no_datapoints(self):
+        self.widget.backend.set_response([{'id': '0', 'datapoints': []}])
+        self.widget.get_snapshot()
+        self.widget.get_snapshot()
+
+        self.assertEqual(
+            self.widget.backend.get_requests(),
+            [{'from_time': 1340789597000, 'max_datapoints': 25},
+             {'from_time': 1340789597000, 'max_datapoints': 25}])
+
+    def test_snapshot_retrieval_incremental_disabled(self):
+        widget = self.mk_widget(incremental_fetch=False)
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [{'x': 1340874000000, 'y': 5}]
+        }])
+        widget.get_snapshot()
+        widget.get_snapshot()
+
+        self.assertEqual(
+            widget.backend.get_requests(),
+            [{'from_time': 1340789597000, 'max_datapoints': 25},
+             {'from_time': 1340789597000, 'max_datapoints': 25}])
+
+    def test_snapshot_retrieval_incremental_for_relative_time(self):
+        widget = self.mk_widget(metrics=[{
+            'name': 'random sum',
+            'target': 'vumi.random.count.sum',
+            'relative_time': True,
+        }])
+        widget.backend.set_response([{
+            'id': '0',
+            'datapoints': [{'x': 1340874000000, 'y': 5}]
+        }])
+        widget.get_snapshot()
+        widget.get_snapshot()
+
+        self.assertEqual(
+            widget.backend.get_requests(),
+            [{'from_time': 1340789597000, 'max_datapoints': 25},
+             {'from_time': 1340789597000, 'max_datapoints': 25}])
+
+    def test_snapshot_version(self):
+        self.assertEqual(self.widget.get_snapshot_version({
+            'metrics': [{
+                'id': '0',
+                'datapoints': [{'x': 1000, 'y': 1}, {'x': 2000, 'y': 2}],
+            }, {
+                'id': '1',
+                'datapoints': [{'x': 1000, 'y': 1}],
+            }, {
+                'id': '2',
+                'datapoints': [],
+            }]
+        }), 1000)
+
+    def test_snapshot_version_for_empty_datapoints(self):
+        self.assertEqual(self.widget.get_snapshot_version({
+            'metrics': [{'id': '0', 'datapoints': []}]
+        }), None)
+
+    def test_snapshot_delta(self):
+        snapshot = {
+            'metrics': [{
+                'id': '0',
+                'datapoints': [
+                    {'x': 1000, 'y': 1},
+                    {'x': 2000, 'y': 2},
+                    {'x': 3000, 'y': 3}],
+            }, {
+                'id': '1',
+                'datapoints': [],
+            }]
+        }
+
+        self.assertEqual(self.widget.get_snapshot_delta(snapshot, 2000), {
+            'since': 2000,
+            'metrics': [{
+                'id': '0',
+                'start': 1000,
+                'datapoints': [{'x': 2000, 'y': 2}, {'x': 3000, 'y': 3}],
+            }, {
+                'id': '1',
+                'start': None,
+                'datapoints': [],
+            }]
+        })
+
+    def test_snapshot_delta_for_unknown_version(self):
+        snapshot = {
+            'metrics': [{
+                'id': '0',
+                'datapoints': [{'x': 1000, 'y': 1}, {'x': 2000, 'y': 2}],
+            }]
+        }
+
+        self.assertEqual(
+            self.widget.get_snapshot_delta(snapshot, 1500), snapshot)
@@ -8,11 +8,32 @@ diamondash.widgets.dynamic = function() {
       return utils.joinPaths(_(this).result('url'), 'snapshot');
     },
 
+    snapshotVersion: function() {
+      return null;
+    },
+
     fetchSnapshot: function(options) {
       options = options || {};
       options.url = _(this).result('snapshotUrl');
-      
+
+      // only ask for the changes made since the snapshot we already have
+      var since = _(this).result('snapshotVersion');
+      if (since !== null) {
+        options.data = _({since: since}).extend(options.data);
+      }
+
       return this.fetch(options);
+    },
+
+    setSnapshot: function(snapshot, options) {
+      options = options || {};
+
+      if (!this.set(this.parse(snapshot, options), options)) {
+        return false;
+      }
+
+      this.trigger('sync', this, snapshot, options);
+      return this;
     }
   });
 
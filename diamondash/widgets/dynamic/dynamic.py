@@ -1,6 +1,7 @@
 from twisted.python import log
 
 from diamondash import utils
+from diamondash.stats import null_stats
 from diamondash.backends import BadBackendResponseError
 from diamondash.widgets.widget import Widget, WidgetConfig
 
@@ -22,12 +23,40 @@ class DynamicWidgetConfig(WidgetConfig):
 class DynamicWidget(Widget):
     CONFIG_CLS = DynamicWidgetConfig
 
+    # The priority the widget's backend requests are made with when they
+    # have to wait to be made. Requests with lower priorities are made first.
+    REQUEST_PRIORITY = 1
+
     def __init__(self, config):
         super(DynamicWidget, self).__init__(config)
 
         backend_cls = utils.load_class_by_string(config['backend']['type'])
         self.backend = backend_cls(config['backend'])
+        self.stats = null_stats
+
+    def get_snapshot_ttl(self, poll_interval):
+        """
+        Returns how long (in milliseconds) a snapshot of the widget can be
+        reused for, given the interval its dashboard is polled at.
+        """
+        return poll_interval
 
     def get_snapshot(self):
         """Returns a snapshot of the widget's non-static data."""
         raise NotImplementedError()
+
+    def get_snapshot_version(self, snapshot):
+        """
+        Returns the version of the given snapshot that clients holding it can
+        ask for changes since, or `None` if the widget's snapshots can't be
+        delta-encoded.
+        """
+        return None
+
+    def get_snapshot_delta(self, snapshot, since):
+        """
+        Returns the changes made to the widget's data since the snapshot
+        version ``since``. Widgets that can't tell what changed return the
+        whole snapshot.
+        """
+        return snapshot
@@ -51,6 +51,20 @@ describe("diamondash.widgets.dynamic", function() {
         server.respond();
       });
 
+      it("should ask for changes since its snapshot version", function(done) {
+        model.snapshotVersion = function() { return 3000; };
+
+        server.respondWith(function(req) {
+          assert.equal(
+            req.url,
+            '/api/widgets/dashboard-1/widget-1/snapshot?since=3000');
+          done();
+        });
+
+        model.fetchSnapshot();
+        server.respond();
+      });
+
       it("should not remove attrs not present in the api response",
       function() {
         server.respondWith(JSON.stringify({foo: 'spam'}));
@@ -67,5 +81,24 @@ describe("diamondash.widgets.dynamic", function() {
         });
       });
     });
+
+    describe(".setSnapshot()", function() {
+      it("should update the model with the given snapshot", function() {
+        model.setSnapshot({foo: 'spam'});
+
+        assert.deepEqual(model.toJSON(), {
+          name: 'widget-1',
+          width: 2,
+          type_name: 'dynamic',
+          foo: 'spam',
+          bar: ['a', 'b', 'c']
+        });
+      });
+
+      it("should trigger a 'sync' event", function(done) {
+        model.on('sync', function() { done(); });
+        model.setSnapshot({foo: 'spam'});
+      });
+    });
   });
 });
@@ -46,6 +46,10 @@ class LValueWidgetConfig(DynamicWidgetConfig):
 class LValueWidget(DynamicWidget):
     CONFIG_CLS = LValueWidgetConfig
 
+    # lvalue requests ask for a handful of datapoints, so they are made
+    # ahead of the larger requests of charts
+    REQUEST_PRIORITY = 0
+
     def handle_backend_response(self, metric_data, until_time):
         if not metric_data:
             raise BadBackendResponseError(
@@ -76,6 +80,9 @@ class LValueWidget(DynamicWidget):
             'prev': prev['y'],
         }
 
+    def get_snapshot_ttl(self, poll_interval):
+        return min(poll_interval, self.config['time_range'])
+
     def get_snapshot(self):
         time_range = self.config['time_range']
 
@@ -88,5 +95,6 @@ class LValueWidget(DynamicWidget):
         # previous time range
         from_time = until_time - (time_range * 2)
         d = self.backend.get_data(from_time=from_time)
-        d.addCallback(self.handle_backend_response, until_time)
+        d.addCallback(lambda metric_data: self.stats.timed(
+            'process', self.handle_backend_response, metric_data, until_time))
         return d
@@ -137,6 +137,11 @@ class LValueWidgetTestCase(unittest.TestCase):
         d.addCallback(check)
         return d
 
+    def test_snapshot_ttl(self):
+        widget = self.mk_widget()
+        self.assertEqual(widget.get_snapshot_ttl(2000), 2000)
+        self.assertEqual(widget.get_snapshot_ttl(10000), 5000)
+
     def test_snapshot_retrieval_for_empty_backend_responses(self):
         widget = self.mk_widget()
         widget.backend.set_response([])
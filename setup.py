@@ -43,7 +43,7 @@ setup(
     long_description=open('README.md', 'r').read(),
     author='Praekelt Foundation',
     author_email='dev@praekeltfoundation.org',
-    packages=find_packages() + ['twisted.plugins'],
+    packages=find_packages(exclude=['benchmarks']) + ['twisted.plugins'],
     package_data={
         'diamondash': [
             'templates/*.xml',
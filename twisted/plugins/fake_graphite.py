@@ -0,0 +1,3 @@
+from diamondash.scripts.fake_graphite import FakeGraphiteServiceMaker
+
+service_maker = FakeGraphiteServiceMaker()